@@ -0,0 +1,75 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Startup time and memory benchmark of the locust agent WSGI engines.
+
+Every run starts a fresh interpreter, creates the agent application of the
+given engine and reports time spent and max RSS of the process.
+
+Usage:
+    python benchmarks/agent_startup.py [--runs=10]
+"""
+import sys
+from json import loads
+from optparse import OptionParser
+from subprocess import Popen, PIPE
+
+ENGINES = {
+    'flask': 'from locust.webservice import create_flask_app as factory',
+    'lite': 'from locust.wsgiapp import LocustApp as factory'}
+
+SNIPPET = '''
+import json, resource, time
+start = time.time()
+{factory_import}
+app = factory()
+spent = time.time() - start
+print json.dumps({{"time": spent,
+                  "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}})
+'''
+
+
+def measure(engine):
+    """Start an interpreter that creates the application of given engine."""
+    code = SNIPPET.format(factory_import=ENGINES[engine])
+    proc = Popen([sys.executable, '-c', code], stdout=PIPE, stderr=PIPE)
+    out, err = proc.communicate()
+    if proc.returncode:
+        raise RuntimeError(err)
+    return loads(out.strip().splitlines()[-1])
+
+
+def median(values):
+    """Return median of the values."""
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    """Main method of the benchmark."""
+    parser = OptionParser()
+    parser.add_option('--runs', dest='runs', type='int', default=10,
+                      help='Amount of interpreter starts per engine.')
+    options, _ = parser.parse_args()
+    print '{0:<8}{1:>16}{2:>16}'.format('engine', 'startup, ms',
+                                        'max rss, KB')
+    for engine in sorted(ENGINES):
+        results = [measure(engine) for _ in range(options.runs)]
+        print '{0:<8}{1:>16.1f}{2:>16}'.format(
+            engine, median([each['time'] for each in results]) * 1000,
+            max(each['rss'] for each in results))
+
+
+if __name__ == '__main__':
+    main()
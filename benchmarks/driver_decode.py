@@ -0,0 +1,98 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Memory benchmark of decoding a big process list response.
+
+Writes a {"list": [...]} response with the given amount of process records
+to a temporary file and decodes it in a fresh interpreter, reading the file
+by chunks as the driver reads a response: whole body with json.loads and
+record by record with locustdriver.jsonstream.ListStream.
+
+Usage:
+    python benchmarks/driver_decode.py [--records=50000]
+"""
+import os
+import sys
+from json import dump, loads
+from optparse import OptionParser
+from subprocess import Popen, PIPE
+from tempfile import mkstemp
+
+MODES = {
+    'loads': '''
+body = ''.join(iter(lambda: source.read(65536), ''))
+count = len(json.loads(body)['list'])
+''',
+    'stream': '''
+from locustdriver.jsonstream import ListStream
+count = sum(1 for _ in ListStream(iter(lambda: source.read(65536), '')))
+'''}
+
+SNIPPET = '''
+import json, resource, time
+start = time.time()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+source = open({path!r})
+{decode}
+print json.dumps({{
+    "count": count, "time": time.time() - start,
+    "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss}})
+'''
+
+
+def write_response(path, records):
+    """Write process list response of the agent."""
+    processes = [{'pid': pid, 'name': 'python2.7', 'status': 'sleeping',
+                  'cmd': '/usr/bin/python2.7 -u /opt/app/worker.py --id %d'
+                         % pid, 'node': '119004516906817',
+                  'endpoint': '127.0.1.1',
+                  'uuid': 'e4d4951a-08d6-11e3-b487-%012d' % pid}
+                 for pid in range(records)]
+    with open(path, 'w') as response:
+        dump({'list': processes}, response)
+
+
+def measure(path, mode):
+    """Decode the response in a fresh interpreter."""
+    code = SNIPPET.format(path=path, decode=MODES[mode])
+    proc = Popen([sys.executable, '-c', code], stdout=PIPE, stderr=PIPE)
+    out, err = proc.communicate()
+    if proc.returncode:
+        raise RuntimeError(err)
+    return loads(out.strip().splitlines()[-1])
+
+
+def main():
+    """Main method of the benchmark."""
+    parser = OptionParser()
+    parser.add_option('--records', dest='records', type='int',
+                      default=50000, help='Amount of process records.')
+    options, _ = parser.parse_args()
+    handle, path = mkstemp(suffix='.json')
+    os.close(handle)
+    try:
+        write_response(path, options.records)
+        print 'response: %.1f MB' % (os.path.getsize(path) / 1048576.0)
+        print '{0:<8}{1:>12}{2:>20}'.format('decode', 'time, s',
+                                            'max rss growth, KB')
+        for mode in sorted(MODES):
+            result = measure(path, mode)
+            print '{0:<8}{1:>12.2f}{2:>20}'.format(mode, result['time'],
+                                                   result['rss'])
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
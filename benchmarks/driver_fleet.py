@@ -0,0 +1,124 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Fleet scale benchmark of the locust driver.
+
+Starts a fake fleet (locustdriver.fakefleet) of every size in a separate
+process and sends the same command to all its nodes a few rounds. Reports
+node answers per second, latency percentiles of nodes and peak RSS of the
+driver process.
+
+Usage:
+    python benchmarks/driver_fleet.py [--sizes=10,100,1000] [--rounds=5]
+        [--ports=10] [--latency=0.01] [--payload=1024] [--workers=32]
+"""
+import resource
+import socket
+import sys
+from math import ceil
+from optparse import OptionParser
+from subprocess import Popen
+from time import sleep, time
+
+from locustdriver import LocustDriver
+from locustdriver.fakefleet import FakeFleet, DEF_KEY
+from locustdriver.inventory import Inventory
+
+COMMAND = 'list_process'
+BASE_PORT = 17000
+
+
+def start_fleet(size, options):
+    """Start the fleet process and wait until all its ports accept
+    connections."""
+    proc = Popen([sys.executable, '-m', 'locustdriver.fakefleet',
+                  '--nodes=%d' % size, '--ports=%d' % options.ports,
+                  '--port=%d' % BASE_PORT, '--latency=%s' % options.latency,
+                  '--payload=%d' % options.payload, '--seed=1'])
+    for port in range(BASE_PORT, BASE_PORT + min(options.ports, size)):
+        for _ in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', port), 1).close()
+                break
+            except socket.error:
+                sleep(0.1)
+        else:
+            proc.kill()
+            raise RuntimeError('Fleet did not start on port %s' % port)
+    return proc
+
+
+def percentile(values, share):
+    """Return the percentile of sorted values."""
+    return values[max(0, int(ceil(share * len(values))) - 1)]
+
+
+def measure(size, options):
+    """Return (answers/s, p50, p95, p99, max latency, errors)."""
+    inventory = Inventory()
+    for index in range(size):
+        inventory.add('node%d' % index, FakeFleet.address_of(
+            index, size, options.ports, base_port=BASE_PORT), key=DEF_KEY,
+                      groups=['fleet'])
+    driver = LocustDriver(inventory, workers=options.workers)
+    driver.send_command(COMMAND, node_groups='fleet')
+    latencies, errors = [], 0
+    start = time()
+    for _ in range(options.rounds):
+        for _, result, latency in driver.as_completed(COMMAND,
+                                                      node_groups='fleet'):
+            latencies.append(latency)
+            errors += 'status' in result
+    spent = time() - start
+    driver.close()
+    latencies.sort()
+    return (len(latencies) / spent, percentile(latencies, 0.5),
+            percentile(latencies, 0.95), percentile(latencies, 0.99),
+            latencies[-1], errors)
+
+
+def main():
+    """Main method of the benchmark."""
+    parser = OptionParser()
+    parser.add_option('--sizes', dest='sizes', default='10,100,1000',
+                      help='Comma separated fleet sizes.')
+    parser.add_option('--rounds', dest='rounds', type='int', default=5,
+                      help='Commands sent to all nodes per size.')
+    parser.add_option('--ports', dest='ports', type='int', default=10,
+                      help='Ports of the fleet, nodes are routed by path.')
+    parser.add_option('--latency', dest='latency', type='float',
+                      default=0.01, help='Latency of fake nodes.')
+    parser.add_option('--payload', dest='payload', type='int', default=1024,
+                      help='Size of results in bytes.')
+    parser.add_option('--workers', dest='workers', type='int', default=32,
+                      help='Workers of the driver.')
+    options, _ = parser.parse_args()
+    row = '{0:>6}{1:>12}{2:>10}{3:>10}{4:>10}{5:>10}{6:>8}{7:>12}'
+    print row.format('nodes', 'answers/s', 'p50 ms', 'p95 ms', 'p99 ms',
+                     'max ms', 'errors', 'max RSS MB')
+    for size in [int(each) for each in options.sizes.split(',')]:
+        proc = start_fleet(size, options)
+        try:
+            rate, p50, p95, p99, slowest, errors = measure(size, options)
+        finally:
+            proc.kill()
+            proc.wait()
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+        print row.format(size, '%.1f' % rate, '%.1f' % (p50 * 1000),
+                         '%.1f' % (p95 * 1000), '%.1f' % (p99 * 1000),
+                         '%.1f' % (slowest * 1000), errors, '%.1f' % rss)
+
+
+if __name__ == '__main__':
+    main()
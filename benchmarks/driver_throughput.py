@@ -0,0 +1,93 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Commands per second benchmark of the locust driver.
+
+Starts a local agent (lightweight engine on the agent WSGI server) in a
+separate process and sends the same cheap command to it one after another,
+with a new connection per command and with keep-alive connections.
+
+Usage:
+    python benchmarks/driver_throughput.py [--commands=1000] [--port=16969]
+"""
+import socket
+import sys
+from optparse import OptionParser
+from subprocess import Popen
+from time import sleep, time
+
+from locustdriver import LocustDriver
+
+KEY = 'bench'
+COMMAND = 'list_network_adapters'
+
+AGENT = '''
+from hashlib import sha256
+from locust.webservice import create_server
+from locust.wsgiapp import LocustApp, get_runner
+get_runner().key = sha256({key!r}).hexdigest()
+create_server(('127.0.0.1', {port}), LocustApp(), log=None).serve_forever()
+'''
+
+
+def start_agent(port):
+    """Start the agent process and wait until it accepts connections."""
+    proc = Popen([sys.executable, '-c', AGENT.format(key=KEY, port=port)])
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            return proc
+        except socket.error:
+            sleep(0.1)
+    proc.kill()
+    raise RuntimeError('Agent did not start on port %s' % port)
+
+
+def measure(port, commands, keep_alive):
+    """Return commands per second sent by a driver."""
+    driver = LocustDriver(keep_alive=keep_alive)
+    driver.add_node(node_name='agent', node_ip='127.0.0.1:%s' % port,
+                    node_group='bench', key=KEY)
+    driver.send_command(COMMAND, nodes='agent')
+    start = time()
+    for _ in range(commands):
+        result = driver.send_command(COMMAND, nodes='agent')
+        if 'status' in result['agent']:
+            raise RuntimeError(result['agent'])
+    spent = time() - start
+    driver.close()
+    return commands / spent
+
+
+def main():
+    """Main method of the benchmark."""
+    parser = OptionParser()
+    parser.add_option('--commands', dest='commands', type='int',
+                      default=1000, help='Amount of commands per mode.')
+    parser.add_option('--port', dest='port', type='int', default=16969,
+                      help='Port of the local agent.')
+    options, _ = parser.parse_args()
+    proc = start_agent(options.port)
+    try:
+        print '{0:<16}{1:>16}'.format('connections', 'commands/s')
+        for name, keep_alive in (('new', False), ('keep-alive', True)):
+            print '{0:<16}{1:>16.1f}'.format(
+                name, measure(options.port, options.commands, keep_alive))
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Cold start benchmark of the locust entry points.
+
+Every run starts a fresh interpreter and imports the given module. The
+report contains the median import time and heavy modules that were
+imported on the way, they should be imported lazily on first use.
+
+Usage:
+    python benchmarks/import_time.py [--runs=10] [--module=locust.cli]
+"""
+import sys
+from json import loads
+from optparse import OptionParser
+from subprocess import Popen, PIPE
+
+HEAVY_MODULES = ('psutil', 'netifaces', 'supervisor.options', 'flask',
+                 'flask_restful', 'gevent', 'requests', 'configobj')
+
+SNIPPET = '''
+import json, sys, time
+start = time.time()
+import {module}
+spent = time.time() - start
+print json.dumps({{"time": spent,
+                  "heavy": [name for name in {heavy!r} if name in sys.modules]}})
+'''
+
+
+def measure(module):
+    """Import the module in a fresh interpreter."""
+    code = SNIPPET.format(module=module, heavy=HEAVY_MODULES)
+    proc = Popen([sys.executable, '-c', code], stdout=PIPE, stderr=PIPE)
+    out, err = proc.communicate()
+    if proc.returncode:
+        raise RuntimeError(err)
+    return loads(out.strip().splitlines()[-1])
+
+
+def main():
+    """Main method of the benchmark."""
+    parser = OptionParser()
+    parser.add_option('--runs', dest='runs', type='int', default=10,
+                      help='Amount of interpreter starts.')
+    parser.add_option('--module', dest='module', default='locust.cli',
+                      help='Module to import (Default: locust.cli).')
+    options, _ = parser.parse_args()
+    results = [measure(options.module) for _ in range(options.runs)]
+    times = sorted(each['time'] for each in results)
+    print 'module:       %s' % options.module
+    print 'median, ms:   %.1f' % (times[len(times) // 2] * 1000)
+    print 'min, ms:      %.1f' % (times[0] * 1000)
+    print 'heavy:        %s' % (', '.join(results[-1]['heavy']) or '-')
+
+
+if __name__ == '__main__':
+    main()
@@ -16,7 +16,7 @@
 import sys
 from os.path import join
 from inspect import ismodule
-from socket import gethostbyname, gethostname
+from socket import gethostname
 
 from configobj import ConfigObj
 
@@ -32,13 +32,12 @@ PCKG_NAME = __package__
 # -----------------------------------------------------------------------------
 LOGGING_LEVEL = LOG_PATH = WDOG_HOST = WDOG_PORT = AGENT_IP = PRJ_ID = 'init'
 AGENT_HSTNM = AGENT_KEY = INF_ID = LOCUST_INFO = STANDALONE = 'init'
-WEB_SRV_CFG = 'init'
+WEB_SRV_CFG = WSGI_ENGINE = 'init'
 
 # -----------------------------------------------------------------------------
 #                      Predefine module config template
 # -----------------------------------------------------------------------------
 HOSTNAME = gethostname()
-IP = gethostbyname(HOSTNAME)
 
 # -----------------------------------------------------------------------------
 #                      Define module config template
@@ -48,6 +47,10 @@ DEF_CFG['webserver'] = {
     'host': '0.0.0.0',
     'port': 6969}
 
+DEF_CFG['wsgi'] = {
+    # flask - Flask application, lite - lightweight WSGI application.
+    'engine': 'flask'}
+
 DEF_CFG['general'] = {
     'log_out_path': '{log_out_path}',
     'log_err_path': '{log_err_path}'}
@@ -116,15 +119,31 @@ EXIT_CODE = 2
 #           Load module config and set depended global variables
 # -----------------------------------------------------------------------------
 
-def load_config():
-    """Load locust module config and initialise global variables."""
+_CONFIG_LOADED = False
+
+
+def load_config(force=False):
+    """Load locust module config and initialise global variables.
+
+    The config is loaded once on first call, the module does not load it at
+    import. Call it before using the global variables depended on config.
+
+    Args:
+      force (bool): Reload config even if it is already loaded.
+    """
+    #pylint: disable=W0603
+    global WSGI_ENGINE, _CONFIG_LOADED
+    if _CONFIG_LOADED and not force:
+        return
     try:
-        init_module(PCKG_NAME, lutil.MODULE_CFG_PATH,
-                    [('LOGGING_LEVEL', 'logging/level'),
-                     ('LOG_PATH', 'logging/path'),
-                     ('WEB_SRV_CFG', 'webserver')])
+        cfg = init_module(PCKG_NAME, lutil.MODULE_CFG_PATH,
+                          [('LOGGING_LEVEL', 'logging/level'),
+                           ('LOG_PATH', 'logging/path'),
+                           ('WEB_SRV_CFG', 'webserver')])
     except RuntimeError as ex:
         print ex.message
         sys.exit(EXIT_CODE)
-
-load_config()
+    # Optional section, configs of previous versions do not contain it.
+    WSGI_ENGINE = cfg.get('wsgi', DEF_CFG['wsgi']).get(
+        'engine', DEF_CFG['wsgi']['engine'])
+    _CONFIG_LOADED = True
@@ -13,18 +13,32 @@
 #  limitations under the License.
 
 """API point for cli command."""
-
-from subprocess import Popen, PIPE
-from time import sleep
+from json import loads
 
 from locust.process_tools import (list_process, get_process, kill_process,
-                                  resume_process, suspend_process)
+                                  resume_process, suspend_process, get_stats)
 from locust.node_tools import (shutdown_node, restart_node,
                                disable_network_adapters,
                                enable_network_adapters,
                                list_network_adapters, blink_networking,
                                block_dnsname)
 from locust.resource_tools import burn_cpu, burn_ram, burn_disk
+from locust.exec_tools import (exec_command, exec_commands, stream_command,
+                               DEF_EXEC_TIMEOUT, DEF_EXEC_WORKERS,
+                               DEF_OUTPUT_LIMIT)
+from locust.relay_tools import relay
+from locust.partition_tools import block_peers, heal_partition
+from locust.scenario_tools import (get_runs as get_scenario_runs,
+                                   is_failed, DEF_SCENARIO_TIMEOUT)
+from locust.schedule_tools import (get_manager as get_schedule_manager,
+                                   resume_schedules as resume_stored_schedules,
+                                   is_available as is_schedule_available,
+                                   DEF_MISFIRE_GRACE_TIME, DEF_LATE_AFTER)
+from locust.common import message_wrapper
+from locust.serviceutils import MODULE_CFG_PATH
+
+DEF_RELAY_TIMEOUT = 60
+SCHEDULE_COMMANDS = ('create_schedule', 'list_schedules', 'delete_schedule')
 
 
 class Agent(object):
@@ -88,6 +102,24 @@ class Agent(object):
         result = list_process()
         return dict(list=result)
 
+    @staticmethod
+    def get_stats(names=None, interval=0.2):
+        """
+        Return lightweight load stats of the node and of named processes.
+
+        Arguments:
+            names - list of process name patterns to get stats of;
+            interval - seconds CPU usage is measured, up to 1 second.
+
+        Return:
+            {cpu, memory, load, cpu_count, processes: {<pattern>: {count,
+            cpu, rss, connections}}}.
+
+        Example:
+            butcher-agent get stats --names=mysqld
+        """
+        return get_stats(names=names, interval=interval)
+
     @staticmethod
     def resume_process(pids=None, names=None):
         """
@@ -221,7 +253,9 @@ class Agent(object):
 
     @staticmethod
     def exec_command(cmd, result_should_contain=None,
-                     result_should_not_contain=None):
+                     result_should_not_contain=None,
+                     timeout=DEF_EXEC_TIMEOUT, output_limit=DEF_OUTPUT_LIMIT,
+                     stream=False):
         """
         execute shell/batch command on host.
 
@@ -230,37 +264,42 @@ class Agent(object):
             result_should_contain - optional argument to pass string
                                     that must be in result;
             result_should_not_contain - optional argument to pass string
-                                        that must be not presented in result.
+                                        that must be not presented in result;
+            timeout - seconds before the command is killed (Default: 30 sec);
+            output_limit - max bytes of output to keep (head and tail);
+            stream - return output by chunks as soon as they are produced.
 
         Example:
             butcher-agent exec command 'pwd' --result_should_contain='home'
         """
-        # http://stackoverflow.com/questions/14280372/pylint-false-positive-
-        # e1101-instance-of-popen-has-no-poll-member
-        #pylint: disable=E1101
-        res = Popen(cmd, stdout=PIPE, stderr=PIPE, shell=True)
-        for _ in range(60):
-            if not res.poll():
-                break
-            sleep(0.5)
-        else:
-            res.kill()
-        data = res.communicate()
-        data_result = data[0]
-        data_result += data[1]
-        result = {
-            "cmd": cmd,
-            "result": data[0][:-1],
-            "error": data[1]
-        }
-
-        chk = lambda x: x in data_result
-        if result_should_contain:
-            result['result_should_contain'] = chk(result_should_contain)
-        if result_should_not_contain:
-            result['result_should_not_contain'] = not chk(
-                result_should_not_contain)
-        return result
+        runner = stream_command if stream else exec_command
+        return runner(cmd, result_should_contain=result_should_contain,
+                      result_should_not_contain=result_should_not_contain,
+                      timeout=timeout, output_limit=output_limit)
+
+    @staticmethod
+    def exec_commands(cmds, timeout=DEF_EXEC_TIMEOUT,
+                      workers=DEF_EXEC_WORKERS, output_limit=DEF_OUTPUT_LIMIT):
+        """
+        Execute a list of shell/batch commands concurrently.
+
+        Arguments:
+            cmds - list of commands. Each command is a string or a dict
+                   {"cmd": ..., "timeout": ..., "result_should_contain": ...}
+                   with per-command options;
+            timeout - default seconds before a command is killed;
+            workers - max amount of commands running at the same time,
+                      up to 32;
+            output_limit - default max bytes of output to keep per command.
+
+        Return:
+            {list: [{command1_result}, ..., {commandN_result}], duration}.
+
+        Example:
+            butcher-agent exec commands 'uptime' --workers=2
+        """
+        return exec_commands(cmds, timeout=timeout, workers=workers,
+                             output_limit=output_limit)
 
     @staticmethod
     def block_dnsname(dnsname, timeout=30):
@@ -272,3 +311,240 @@ class Agent(object):
             timeout - how long changes will take affect
         """
         return block_dnsname(dnsname, timeout=timeout)
+
+    @staticmethod
+    def block_peers(peers, timeout=0):
+        """
+        Drop all traffic between this node and the peers. Rules are loaded
+        by one nftables or iptables batch.
+
+        Arguments:
+            peers - list of IP addresses or host names of the peers;
+            timeout - seconds after which the partition heals itself, never
+                      if 0.
+
+        Return:
+            {list: [{status, message}], blocked_at, peers, backend}
+
+        Example:
+            butcher-agent block peers 10.0.0.2,10.0.0.3 --timeout=60
+        """
+        return block_peers(peers, timeout=timeout)
+
+    @staticmethod
+    def heal_partition():
+        """
+        Remove all rules added by block_peers.
+
+        Return:
+            {list: [{status, message}], healed_at}
+        """
+        return heal_partition()
+
+    @staticmethod
+    def relay(name, command, arguments=None, targets=None,
+              timeout=DEF_RELAY_TIMEOUT):
+        """
+        Execute a command on this agent and on the downstream agents.
+
+        Arguments:
+            name - name of this agent in the results;
+            command - name of the command to execute;
+            arguments - dict of arguments of the command;
+            targets - list of downstream agents {"name": ..., "address": ...,
+                      "token": ..., "targets": [...]}. Every target relays
+                      the command to its own targets;
+            timeout - seconds to wait for the downstream agents.
+
+        Return:
+            {<agent name>: <result>} of this agent and all downstream
+            agents. Errors are {"status": ..., "value": ...}.
+        """
+        if command == 'relay' or \
+                not isinstance(Agent.__dict__.get(command), staticmethod):
+            raise TypeError('Command %r could not be relayed' % command)
+
+        def local():
+            """Execute the command on this agent."""
+            try:
+                #pylint: disable=W0142
+                return getattr(Agent, command)(**(arguments or {}))
+            except TypeError as ex:
+                return {'status': 'wrong_parameters', 'value': str(ex)}
+            #pylint: disable=W0703
+            except Exception as ex:
+                return {'status': 'unexpected_error', 'value': str(ex)}
+
+        return relay(name, local, command, arguments, targets, timeout)
+
+    @staticmethod
+    def run_scenario(steps, timeout=DEF_SCENARIO_TIMEOUT, wait=0,
+                     scenario_id=None):
+        """
+        Start a scenario of agent commands, delays, waits and loops on
+        this agent without round trips to the driver. The scenario runs in
+        background, its trace is returned by get_scenario.
+
+        Arguments:
+            steps - list of steps (or its JSON), e.g.
+                    [{"command": "suspend_process",
+                      "arguments": {"names": ["java"]}},
+                     {"delay": 5},
+                     {"command": "resume_process",
+                      "arguments": {"names": ["java"]}},
+                     {"wait_for": {"command": "get_process",
+                                   "arguments": {"names": ["java"]}},
+                      "until": "not_empty", "timeout": 30}],
+                    see locust.scenario_tools for all kinds of steps;
+            timeout - seconds the scenario may take;
+            wait - seconds to wait for the end of the scenario before
+                   answering;
+            scenario_id - id of the scenario, random by default.
+
+        Return:
+            {scenario_id, status, started_at, duration, max_jitter,
+            trace: [{step, type, planned, started, finished, jitter,
+            ...}]}, status is "running" if the scenario is not finished.
+        """
+        steps = _from_json(steps, 'Steps')
+
+        def execute(command, arguments):
+            """Execute the command of a step on this agent."""
+            return _execute(command, arguments, ('run_scenario', ))
+
+        runs = get_scenario_runs()
+        scenario_id = runs.start(steps, execute, timeout=timeout,
+                                 scenario_id=scenario_id)
+        return runs.get(scenario_id, wait=wait)
+
+    @staticmethod
+    def get_scenario(scenario_id, wait=0):
+        """
+        Return the trace of a running or finished scenario.
+
+        Arguments:
+            scenario_id - id returned by run_scenario;
+            wait - seconds to wait for the end of a running scenario.
+
+        Return:
+            {scenario_id, status, started_at, duration, max_jitter, trace}
+            as run_scenario does.
+        """
+        try:
+            return get_scenario_runs().get(scenario_id, wait=wait)
+        except KeyError:
+            return message_wrapper('No scenario %s' % scenario_id,
+                                   status='error')
+
+    @staticmethod
+    def create_schedule(command, arguments=None, interval=None, cron=None,
+                        schedule_id=None,
+                        misfire_grace_time=DEF_MISFIRE_GRACE_TIME,
+                        late_after=DEF_LATE_AFTER):
+        """
+        Execute an agent command periodically. Schedules are kept over
+        agent restarts.
+
+        Arguments:
+            command - name of the command to execute;
+            arguments - dict of arguments of the command (or its JSON);
+            interval - seconds between runs;
+            cron - crontab expression of runs, e.g. "*/5 * * * *", either
+                   interval or cron should be given;
+            schedule_id - id of the schedule, a schedule with the same id
+                          is replaced. Random by default;
+            misfire_grace_time - seconds a run may start late, it is
+                                 counted as missed after that;
+            late_after - seconds after which a started run is counted as
+                         late.
+
+        Return:
+            {id, command, arguments, interval, cron, next_run_time, runs,
+            errors, late, missed, missed_while_down, max_lateness, ...}
+
+        Example:
+            butcher-agent create schedule burn_cpu --interval=3600
+                --arguments='{"timeout": 300}'
+        """
+        if not is_schedule_available():
+            return message_wrapper('apscheduler is not installed',
+                                   status='error')
+        if command in SCHEDULE_COMMANDS or \
+                not isinstance(Agent.__dict__.get(command), staticmethod):
+            raise TypeError('Command %r could not be scheduled' % command)
+        return _schedules().create(
+            command, _from_json(arguments, 'Arguments'),
+            interval_seconds=interval, crontab=cron, schedule_id=schedule_id,
+            misfire_grace_time=misfire_grace_time, late_after=late_after)
+
+    @staticmethod
+    def list_schedules():
+        """
+        Return all schedules of this agent with counters of their runs.
+
+        Return:
+            {list: [{id, command, arguments, interval, cron, next_run_time,
+            runs, errors, late, missed, missed_while_down, max_lateness,
+            last_lateness, last_run, last_status, last_missed}]}
+        """
+        if not is_schedule_available():
+            return message_wrapper('apscheduler is not installed',
+                                   status='error')
+        return dict(list=_schedules().list())
+
+    @staticmethod
+    def delete_schedule(schedule_id):
+        """
+        Stop and remove the schedule.
+
+        Arguments:
+            schedule_id - id of the schedule.
+
+        Return:
+            {list: [{status, message}]}
+        """
+        if not is_schedule_available():
+            return message_wrapper('apscheduler is not installed',
+                                   status='error')
+        try:
+            _schedules().delete(schedule_id)
+        except KeyError:
+            return message_wrapper('No schedule %s' % schedule_id,
+                                   status='error')
+        return message_wrapper('Schedule %s is deleted' % schedule_id)
+
+
+def _from_json(value, name):
+    """Return the value decoded if it is JSON string."""
+    if isinstance(value, basestring):
+        try:
+            return loads(value)
+        except ValueError as ex:
+            raise TypeError('%s are not valid JSON: %s' % (name, ex))
+    return value
+
+
+def _execute(command, arguments, forbidden=()):
+    """Execute the agent command on behalf of a scenario or a schedule."""
+    if command in forbidden or \
+            not isinstance(Agent.__dict__.get(command), staticmethod):
+        raise TypeError('Command %r could not be used here' % command)
+    #pylint: disable=W0142
+    return getattr(Agent, command)(**(arguments or {}))
+
+
+def _execute_scheduled(command, arguments):
+    """Execute the command of a schedule."""
+    return _execute(command, arguments, SCHEDULE_COMMANDS)
+
+
+def _schedules():
+    """Return the schedule manager of this agent."""
+    return get_schedule_manager(MODULE_CFG_PATH, _execute_scheduled,
+                                is_failed)
+
+
+def resume_schedules():
+    """Resume stored schedules of this agent, called when it starts."""
+    return resume_stored_schedules(MODULE_CFG_PATH, _execute_scheduled,
+                                   is_failed)
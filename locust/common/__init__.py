@@ -37,6 +37,57 @@ from os import path, makedirs, remove, getuid
 from sys import stdout
 from glob import glob
 from functools import wraps
+from importlib import import_module
+from threading import current_thread
+from time import sleep
+
+class LazyModule(object):
+    """Module proxy that imports the module on first attribute access.
+
+    Allows heavy modules to be imported only by commands that use them.
+
+    Examples:
+        psutil = LazyModule('psutil')
+        psutil.pid_exists(1)  # psutil is imported here
+    """
+    #pylint: disable=R0903
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self.__dict__['_module'] = import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def in_gevent_hub():
+    """Check if the code runs in the thread of the gevent hub.
+
+    The agent serves requests by greenlets of the main thread without
+    monkey patching, so a blocking call there stops all requests.
+    """
+    return 'gevent' in modules and current_thread().name == 'MainThread'
+
+
+def cooperative_sleep(seconds):
+    """Sleep without blocking other greenlets of the gevent hub."""
+    if in_gevent_hub():
+        import_module('gevent').sleep(seconds)
+    else:
+        sleep(seconds)
+
+
+def select_readable(fds, timeout):
+    """Wait until some of the file descriptors are readable.
+
+    Returns the list of readable descriptors, waits cooperatively in the
+    thread of the gevent hub.
+    """
+    select = import_module('gevent.select' if in_gevent_hub() else 'select')
+    return select.select(fds, [], [], timeout)[0]
+
 
 def is_sudoer(stderr=False):
     """Check is user sudoer"""
@@ -14,6 +14,7 @@
 
 """Common module for all cli generators."""
 import sys
+from types import GeneratorType
 from inspect import getargspec, getdoc, ismethod
 from json import dumps
 from optparse import OptionParser
@@ -109,7 +110,14 @@ def cli_main(apis, argv, exit_code=2):
 
         try:
             #pylint: disable=W0142
-            res = dumps(cmd(*args, **options), indent=2)
+            res = cmd(*args, **options)
+            if isinstance(res, GeneratorType):
+                for chunk in res:
+                    if stderr:
+                        print dumps(chunk)
+                        sys.stdout.flush()
+                continue
+            res = dumps(res, indent=2)
             if stderr:
                 print res
         except TypeError as ex:
@@ -0,0 +1,159 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Agent clock module.
+
+Commands with "start_at" (a wall clock time of the driver) are started by
+the agent at that time. The agent estimates the offset of its clock from
+the driver clock with "sent_at" timestamps of requests and waits on the
+monotonic clock, which is not affected by clock adjustments.
+
+Python 2 has no time.monotonic, CLOCK_MONOTONIC is read with ctypes where
+it is available. The driver has a copy of the clock without the agent
+dependencies (locustdriver.clock), change them together.
+"""
+import ctypes
+import ctypes.util
+import os
+from collections import deque
+from threading import Lock
+from time import time
+
+from locust.common import cooperative_sleep
+
+__all__ = ['monotonic', 'sleep_until', 'ClockSync', 'SPIN']
+
+CLOCK_MONOTONIC = 1
+# The last part of a wait is spent in a busy loop, sleep() could oversleep
+SPIN = 0.002
+DEF_WINDOW = 16
+DEF_MAX_AGE = 300
+DEF_MAX_LEAD = 300
+
+
+class _Timespec(ctypes.Structure):
+    """struct timespec"""
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+
+def _load_clock_gettime():
+    """Return clock_gettime of the C library or None."""
+    if os.name != 'posix':
+        return None
+    for name in ('c', 'rt'):
+        lib = ctypes.util.find_library(name)
+        if not lib:
+            continue
+        try:
+            func = ctypes.CDLL(lib, use_errno=True).clock_gettime
+        except (OSError, AttributeError):
+            continue
+        func.argtypes = [ctypes.c_int, ctypes.POINTER(_Timespec)]
+        return func
+    return None
+
+_CLOCK_GETTIME = _load_clock_gettime()
+
+
+def monotonic():
+    """Return CLOCK_MONOTONIC seconds, wall clock time if it is not
+    available."""
+    if _CLOCK_GETTIME is None:
+        return time()
+    spec = _Timespec()
+    if _CLOCK_GETTIME(CLOCK_MONOTONIC, ctypes.byref(spec)):
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return spec.tv_sec + spec.tv_nsec * 1e-9
+
+
+def sleep_until(deadline, spin=SPIN):
+    """Wait until monotonic() reaches the deadline.
+
+    Sleeps until "spin" seconds before the deadline and spins after that.
+    The sleep lets other greenlets of the agent run.
+    """
+    while True:
+        left = deadline - monotonic()
+        if left <= 0:
+            return
+        if left > spin:
+            cooperative_sleep(left - spin)
+
+
+class ClockSync(object):
+    """Estimation of the offset of the agent clock from the driver clock.
+
+    Every request gives a sample: agent time of receiving minus driver time
+    of sending. It is the clock offset plus the network delay, so the
+    sample with the least value of the recent ones is the most accurate
+    one (min filter). Half of the round trip time reported by the driver is
+    subtracted as the estimation of the delay.
+
+    Offset is agent time - driver time. Commands could be started at most
+    max_lead seconds ahead, a request must not hold the agent longer.
+    """
+
+    def __init__(self, window=DEF_WINDOW, max_age=DEF_MAX_AGE,
+                 max_lead=DEF_MAX_LEAD):
+        self.max_age = max_age
+        self.max_lead = max_lead
+        self._samples = deque(maxlen=window)
+        self._lock = Lock()
+
+    def add_sample(self, received, sent_at, rtt=None):
+        """Add the sample of a request.
+
+        Args:
+          received (float): Agent wall clock time the request was received.
+          sent_at (float): Driver wall clock time the request was sent.
+          rtt (float): Round trip time between the driver and the agent.
+        """
+        with self._lock:
+            self._samples.append((received - float(sent_at),
+                                  float(rtt or 0) / 2, received))
+
+    def offset(self):
+        """Return the estimated offset, 0 if there are no samples."""
+        now = time()
+        with self._lock:
+            samples = [each for each in self._samples
+                       if now - each[2] <= self.max_age]
+        if not samples:
+            return 0.0
+        delta, delay, _ = min(samples)
+        return delta - delay
+
+    def check_lead(self, start_at):
+        """Raise ValueError if the driver clock time start_at is more than
+        max_lead seconds ahead."""
+        lead = float(start_at) + self.offset() - time()
+        if lead > self.max_lead:
+            raise ValueError('start_at is %.1f seconds ahead, max lead is '
+                             '%s seconds' % (lead, self.max_lead))
+
+    def wait(self, start_at):
+        """Wait until the driver clock time start_at.
+
+        Returns:
+          dict: {"started_at": <agent wall clock time of the start>,
+            "start_error": <seconds the start was late in the driver
+            clock>, "clock_offset": <offset used>}.
+        """
+        offset = self.offset()
+        sleep_until(monotonic() + float(start_at) + offset - time())
+        started = time()
+        return dict(started_at=started,
+                    start_error=started - offset - float(start_at),
+                    clock_offset=offset)
@@ -0,0 +1,105 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Response encoding module.
+
+Agent responses are negotiated by request headers:
+  * "Accept: application/vnd.locust.compact+json" - lists of records are
+    sent in columnar form. Fields that have the same value in every record
+    are sent once, every other field is sent as an array of values.
+  * "Accept-Encoding: gzip" - bodies bigger than GZIP_MIN_SIZE are gzipped.
+"""
+import zlib
+from json import dumps
+
+__all__ = ['encode_response', 'compact_records', 'JSON_MIMETYPE',
+           'COMPACT_MIMETYPE', 'COMPACT_MARKER']
+
+JSON_MIMETYPE = 'application/json'
+COMPACT_MIMETYPE = 'application/vnd.locust.compact+json'
+COMPACT_MARKER = '__compact__'
+GZIP_MIN_SIZE = 1400
+GZIP_LEVEL = 6
+
+
+def compact_records(records):
+    """Convert a list of records with the same fields to columnar form.
+
+    Args:
+      records (list): List of dictionaries.
+
+    Returns:
+      dict: {"__compact__": 1, "length": <count>, "const": {<field>: value},
+        "columns": {<field>: [values]}} or the given records unchanged if
+        they could not be compacted.
+
+    Examples:
+        compact_records([{'a': 1, 'b': 1}, {'a': 2, 'b': 1}]) ==>
+        {'__compact__': 1, 'length': 2, 'const': {'b': 1},
+         'columns': {'a': [1, 2]}}
+    """
+    if not (isinstance(records, list) and len(records) > 1 and
+            all(isinstance(each, dict) for each in records)):
+        return records
+    fields = set(records[0])
+    if any(set(each) != fields for each in records):
+        return records
+    const, columns = {}, {}
+    for field in fields:
+        values = [each[field] for each in records]
+        first = values[0]
+        if all(value == first for value in values):
+            const[field] = first
+        else:
+            columns[field] = values
+    return {COMPACT_MARKER: 1, 'length': len(records), 'const': const,
+            'columns': columns}
+
+
+def _compact(value):
+    """Compact lists of records in the top level of a response."""
+    if isinstance(value, dict):
+        return dict((k, compact_records(v)) for k, v in value.items())
+    return compact_records(value)
+
+
+def _accepts(header, token):
+    """Check if a comma separated header contains the given token."""
+    return any(each.split(';')[0].strip().lower() == token
+               for each in (header or '').split(','))
+
+
+def encode_response(value, accept=None, accept_encoding=None):
+    """Serialize a command result according to request headers.
+
+    Args:
+      value: JSON serializable command result.
+      accept (str): Value of the request Accept header.
+      accept_encoding (str): Value of the request Accept-Encoding header.
+
+    Returns:
+      tuple: (<body>, <dict of response headers>).
+    """
+    mimetype = JSON_MIMETYPE
+    if _accepts(accept, COMPACT_MIMETYPE):
+        mimetype = COMPACT_MIMETYPE
+        value = _compact(value)
+    body = dumps(value) + '\n'
+    headers = {'Content-Type': mimetype, 'Vary': 'Accept, Accept-Encoding'}
+    if len(body) >= GZIP_MIN_SIZE and _accepts(accept_encoding, 'gzip'):
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED,
+                                      16 + zlib.MAX_WBITS)
+        body = compressor.compress(body) + compressor.flush()
+        headers['Content-Encoding'] = 'gzip'
+    return body, headers
@@ -0,0 +1,413 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""Exec tools commands."""
+import os
+import signal
+from subprocess import Popen, PIPE
+from threading import Thread
+from Queue import Queue, Empty
+from time import time
+from types import StringTypes
+
+from locust.common import IS_WINDOWS
+from locust.common import (convert_timeout, cooperative_sleep,
+                           select_readable)
+
+
+DEF_EXEC_TIMEOUT = 30
+DEF_EXEC_WORKERS = 4
+MAX_EXEC_WORKERS = 32
+DEF_OUTPUT_LIMIT = 64 * 1024
+CHUNK_SIZE = 4096
+TRUNCATED_MSG = '\n...[{count} bytes truncated]...\n'
+
+
+class OutputBuffer(object):
+    """
+    Bounded output buffer.
+
+    Keeps the first and the last half of the limit of a stream and drops
+    everything in between, so a huge output can not exhaust agent memory.
+    """
+
+    def __init__(self, limit=DEF_OUTPUT_LIMIT):
+        limit = max(int(limit), 2)
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def write(self, data):
+        """Append a chunk of data to the buffer."""
+        self.total += len(data)
+        free = self.head_limit - len(self.head)
+        if free > 0:
+            self.head.extend(data[:free])
+            data = data[free:]
+        if data:
+            self.tail.extend(data)
+            excess = len(self.tail) - self.tail_limit
+            if excess > 0:
+                del self.tail[:excess]
+
+    @property
+    def truncated(self):
+        """Amount of bytes dropped from the middle of the stream."""
+        return self.total - len(self.head) - len(self.tail)
+
+    def getvalue(self):
+        """Return buffered data as a string."""
+        if self.truncated:
+            return (str(self.head) +
+                    TRUNCATED_MSG.format(count=self.truncated) +
+                    str(self.tail))
+        return str(self.head + self.tail)
+
+
+class StreamMatcher(object):
+    """
+    Incremental substring matcher.
+
+    Checks a pattern against chunks as they arrive. The tail of the previous
+    chunk is carried over, so a pattern split between chunks is found too.
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.found = False
+        self._carry = ''
+
+    def feed(self, data):
+        """Check the next chunk and return True if pattern was found."""
+        if self.found:
+            return True
+        window = self._carry + data
+        if self.pattern in window:
+            self.found = True
+        elif len(self.pattern) > 1:
+            self._carry = window[-(len(self.pattern) - 1):]
+        return self.found
+
+
+def _read_pipe(name, pipe, queue):
+    """Read a process pipe by chunks and put them to the queue."""
+    try:
+        while True:
+            data = os.read(pipe.fileno(), CHUNK_SIZE)
+            if not data:
+                break
+            queue.put((name, data))
+    except (OSError, IOError, ValueError):
+        pass
+    finally:
+        queue.put((name, None))
+
+
+def _kill(process):
+    """Kill a process started by _start_process with all its children."""
+    try:
+        if IS_WINDOWS:
+            os.system('taskkill /T /F /PID %d >NUL 2>&1' % process.pid)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    try:
+        process.kill()
+    except OSError:
+        pass
+
+
+def _start_process(cmd):
+    """Start a shell command in its own process group."""
+    # http://stackoverflow.com/questions/14280372/pylint-false-positive-
+    # e1101-instance-of-popen-has-no-poll-member
+    #pylint: disable=E1101
+    if IS_WINDOWS:
+        return Popen(cmd, stdout=PIPE, stderr=PIPE, shell=True)
+    return Popen(cmd, stdout=PIPE, stderr=PIPE, shell=True,
+                 preexec_fn=os.setsid)
+
+
+def _wait_process(process, deadline):
+    """Wait for the process exit cooperatively, return False on timeout."""
+    while process.poll() is None:
+        if time() >= deadline:
+            return False
+        cooperative_sleep(0.05)
+    return True
+
+
+def _thread_output(process, deadline, state):
+    """Yield output chunks read by threads (pipes can't be selected on
+    Windows)."""
+    queue = Queue()
+    readers = [Thread(target=_read_pipe, args=(name, pipe, queue))
+               for name, pipe in (('stdout', process.stdout),
+                                  ('stderr', process.stderr))]
+    for reader in readers:
+        reader.daemon = True
+        reader.start()
+    opened = len(readers)
+    while opened:
+        remaining = deadline - time()
+        if remaining <= 0:
+            state['timed_out'] = True
+            return
+        try:
+            name, data = queue.get(timeout=min(remaining, 1))
+        except Empty:
+            continue
+        if data is None:
+            opened -= 1
+        else:
+            yield name, data
+
+
+def _select_output(process, deadline, state):
+    """Yield output chunks of readable pipes, waits are cooperative."""
+    pipes = {process.stdout.fileno(): 'stdout',
+             process.stderr.fileno(): 'stderr'}
+    while pipes:
+        remaining = deadline - time()
+        if remaining <= 0:
+            state['timed_out'] = True
+            return
+        for fd in select_readable(list(pipes), min(remaining, 1)):
+            data = os.read(fd, CHUNK_SIZE)
+            if data:
+                yield pipes[fd], data
+            else:
+                del pipes[fd]
+
+
+def _iter_output(cmd, timeout):
+    """
+    Run a command and yield its output chunks.
+
+    Yields (stream_name, data) tuples while the command is running and
+    ('exit', state) tuple at the end, where state is a dict with the exit
+    code, the timeout flag and the duration of the command. On timeout
+    the whole process group of the command is killed, its orphaned
+    processes are reaped by init.
+    """
+    start = time()
+    deadline = start + timeout
+    process = _start_process(cmd)
+    state = {'timed_out': False}
+    read = _thread_output if IS_WINDOWS else _select_output
+    try:
+        for chunk in read(process, deadline, state):
+            yield chunk
+        if not state['timed_out'] and not _wait_process(process, deadline):
+            state['timed_out'] = True
+    finally:
+        if process.poll() is None:
+            _kill(process)
+        exit_code = process.wait()
+        for pipe in (process.stdout, process.stderr):
+            pipe.close()
+    yield 'exit', {'exit_code': exit_code,
+                   'timed_out': state['timed_out'],
+                   'duration': round(time() - start, 3)}
+
+
+def _matchers(result_should_contain, result_should_not_contain):
+    """Create stream matchers for the result checks."""
+    matchers = {}
+    for key, pattern in (('result_should_contain', result_should_contain),
+                         ('result_should_not_contain',
+                          result_should_not_contain)):
+        if pattern:
+            matchers[key] = dict((name, StreamMatcher(pattern))
+                                 for name in ('stdout', 'stderr'))
+    return matchers
+
+
+def _check_matchers(matchers):
+    """Return result checks according to the original semantic."""
+    result = {}
+    for key, streams in matchers.items():
+        found = any(each.found for each in streams.values())
+        result[key] = found if key == 'result_should_contain' else not found
+    return result
+
+
+def exec_command(cmd, result_should_contain=None,
+                 result_should_not_contain=None, timeout=DEF_EXEC_TIMEOUT,
+                 output_limit=DEF_OUTPUT_LIMIT):
+    """
+    Execute shell/batch command and return its bounded output.
+
+    Arguments:
+        cmd - string representation of command to be executed;
+        result_should_contain - string that must be in result;
+        result_should_not_contain - string that must not be in result;
+        timeout - seconds before the command is killed (Default: 30 sec);
+        output_limit - max bytes kept for each of stdout and stderr.
+                       Head and tail of the output are kept.
+
+    Return:
+        {cmd, result, error, exit_code, timed_out, duration, truncated}
+        where truncated is the amount of dropped output bytes.
+    """
+    timeout = convert_timeout(timeout, def_timeout=DEF_EXEC_TIMEOUT)
+    buffers = dict((name, OutputBuffer(output_limit))
+                   for name in ('stdout', 'stderr'))
+    matchers = _matchers(result_should_contain, result_should_not_contain)
+    state = {}
+    for name, data in _iter_output(cmd, timeout):
+        if name == 'exit':
+            state = data
+            continue
+        buffers[name].write(data)
+        for streams in matchers.values():
+            streams[name].feed(data)
+
+    output = buffers['stdout'].getvalue()
+    result = {
+        'cmd': cmd,
+        'result': output[:-1] if output.endswith('\n') else output,
+        'error': buffers['stderr'].getvalue(),
+        'truncated': sum(each.truncated for each in buffers.values())
+    }
+    result.update(state)
+    result.update(_check_matchers(matchers))
+    return result
+
+
+def stream_command(cmd, result_should_contain=None,
+                   result_should_not_contain=None, timeout=DEF_EXEC_TIMEOUT,
+                   output_limit=DEF_OUTPUT_LIMIT):
+    """
+    Execute shell/batch command and yield its output by chunks.
+
+    Arguments are the same as for exec_command. output_limit bounds the
+    overall amount of streamed bytes, the rest of output is counted only.
+
+    Yields:
+        {stream, data} for every output chunk;
+        {<check_name>: bool} as soon as a result check is matched;
+        {cmd, exit_code, timed_out, duration, truncated, <checks>} at the end.
+    """
+    timeout = convert_timeout(timeout, def_timeout=DEF_EXEC_TIMEOUT)
+    limit = int(output_limit)
+    matchers = _matchers(result_should_contain, result_should_not_contain)
+    sent = dropped = 0
+    state = {}
+    for name, data in _iter_output(cmd, timeout):
+        if name == 'exit':
+            state = data
+            continue
+        for key, streams in matchers.items():
+            was_found = any(each.found for each in streams.values())
+            if streams[name].feed(data) and not was_found:
+                yield _check_matchers({key: streams})
+        if sent < limit:
+            chunk = data[:limit - sent]
+            sent += len(chunk)
+            dropped += len(data) - len(chunk)
+            yield {'stream': name, 'data': chunk}
+        else:
+            dropped += len(data)
+    result = {'cmd': cmd, 'truncated': dropped}
+    result.update(state)
+    result.update(_check_matchers(matchers))
+    yield result
+
+
+def _parse_exec_task(task, timeout, output_limit):
+    """
+    Convert an exec_commands item to exec_command keyword arguments.
+
+    An item is either a command string or a dict with the "cmd" key and
+    optional exec_command arguments which override the common ones.
+    """
+    kwargs = {'timeout': timeout, 'output_limit': output_limit}
+    if isinstance(task, StringTypes):
+        kwargs['cmd'] = task
+    elif isinstance(task, dict) and task.get('cmd'):
+        allowed = ('cmd', 'timeout', 'output_limit', 'result_should_contain',
+                   'result_should_not_contain')
+        unknown = [key for key in task if key not in allowed]
+        if unknown:
+            raise TypeError('Unknown exec_commands options: %s. Allowed: %s' %
+                            (', '.join(unknown), ', '.join(allowed)))
+        kwargs.update(task)
+    else:
+        raise TypeError('Can\'t parse command. Type: %s. Value: %s.' % (
+            type(task), task))
+    return kwargs
+
+
+def exec_commands(cmds, timeout=DEF_EXEC_TIMEOUT, workers=DEF_EXEC_WORKERS,
+                  output_limit=DEF_OUTPUT_LIMIT):
+    """
+    Execute a list of shell/batch commands concurrently.
+
+    Arguments:
+        cmds - list of commands. Each command is a string or a dict with
+               "cmd" key and optional "timeout", "output_limit",
+               "result_should_contain", "result_should_not_contain" keys;
+        timeout - default seconds before a command is killed (Default: 30);
+        workers - max amount of commands running at the same time, up to
+                  MAX_EXEC_WORKERS;
+        output_limit - default max bytes kept for each command output.
+
+    Return:
+        {list: [{command1_result}, ..., {commandN_result}], duration}
+        Results are in the same order as given commands.
+    """
+    if isinstance(cmds, StringTypes):
+        cmds = [cmds]
+    if not cmds or not isinstance(cmds, (list, tuple)):
+        raise TypeError('Specify at least one command')
+    tasks = Queue()
+    for index, task in enumerate(cmds):
+        tasks.put((index, _parse_exec_task(task, timeout, output_limit)))
+    results = [None] * len(cmds)
+
+    def _worker():
+        """Execute commands from the tasks queue until it is empty."""
+        while True:
+            try:
+                index, kwargs = tasks.get_nowait()
+            except Empty:
+                return
+            try:
+                #pylint: disable=W0142
+                results[index] = exec_command(**kwargs)
+            #pylint: disable=W0703
+            except Exception as ex:
+                results[index] = {'cmd': kwargs['cmd'], 'exit_code': None,
+                                  'error': str(ex), 'timed_out': False,
+                                  'duration': 0}
+
+    start = time()
+    try:
+        workers = min(max(int(workers), 1), MAX_EXEC_WORKERS)
+    except (TypeError, ValueError):
+        workers = DEF_EXEC_WORKERS
+    threads = [Thread(target=_worker)
+               for _ in range(min(workers, len(cmds)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(0.01)
+            cooperative_sleep(0.05)
+    return dict(list=results, duration=round(time() - start, 3))
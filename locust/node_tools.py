@@ -21,7 +21,7 @@ from threading import Thread
 from inspect import isfunction
 
 from locust.common import (parse_args_list, message_wrapper, sudo_require,
-                           convert_timeout)
+                           convert_timeout, LazyModule)
 from locust.common import IS_WINDOWS
 
 
@@ -29,8 +29,8 @@ if IS_WINDOWS:
     #pylint: disable=F0401
     from win32api import GetSystemDirectory as sys_path
 else:
-    #pylint: disable=E0611
-    from netifaces import interfaces
+    #pylint: disable=C0103
+    netifaces = LazyModule('netifaces')
 
 
 def _run_thread(target, args=None, ret_msg=''):
@@ -113,7 +113,7 @@ def enable_network_adapters(adapters=None):
         # +source/gnome-settings-daemon/+bug/1072518
         # os.system('service networking restart')
         if not loc_adapters:
-            loc_adapters = interfaces()
+            loc_adapters = netifaces.interfaces()
 
     if loc_adapters:
         for adapter in loc_adapters:
@@ -149,7 +149,7 @@ def _disable_network_adapters(adapters=None, timeout=0):
     else:
         cmd_ptrn = 'ifconfig {name} down'
         if not adapters:
-            adapters = interfaces()
+            adapters = netifaces.interfaces()
 
     if adapters:
         for adapter in adapters:
@@ -179,7 +179,7 @@ def list_network_adapters():
         result = WMI().query(query)
         net_adapters = [i.NetConnectionID for i in result if i.PhysicalAdapter]
     else:
-        net_adapters = interfaces()
+        net_adapters = netifaces.interfaces()
     return net_adapters
 
 
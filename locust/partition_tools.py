@@ -0,0 +1,213 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Network partition commands.
+
+Traffic to and from the given peers is dropped while the node stays
+reachable by everybody else. All rules are loaded by one batch, so they
+are applied and removed atomically: by "nft -f -" into the own
+"inet locust_partition" table if nftables is installed, by
+"iptables-restore --noflush" into the own LOCUST_PARTITION chain
+otherwise.
+
+Addresses of the node itself (loopback and addresses of its interfaces)
+are never blocked, so peers on the same host do not cut the agent off
+its control port.
+"""
+import socket
+from distutils.spawn import find_executable
+from subprocess import Popen, PIPE
+from threading import Lock, Timer
+from time import time
+
+from locust.common import IS_WINDOWS
+from locust.common import (convert_timeout, message_wrapper, sudo_require,
+                           LazyModule)
+
+NFT_TABLE = 'locust_partition'
+IPTABLES_CHAIN = 'LOCUST_PARTITION'
+
+_LOCK = Lock()
+_STATE = {'timer': None}
+
+#pylint: disable=C0103
+netifaces = LazyModule('netifaces')
+
+
+def nft_script(peers):
+    """Return nft batch that replaces the partition table.
+
+    The table is added first, so that its deletion does not fail when it
+    does not exist.
+    """
+    lines = ['add table inet %s' % NFT_TABLE,
+             'delete table inet %s' % NFT_TABLE]
+    if peers:
+        addresses = ', '.join(peers)
+        lines += ['table inet %s {' % NFT_TABLE,
+                  '  chain input {',
+                  '    type filter hook input priority 0; policy accept;',
+                  '    ip saddr { %s } drop' % addresses,
+                  '  }',
+                  '  chain output {',
+                  '    type filter hook output priority 0; policy accept;',
+                  '    ip daddr { %s } drop' % addresses,
+                  '  }',
+                  '}']
+    return '\n'.join(lines) + '\n'
+
+
+def iptables_batch(peers, add_jumps):
+    """Return iptables-restore batch that replaces rules of the partition
+    chain.
+
+    Declaration of the chain flushes it with --noflush, jumps from INPUT
+    and OUTPUT are added once.
+    """
+    lines = ['*filter', ':%s - [0:0]' % IPTABLES_CHAIN]
+    if add_jumps:
+        lines += ['-I INPUT 1 -j %s' % IPTABLES_CHAIN,
+                  '-I OUTPUT 1 -j %s' % IPTABLES_CHAIN]
+    for peer in peers:
+        lines += ['-A %s -s %s -j DROP' % (IPTABLES_CHAIN, peer),
+                  '-A %s -d %s -j DROP' % (IPTABLES_CHAIN, peer)]
+    lines.append('COMMIT')
+    return '\n'.join(lines) + '\n'
+
+
+def _run(args, data=None):
+    """Run the command with data on stdin, return (<code>, <output>)."""
+    proc = Popen(args, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+    out, err = proc.communicate(data)
+    return proc.returncode, (out + err).strip()
+
+
+def _load_rules(peers):
+    """Replace partition rules with rules of the peers.
+
+    Returns:
+      tuple: (<backend>, <error message or None>).
+    """
+    if find_executable('nft'):
+        code, output = _run(['nft', '-f', '-'], nft_script(peers))
+        return 'nftables', output if code else None
+    if find_executable('iptables-restore'):
+        code, _ = _run(['iptables', '-C', 'INPUT', '-j', IPTABLES_CHAIN])
+        code, output = _run(['iptables-restore', '--noflush'],
+                            iptables_batch(peers, add_jumps=code != 0))
+        return 'iptables', output if code else None
+    return None, 'Neither nft nor iptables-restore is installed'
+
+
+def local_addresses():
+    """Return IPv4 addresses of interfaces and of the host name of the
+    node."""
+    addresses = set()
+    try:
+        addresses.update(socket.gethostbyname_ex(socket.gethostname())[2])
+    except socket.error:
+        pass
+    try:
+        for name in netifaces.interfaces():
+            for record in netifaces.ifaddresses(name).get(
+                    netifaces.AF_INET, []):
+                if record.get('addr'):
+                    addresses.add(record['addr'])
+    except (ImportError, ValueError):
+        pass
+    return addresses
+
+
+def _resolve(peers, local):
+    """Return IPv4 addresses of peer names and addresses and the skipped
+    addresses of the node itself."""
+    if isinstance(peers, basestring):
+        peers = [each for each in peers.split(',') if each]
+    addresses = set(socket.gethostbyname(peer.strip())
+                    for peer in peers or [])
+    skipped = set(address for address in addresses
+                  if address.startswith('127.') or address in local)
+    return sorted(addresses - skipped), sorted(skipped)
+
+
+def _cancel_timer():
+    """Cancel the scheduled heal, the lock should be held."""
+    if _STATE['timer'] is not None:
+        _STATE['timer'].cancel()
+        _STATE['timer'] = None
+
+
+@sudo_require
+def block_peers(peers, timeout=0):
+    """
+    Drop all traffic between the node and the peers.
+
+    Arguments:
+        peers - list of IP addresses or host names of the peers,
+                addresses of the node itself are skipped;
+        timeout - seconds after which the partition heals itself, never
+                  if 0.
+
+    Return:
+        {"list": [{"status", "message"}], "blocked_at": <node time>,
+        "peers": [<addresses>], "skipped": [<own addresses>],
+        "backend": "nftables"|"iptables"}
+    """
+    if IS_WINDOWS:
+        return message_wrapper('Partitions are not supported on Windows',
+                               status='error')
+    try:
+        peers, skipped = _resolve(peers, local_addresses())
+    except socket.error as ex:
+        return message_wrapper('Could not resolve peers: %s' % ex,
+                               status='error')
+    timeout = convert_timeout(timeout, def_timeout=0)
+    with _LOCK:
+        _cancel_timer()
+        backend, error = _load_rules(peers)
+        blocked_at = time()
+        if error:
+            return message_wrapper('Could not block peers: %s' % error,
+                                   status='error')
+        if timeout:
+            _STATE['timer'] = Timer(timeout, heal_partition)
+            _STATE['timer'].daemon = True
+            _STATE['timer'].start()
+    result = message_wrapper('%d peers are blocked' % len(peers))
+    result.update(blocked_at=blocked_at, peers=peers, skipped=skipped,
+                  backend=backend)
+    return result
+
+
+@sudo_require
+def heal_partition():
+    """
+    Remove all partition rules.
+
+    Return:
+        {"list": [{"status", "message"}], "healed_at": <node time>}
+    """
+    if IS_WINDOWS:
+        return message_wrapper('Partitions are not supported on Windows',
+                               status='error')
+    with _LOCK:
+        _cancel_timer()
+        backend, error = _load_rules([])
+        healed_at = time()
+    if error:
+        return message_wrapper('Could not heal partition: %s' % error,
+                               status='error')
+    result = message_wrapper('Partition is healed')
+    result.update(healed_at=healed_at, backend=backend)
+    return result
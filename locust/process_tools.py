@@ -18,12 +18,16 @@ from socket import gethostbyname, gethostname, gaierror
 from uuid import getnode
 from time import time, sleep
 from operator import itemgetter
-from os import getpid
+from os import getpid, getloadavg
 from fnmatch import fnmatch
 
-import psutil
+from locust.common import (parse_pids, parse_args_list, message_wrapper,
+                           LazyModule, cooperative_sleep)
 
-from locust.common import parse_pids, parse_args_list, message_wrapper
+#pylint: disable=C0103
+psutil = LazyModule('psutil')
+
+MAX_STATS_INTERVAL = 1
 
 
 def get_process(pids=None, names=None):
@@ -54,7 +58,7 @@ def get_process(pids=None, names=None):
                         if fnmatch(process.name(), name) or fnmatch(
                                 ' '.join(process.cmdline()), name):
                             processes.append(process)
-                    except psutil.AccessDenied:
+                    except (psutil.AccessDenied, psutil.NoSuchProcess):
                         pass
     result = []
     for process in processes:
@@ -332,3 +336,94 @@ def _resume_process_by_pid(pid):
     """
     process = psutil.Process(pid)
     process.resume()
+
+
+def _matches(process, name):
+    """Check if the process name or command line matches the pattern."""
+    try:
+        return fnmatch(process.name(), name) or fnmatch(
+            ' '.join(process.cmdline()), name)
+    except (psutil.AccessDenied, psutil.NoSuchProcess):
+        return False
+
+
+def _sample(process):
+    """Return (<cpu percent>, <rss>, <connections>) of the process or None
+    if it is gone or not accessible."""
+    try:
+        cpu = process.cpu_percent()
+        rss = process.memory_info()[0]
+    except (psutil.AccessDenied, psutil.NoSuchProcess):
+        return None
+    try:
+        # connections() is renamed to net_connections() by psutil 6
+        connections = getattr(process, 'net_connections', None) or \
+            process.connections
+        connections = len(connections())
+    except (psutil.AccessDenied, psutil.NoSuchProcess):
+        connections = 0
+    return cpu, rss, connections
+
+
+def _process_stats(processes, samples):
+    """Return summary stats of processes by their samples."""
+    stats = dict(count=0, cpu=0.0, rss=0, connections=0)
+    for process in processes:
+        sample = samples.get(process.pid)
+        if sample is None:
+            continue
+        cpu, rss, connections = sample
+        stats['cpu'] += cpu
+        stats['rss'] += rss
+        stats['connections'] += connections
+        stats['count'] += 1
+    stats['cpu'] /= psutil.cpu_count() or 1
+    return stats
+
+
+def get_stats(names=None, interval=0.2):
+    """
+    Return lightweight load stats of the node and of named processes.
+
+    Arguments:
+        names - list of process name patterns to get stats of;
+        interval - seconds CPU usage is measured, up to
+                   MAX_STATS_INTERVAL.
+
+    Return:
+        {"cpu": <percent>, "memory": <percent>, "load": [1, 5, 15 minutes],
+         "cpu_count": <amount>, "processes": {<pattern>: {"count", "cpu",
+         "rss", "connections"}}}. CPU of processes is in percent of all
+        CPUs, rss in bytes.
+    """
+    names = parse_args_list(names)
+    cur_pid = getpid()
+    matched = dict((name, []) for name in names)
+    if names:
+        for process in psutil.process_iter():
+            if process.pid == cur_pid:
+                continue
+            for name in names:
+                if _matches(process, name):
+                    matched[name].append(process)
+    sampled = set(process for processes in matched.values()
+                  for process in processes)
+    psutil.cpu_percent()
+    for process in sampled:
+        try:
+            process.cpu_percent()
+        except (psutil.AccessDenied, psutil.NoSuchProcess):
+            pass
+    cooperative_sleep(min(max(0, float(interval or 0)), MAX_STATS_INTERVAL))
+    # a process matched by several patterns is measured once, the second
+    # cpu_percent() of a process would cover the time since the first one
+    samples = dict((process.pid, _sample(process)) for process in sampled)
+    try:
+        load = list(getloadavg())
+    except (AttributeError, OSError):
+        load = None
+    return dict(cpu=psutil.cpu_percent(),
+                memory=psutil.virtual_memory().percent, load=load,
+                cpu_count=psutil.cpu_count(),
+                processes=dict((name, _process_stats(processes, samples))
+                               for name, processes in matched.items()))
@@ -0,0 +1,164 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Relay of commands to downstream agents.
+
+A driver sends a command with a tree of agents to a few relays. Every
+agent of the tree executes the command, forwards it to its subtrees at the
+same time and returns the results of its whole subtree merged:
+
+    targets = [{"name": "node2", "address": "10.0.0.2:8086",
+                "token": <sha256 of node2 key>,
+                "targets": [{"name": "node5", ...}, ...]}, ...]
+
+A child is connected within CONNECT_TIMEOUT seconds, so a dead child is
+reported at once instead of holding the whole hop timeout.
+"""
+import socket
+import zlib
+from httplib import HTTPConnection, HTTPException
+from json import dumps, loads
+from threading import Thread
+from urlparse import urlparse
+
+from locust.common import cooperative_sleep
+
+__all__ = ['relay', 'subtree_names', 'HOP_MARGIN', 'MIN_HOP_TIMEOUT',
+           'CONNECT_TIMEOUT']
+
+# Every hop gives its subtrees less time to report before its own deadline,
+# the driver counts the timeout of the roots the same way
+# (locustdriver.broadcast)
+HOP_MARGIN = 1.0
+MIN_HOP_TIMEOUT = 1.0
+CONNECT_TIMEOUT = 5
+HEADERS = {'Content-Type': 'application/json', 'Accept': 'application/json',
+           'Accept-Encoding': 'gzip'}
+
+
+def subtree_names(target):
+    """Return names of all agents of the subtree."""
+    names = [target['name']]
+    for child in target.get('targets') or []:
+        names.extend(subtree_names(child))
+    return names
+
+
+def _subtree_error(target, status, message):
+    """Return the same error for every agent of the subtree."""
+    error = {'status': status, 'value': message}
+    return dict((name, error) for name in subtree_names(target))
+
+
+def forward(name, target, command, arguments, timeout):
+    """Send the command to the target agent and return results of its
+    subtree.
+
+    Returns:
+      dict: {<agent name>: <result>}, an unreachable target gives an error
+        for every agent of its subtree.
+    """
+    address = target['address']
+    if '://' not in address:
+        address = 'http://' + address
+    url = urlparse(address)
+    data = {'command': 'relay', 'key': target.get('token'),
+            'arguments': {'name': target['name'], 'command': command,
+                          'arguments': arguments,
+                          'targets': target.get('targets') or [],
+                          'timeout': max(MIN_HOP_TIMEOUT,
+                                         timeout - HOP_MARGIN)}}
+    conn = HTTPConnection(url.hostname, url.port or 80,
+                          timeout=min(CONNECT_TIMEOUT, timeout))
+    try:
+        conn.connect()
+    except (socket.error, HTTPException) as error:
+        conn.close()
+        return _subtree_error(target, 'connection_error',
+                              'Could not relay to %s via %s: %s' %
+                              (target['name'], name, error))
+    try:
+        return _exchange(conn, url.path or '/', data, name, target,
+                         timeout)
+    finally:
+        conn.close()
+
+
+#pylint: disable=R0913
+def _exchange(conn, path, data, name, target, timeout):
+    """Send the relay request over the connected connection and return
+    results of the subtree."""
+    conn.sock.settimeout(timeout)
+    try:
+        conn.request('POST', path, dumps(data), HEADERS)
+        response = conn.getresponse()
+    except socket.timeout:
+        return _subtree_error(target, 'timeout',
+                              'No response from %s via %s in %s seconds' %
+                              (target['name'], name, timeout))
+    except (socket.error, HTTPException) as error:
+        return _subtree_error(target, 'connection_error',
+                              'Could not relay to %s via %s: %s' %
+                              (target['name'], name, error))
+    try:
+        body = response.read()
+        if 'gzip' in (response.getheader('Content-Encoding') or ''):
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        result = loads(body)
+    except socket.timeout:
+        return _subtree_error(target, 'timeout',
+                              'Response of %s via %s was not received in '
+                              'time' % (target['name'], name))
+    except (ValueError, socket.error, zlib.error, HTTPException) as error:
+        return _subtree_error(target, 'bad_response',
+                              'Broken response of %s via %s: %s' %
+                              (target['name'], name, error))
+    if isinstance(result, dict) and set(result) == set(['status', 'value']):
+        # The target itself refused the command, e.g. wrong token
+        return _subtree_error(target, result['status'], result['value'])
+    return result
+
+
+def relay(name, local, command, arguments, targets, timeout):
+    """Run the command locally and forward it to the targets concurrently.
+
+    Args:
+      name (str): Name of this agent in results.
+      local (callable): Runs the command on this agent.
+      command (str): Name of the command for logs of errors.
+      arguments (dict): Arguments of the command.
+      targets (list): Subtrees to forward the command to.
+      timeout (float): Seconds to wait for the subtrees.
+
+    Returns:
+      dict: {<agent name>: <result>} of this agent and all subtrees.
+    """
+    results = {}
+    threads = []
+
+    def run(target):
+        """Forward to one subtree."""
+        results.update(forward(name, target, command, arguments, timeout))
+
+    for target in targets or []:
+        thread = Thread(target=run, args=(target, ))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    results[name] = local()
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(0.01)
+            cooperative_sleep(0.05)
+    return results
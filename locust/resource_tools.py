@@ -24,10 +24,11 @@ from glob import glob
 from tempfile import gettempdir
 from os.path import join as join_path
 
-from psutil import swap_memory
-
 from locust.common import IS_WINDOWS
-from locust.common import message_wrapper, convert_timeout
+from locust.common import message_wrapper, convert_timeout, LazyModule
+
+#pylint: disable=C0103
+psutil = LazyModule('psutil')
 
 
 def burn_cpu(timeout=30):
@@ -83,7 +84,8 @@ def _burn_ram(timeout):
     # Try to fill all free RAM space
     while True:
         try:
-            fill_ram = ' ' * int((float(swap_memory().free) / 100) * f_ratio)
+            fill_ram = ' ' * int(
+                (float(psutil.swap_memory().free) / 100) * f_ratio)
             break
         except (MemoryError, OverflowError):
             f_ratio -= 1
@@ -91,16 +93,18 @@ def _burn_ram(timeout):
     # Try to fill all left free RAM space (Windows OS specific)
     while True:
         try:
-            decrease = ' ' * int((float(swap_memory().free) / 100) * d_ratio)
+            decrease = ' ' * int(
+                (float(psutil.swap_memory().free) / 100) * d_ratio)
             break
         except (MemoryError, OverflowError):
             d_ratio -= 1
 
     end_time = time() + timeout
     while time() < end_time:
-        if float(swap_memory().percent) < 90:
+        if float(psutil.swap_memory().percent) < 90:
             try:
-                spike += ' ' * int((float(swap_memory().free) / 100) * 10)
+                spike += ' ' * int(
+                    (float(psutil.swap_memory().free) / 100) * 10)
             except (MemoryError, OverflowError):
                 spike = ''
 
@@ -0,0 +1,419 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Scenarios of agent commands executed by the agent itself.
+
+A scenario is a list of steps, every step is a dict of one kind:
+
+    {"command": "suspend_process", "arguments": {"names": ["java"]}}
+    {"delay": 5}            # seconds after the end of the previous step
+    {"at": 12.5}            # seconds after the start of the scenario
+    {"wait_for": {"command": "get_process",
+                  "arguments": {"names": ["java"]}},
+     "until": "not_empty", "interval": 0.5, "timeout": 30}
+    {"loop": [<steps>], "count": 3, "every": 10}
+
+Steps are scheduled on the monotonic clock: a step starts at its planned
+time, which is the end of the previous step moved by "delay" or the start
+of the scenario moved by "at" and "every", so durations of commands do not
+shift fixed points of the scenario. A failed command or wait stops the
+scenario unless the step has "ignore_errors". The trace has a record for
+every executed step with its planned, started and finished offsets from
+the start of the scenario and the jitter (started - planned).
+
+The agent runs scenarios in background threads (see ScenarioRuns), so a
+long scenario does not hold the request which started it: the request
+returns the scenario id and the trace is fetched by the id later.
+"""
+from collections import OrderedDict
+from threading import Event, Lock, Thread
+from types import GeneratorType
+from time import time
+from uuid import uuid4
+
+from locust.common import cooperative_sleep
+from locust.common.clock import monotonic, sleep_until
+
+__all__ = ['run_scenario', 'is_failed', 'ScenarioRuns', 'get_runs',
+           'CONDITIONS', 'DEF_WAIT_TIMEOUT', 'DEF_WAIT_INTERVAL',
+           'DEF_SCENARIO_TIMEOUT', 'MAX_FINISHED_SCENARIOS']
+
+DEF_WAIT_TIMEOUT = 60
+DEF_WAIT_INTERVAL = 0.5
+DEF_SCENARIO_TIMEOUT = 3600
+MAX_STEPS = 10000
+MAX_FINISHED_SCENARIOS = 100
+POLL_INTERVAL = 0.05
+
+
+def is_failed(result):
+    """Check if the command result is an error.
+
+    Errors are {"status", "value"} dicts and message_wrapper messages with
+    "error" status.
+    """
+    if isinstance(result, dict):
+        if set(result) == set(['status', 'value']):
+            return True
+        messages = result.get('list')
+        if isinstance(messages, list) and messages and \
+                all(isinstance(each, dict) for each in messages):
+            return any(each.get('status') == 'error' for each in messages)
+    return False
+
+
+def _items(result):
+    """Return the list of a {"list": [...]} result, the result otherwise."""
+    if isinstance(result, dict) and list(result) == ['list']:
+        return result['list']
+    return result
+
+
+CONDITIONS = {
+    'success': lambda result: not is_failed(result),
+    'failure': is_failed,
+    'empty': lambda result: not is_failed(result) and not _items(result),
+    'not_empty': lambda result: (not is_failed(result) and
+                                 bool(_items(result))),
+}
+
+
+class _Stop(Exception):
+    """Scenario is stopped by a step."""
+
+    def __init__(self, status):
+        super(_Stop, self).__init__(status)
+        self.status = status
+
+
+class _Scenario(object):
+    """State of a running scenario."""
+
+    def __init__(self, execute, timeout):
+        self.execute = execute
+        self.started_at = time()
+        self.start = monotonic()
+        self.deadline = self.start + timeout
+        self.cursor = self.start
+        self.trace = []
+        self.status = None
+        self.finished = None
+
+    def offset(self, moment):
+        """Return seconds of the monotonic moment since the start."""
+        return round(moment - self.start, 6)
+
+    def wait(self, planned):
+        """Sleep until the planned moment, stop if it is after the
+        deadline."""
+        if planned > self.deadline:
+            sleep_until(self.deadline)
+            raise _Stop('timeout')
+        sleep_until(planned)
+        self.cursor = max(self.cursor, planned)
+
+    def call(self, command, arguments):
+        """Execute the command, return its result."""
+        try:
+            result = self.execute(command, arguments or {})
+        except TypeError as ex:
+            return {'status': 'wrong_parameters', 'value': str(ex)}
+        #pylint: disable=W0703
+        except Exception as ex:
+            return {'status': 'unexpected_error', 'value': str(ex)}
+        if isinstance(result, GeneratorType):
+            result = list(result)
+        return result
+
+    def record(self, path, kind, planned, started, **fields):
+        """Add the trace record of the step, the step ends now.
+
+        Following steps are planned from the end of the step, waits end at
+        their planned time to not accumulate wake up delays.
+        """
+        finished = monotonic()
+        if kind not in ('delay', 'at'):
+            self.cursor = finished
+        record = dict(step=path, type=kind, planned=self.offset(planned),
+                      started=self.offset(started),
+                      finished=self.offset(finished),
+                      jitter=round(started - planned, 6))
+        record.update(fields)
+        if len(self.trace) >= MAX_STEPS:
+            raise _Stop('too_many_steps')
+        self.trace.append(record)
+        return record
+
+    def play(self, steps):
+        """Execute steps of the scenario and set its status."""
+        try:
+            self.run(steps)
+            self.status = 'success'
+        except _Stop as stop:
+            self.status = stop.status
+        finally:
+            self.finished = monotonic()
+
+    def report(self):
+        """Return the result of the scenario, "running" if it is not
+        finished yet."""
+        trace = list(self.trace)
+        jitters = [record['jitter'] for record in trace
+                   if record['type'] != 'loop']
+        return {'status': self.status or 'running',
+                'started_at': self.started_at,
+                'duration': self.offset(self.finished or monotonic()),
+                'max_jitter': max(jitters) if jitters else 0.0,
+                'trace': trace}
+
+    def run(self, steps, prefix=''):
+        """Execute the steps."""
+        for index, step in enumerate(steps):
+            self.run_step(step, '%s%d' % (prefix, index))
+
+    def run_step(self, step, path):
+        """Execute one step."""
+        if 'delay' in step or 'at' in step:
+            kind = 'delay' if 'delay' in step else 'at'
+            origin = self.cursor if kind == 'delay' else self.start
+            planned = origin + float(step[kind])
+            self.wait(planned)
+            self.record(path, kind, planned, monotonic())
+        elif 'command' in step:
+            planned = self.cursor
+            self.wait(planned)
+            started = monotonic()
+            result = self.call(step['command'], step.get('arguments'))
+            failed = is_failed(result)
+            self.record(path, 'command', planned, started,
+                        command=step['command'], result=result,
+                        status='error' if failed else 'success')
+            if failed and not step.get('ignore_errors'):
+                raise _Stop('failed')
+        elif 'wait_for' in step:
+            self.wait_for(step, path)
+        elif 'loop' in step:
+            self.loop(step, path)
+
+    def wait_for(self, step, path):
+        """Repeat the command of the step until the condition is met."""
+        check = step['wait_for']
+        condition = CONDITIONS[step.get('until', 'not_empty')]
+        interval = float(step.get('interval', DEF_WAIT_INTERVAL))
+        planned = self.cursor
+        started = monotonic()
+        deadline = started + float(step.get('timeout', DEF_WAIT_TIMEOUT))
+        attempts = 0
+        while True:
+            attempts += 1
+            attempt = monotonic()
+            result = self.call(check['command'], check.get('arguments'))
+            if condition(result):
+                status = 'success'
+                break
+            following = attempt + interval
+            if following > deadline or following > self.deadline:
+                status = 'timeout'
+                break
+            sleep_until(following)
+        self.record(path, 'wait_for', planned, started,
+                    command=check['command'], result=result,
+                    attempts=attempts, status=status)
+        if status != 'success' and not step.get('ignore_errors'):
+            raise _Stop('failed')
+
+    def loop(self, step, path):
+        """Repeat steps of the loop, iterations start "every" seconds."""
+        count = int(step.get('count', 1))
+        every = step.get('every')
+        planned = self.cursor
+        started = monotonic()
+        for iteration in range(count):
+            if every is not None and iteration:
+                self.wait(planned + iteration * float(every))
+            self.run(step['loop'], '%s.%d.' % (path, iteration))
+        self.record(path, 'loop', planned, started, count=count)
+
+
+def _validate(steps, path=''):
+    """Raise TypeError if a step of the scenario is malformed."""
+    if not isinstance(steps, list):
+        raise TypeError('Steps %sshould be a list' % path)
+    kinds = ('command', 'delay', 'at', 'wait_for', 'loop')
+    for index, step in enumerate(steps):
+        name = '%s%d' % (path, index)
+        if not isinstance(step, dict) or \
+                len([kind for kind in kinds if kind in step]) != 1:
+            raise TypeError('Step %s should have one of %s' %
+                            (name, ', '.join(kinds)))
+        try:
+            for key in ('delay', 'at', 'interval', 'timeout', 'every'):
+                if key in step and float(step[key]) < 0:
+                    raise TypeError('"%s" of step %s is negative' %
+                                    (key, name))
+            if 'count' in step:
+                int(step['count'])
+        except ValueError as ex:
+            raise TypeError('Step %s: %s' % (name, ex))
+        if 'wait_for' in step:
+            if not isinstance(step['wait_for'], dict) or \
+                    'command' not in step['wait_for']:
+                raise TypeError('"wait_for" of step %s should have a '
+                                'command' % name)
+            if step.get('until', 'not_empty') not in CONDITIONS:
+                raise TypeError('Unknown condition of step %s: %s' %
+                                (name, step['until']))
+        if 'loop' in step:
+            _validate(step['loop'], name + '.')
+
+
+def run_scenario(steps, execute, timeout=DEF_SCENARIO_TIMEOUT):
+    """
+    Execute steps of the scenario on the monotonic clock.
+
+    Arguments:
+        steps - list of steps, see the module docstring;
+        execute - callable(<command>, <arguments>) returning the result of
+                  an agent command;
+        timeout - seconds the scenario may take, it is stopped with
+                  "timeout" status after that.
+
+    Return:
+        {"status": "success"|"failed"|"timeout"|"too_many_steps",
+        "started_at": <node time>, "duration": <seconds>,
+        "max_jitter": <seconds>, "trace": [<step records>]}
+
+    Raises:
+        TypeError: If the scenario is malformed.
+    """
+    _validate(steps)
+    scenario = _Scenario(execute, float(timeout))
+    scenario.play(steps)
+    return scenario.report()
+
+
+class _Run(object):
+    """Scenario executed by a background thread."""
+
+    def __init__(self, scenario_id, steps, execute, timeout):
+        self.id = scenario_id
+        self.steps = steps
+        self.scenario = _Scenario(execute, float(timeout))
+        self.done = Event()
+
+    def __call__(self):
+        try:
+            self.scenario.play(self.steps)
+        #pylint: disable=W0703
+        except Exception:
+            self.scenario.status = 'unexpected_error'
+            raise
+        finally:
+            self.done.set()
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds for the end of the scenario without
+        blocking the gevent hub, check if it is finished."""
+        deadline = monotonic() + timeout
+        while not self.done.is_set():
+            left = deadline - monotonic()
+            if left <= 0:
+                break
+            cooperative_sleep(min(POLL_INTERVAL, left))
+        return self.done.is_set()
+
+    def report(self):
+        """Return the result of the scenario with its id."""
+        return dict(self.scenario.report(), scenario_id=self.id)
+
+
+class ScenarioRuns(object):
+    """Scenarios running in background threads and results of the last
+    "max_finished" finished ones."""
+
+    def __init__(self, max_finished=MAX_FINISHED_SCENARIOS):
+        self.max_finished = max_finished
+        self._runs = OrderedDict()
+        self._lock = Lock()
+
+    def start(self, steps, execute, timeout=DEF_SCENARIO_TIMEOUT,
+              scenario_id=None):
+        """
+        Start the scenario in a background thread.
+
+        Arguments:
+            steps, execute, timeout - see run_scenario;
+            scenario_id - id of the scenario, random by default.
+
+        Return:
+            id of the scenario.
+
+        Raises:
+            TypeError: If the scenario is malformed or the id is taken by
+            a running scenario.
+        """
+        _validate(steps)
+        scenario_id = scenario_id or uuid4().hex[:12]
+        run = _Run(scenario_id, steps, execute, timeout)
+        with self._lock:
+            previous = self._runs.pop(scenario_id, None)
+            if previous is not None and not previous.done.is_set():
+                self._runs[scenario_id] = previous
+                raise TypeError('Scenario %s is running' % scenario_id)
+            self._runs[scenario_id] = run
+            self._trim()
+        thread = Thread(target=run, name='scenario-%s' % scenario_id)
+        thread.daemon = True
+        thread.start()
+        return scenario_id
+
+    def _trim(self):
+        """Forget the oldest finished scenarios over the limit, the lock
+        should be held."""
+        finished = [scenario_id for scenario_id, run in self._runs.items()
+                    if run.done.is_set()]
+        for scenario_id in finished[:max(0, len(finished) -
+                                        self.max_finished)]:
+            del self._runs[scenario_id]
+
+    def get(self, scenario_id, wait=0):
+        """
+        Return the result of the scenario.
+
+        Arguments:
+            scenario_id - id of the scenario;
+            wait - seconds to wait for the end of a running scenario.
+
+        Return:
+            {"scenario_id", "status", ...} in the format of run_scenario,
+            the status is "running" until the scenario is finished.
+
+        Raises:
+            KeyError: If there is no such scenario.
+        """
+        with self._lock:
+            run = self._runs[scenario_id]
+        if wait:
+            run.wait(float(wait))
+        with self._lock:
+            self._trim()
+        return run.report()
+
+
+_RUNS = ScenarioRuns()
+
+
+def get_runs():
+    """Return scenarios of this agent."""
+    return _RUNS
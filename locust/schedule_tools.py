@@ -0,0 +1,358 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Recurring agent commands.
+
+Schedules fire agent commands by an interval or a crontab expression on an
+apscheduler BackgroundScheduler of the agent. They are kept in a JSON
+store in the agent configuration directory and are resumed when the agent
+starts, so soak tests do not need a driver running.
+
+Every schedule counts its runs, errors, late runs (started later than
+"late_after" seconds after the planned time) and missed runs: runs
+skipped by the scheduler because of "misfire_grace_time" or because the
+previous run was still going, and runs that were due while the agent was
+down.
+
+Counters updated by runs are written to the store at most every
+"save_interval" seconds, schedules are written at once when they are
+created or deleted and when the manager is shut down.
+"""
+import os
+import sys
+from importlib import import_module
+from json import dump, load
+from threading import Lock, Timer
+from time import time
+from uuid import uuid4
+
+from locust.common import LazyModule
+from locust.common.clock import monotonic
+
+#pylint: disable=C0103
+background = LazyModule('apscheduler.schedulers.background')
+events = LazyModule('apscheduler.events')
+cron = LazyModule('apscheduler.triggers.cron')
+interval = LazyModule('apscheduler.triggers.interval')
+aps_util = LazyModule('apscheduler.util')
+
+STORE_NAME = 'schedules.json'
+DEF_MISFIRE_GRACE_TIME = 60
+DEF_LATE_AFTER = 1.0
+DEF_SAVE_INTERVAL = 5.0
+# Runs missed while the agent was down are not counted beyond this
+MAX_COUNTED_MISSES = 100000
+
+_LOCK = Lock()
+_STATE = {'manager': None}
+
+
+def is_available():
+    """Check if apscheduler is installed."""
+    try:
+        import_module('apscheduler.schedulers.background')
+    except ImportError:
+        return False
+    return True
+
+
+def _timestamp(moment):
+    """Return UNIX time of the aware datetime or None."""
+    if moment is None:
+        return None
+    return aps_util.datetime_to_utc_timestamp(moment)
+
+
+def _datetime(timestamp):
+    """Return the aware datetime of UNIX time."""
+    return aps_util.utc_timestamp_to_datetime(timestamp)
+
+
+def build_trigger(record):
+    """Return apscheduler trigger of the stored schedule.
+
+    Interval triggers start at the creation time of the schedule, so their
+    phase is kept over agent restarts.
+    """
+    if record.get('cron'):
+        return cron.CronTrigger.from_crontab(record['cron'])
+    return interval.IntervalTrigger(
+        seconds=float(record['interval']),
+        start_date=_datetime(record['created_at']))
+
+
+def count_missed(trigger, since, until):
+    """Return amount of fire times of the trigger in [since, until)."""
+    moment = _datetime(since)
+    now = _datetime(until)
+    missed = 0
+    while moment is not None and moment < now and \
+            missed < MAX_COUNTED_MISSES:
+        missed += 1
+        following = trigger.get_next_fire_time(moment, moment)
+        if following is not None and following <= moment:
+            break
+        moment = following
+    return missed
+
+
+def _new_stats():
+    """Return counters of a new schedule."""
+    return dict(runs=0, errors=0, late=0, missed=0, missed_while_down=0,
+                max_lateness=0.0, last_lateness=None, last_run=None,
+                last_status=None, last_missed=None)
+
+
+class ScheduleManager(object):
+    """Scheduler of agent commands with a persistent store.
+
+    Attributes:
+      store_path (str): Path of the JSON store.
+      execute (callable): callable(<command>, <arguments>) returning the
+        result of an agent command, it returns an error dict or raises an
+        exception on failures.
+      is_failed (callable): callable(<result>) that checks if the result
+        is an error.
+      save_interval (float): Min seconds between writes of counters.
+    """
+
+    def __init__(self, store_path, execute, is_failed,
+                 save_interval=DEF_SAVE_INTERVAL):
+        self.store_path = store_path
+        self.execute = execute
+        self.is_failed = is_failed
+        self.save_interval = save_interval
+        self.schedules = {}
+        self._lock = Lock()
+        self._scheduler = None
+        self._saved = None
+        self._timer = None
+
+    def start(self):
+        """Load the store and start the scheduler.
+
+        Returns:
+          ScheduleManager: Self.
+        """
+        if os.path.exists(self.store_path):
+            with open(self.store_path) as store:
+                self.schedules = load(store).get('schedules') or {}
+        self._scheduler = background.BackgroundScheduler(daemon=True)
+        self._scheduler.add_listener(
+            self._on_event, events.EVENT_JOB_EXECUTED |
+            events.EVENT_JOB_MISSED | events.EVENT_JOB_MAX_INSTANCES)
+        now = time()
+        for schedule_id, record in self.schedules.items():
+            trigger = build_trigger(record)
+            due = record.get('next_run_time')
+            if due is not None and due < now:
+                missed = count_missed(trigger, due, now)
+                record['stats']['missed'] += missed
+                record['stats']['missed_while_down'] += missed
+            self._add_job(schedule_id, record, trigger)
+        self._scheduler.start()
+        self.save()
+        return self
+
+    def shutdown(self):
+        """Stop the scheduler and save the store."""
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self.save()
+            self._scheduler = None
+
+    def _add_job(self, schedule_id, record, trigger):
+        """Add the job of the schedule to the scheduler."""
+        self._scheduler.add_job(
+            self._fire, trigger, args=[schedule_id], id=schedule_id,
+            misfire_grace_time=record['misfire_grace_time'], coalesce=False,
+            max_instances=1, replace_existing=True)
+
+    def _fire(self, schedule_id):
+        """Execute the command of the schedule.
+
+        Returns:
+          tuple: (<start time>, <status>) for the event listener.
+        """
+        started = time()
+        record = self.schedules.get(schedule_id)
+        if record is None:
+            return started, 'deleted'
+        try:
+            result = self.execute(record['command'],
+                                  record.get('arguments') or {})
+            status = 'error' if self.is_failed(result) else 'success'
+        #pylint: disable=W0703
+        except Exception:
+            status = 'error'
+        return started, status
+
+    def _on_event(self, event):
+        """Update counters of the schedule by the scheduler event."""
+        with self._lock:
+            record = self.schedules.get(event.job_id)
+            if record is None:
+                return
+            stats = record['stats']
+            if event.code == events.EVENT_JOB_EXECUTED:
+                started, status = event.retval
+                lateness = max(0.0, started -
+                               _timestamp(event.scheduled_run_time))
+                stats['runs'] += 1
+                stats['errors'] += status == 'error'
+                stats['last_run'] = started
+                stats['last_status'] = status
+                stats['last_lateness'] = round(lateness, 6)
+                stats['max_lateness'] = max(stats['max_lateness'],
+                                            stats['last_lateness'])
+                if lateness > record['late_after']:
+                    stats['late'] += 1
+            else:
+                # Runs skipped because the previous run is still going are
+                # reported together
+                missed = getattr(event, 'scheduled_run_times', None) or \
+                    [event.scheduled_run_time]
+                stats['missed'] += len(missed)
+                stats['last_missed'] = _timestamp(max(missed))
+        self._save_later()
+
+    def _save_later(self):
+        """Save the store, but not sooner than save_interval seconds after
+        the previous save."""
+        with self._lock:
+            if self._timer is not None:
+                return
+            delay = self.save_interval
+            if self._saved is not None:
+                delay += self._saved - monotonic()
+            if delay > 0:
+                self._timer = Timer(delay, self.save)
+                self._timer.daemon = True
+                self._timer.start()
+                return
+        self.save()
+
+    def save(self):
+        """Write schedules with their next run times to the store."""
+        # Jobs are read without the lock, the scheduler holds its own lock
+        # while it reports events
+        jobs = self._scheduler.get_jobs() if self._scheduler else []
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._saved = monotonic()
+            for job in jobs:
+                if job.id in self.schedules:
+                    self.schedules[job.id]['next_run_time'] = \
+                        _timestamp(job.next_run_time)
+            temp_path = self.store_path + '.tmp'
+            with open(temp_path, 'w') as store:
+                dump({'schedules': self.schedules}, store, indent=2,
+                     sort_keys=True)
+            os.rename(temp_path, self.store_path)
+
+    #pylint: disable=R0913
+    def create(self, command, arguments=None, interval_seconds=None,
+               crontab=None, schedule_id=None,
+               misfire_grace_time=DEF_MISFIRE_GRACE_TIME,
+               late_after=DEF_LATE_AFTER):
+        """Add the schedule, a schedule with the same id is replaced.
+
+        Returns:
+          dict: View of the schedule, see view.
+
+        Raises:
+          TypeError: If the trigger is not valid.
+        """
+        if (interval_seconds is None) == (crontab is None):
+            raise TypeError('Specify either interval or cron')
+        record = dict(command=command, arguments=arguments or {},
+                      interval=None, cron=None, created_at=time(),
+                      misfire_grace_time=int(misfire_grace_time),
+                      late_after=float(late_after), next_run_time=None,
+                      stats=_new_stats())
+        try:
+            if crontab is not None:
+                record['cron'] = str(crontab)
+            elif float(interval_seconds) <= 0:
+                raise ValueError('interval should be positive')
+            else:
+                record['interval'] = float(interval_seconds)
+            trigger = build_trigger(record)
+        except ValueError as ex:
+            raise TypeError('Wrong schedule trigger: %s' % ex)
+        schedule_id = schedule_id or uuid4().hex[:12]
+        with self._lock:
+            self.schedules[schedule_id] = record
+        self._add_job(schedule_id, record, trigger)
+        self.save()
+        return self.view(schedule_id)
+
+    def delete(self, schedule_id):
+        """Remove the schedule.
+
+        Raises:
+          KeyError: If there is no such schedule.
+        """
+        with self._lock:
+            del self.schedules[schedule_id]
+        self._scheduler.remove_job(schedule_id)
+        self.save()
+
+    def view(self, schedule_id):
+        """Return the schedule with its counters and next run time."""
+        with self._lock:
+            record = self.schedules[schedule_id]
+            view = dict((key, value) for key, value in record.items()
+                        if key != 'stats')
+            view.update(record['stats'])
+        job = self._scheduler.get_job(schedule_id)
+        view['next_run_time'] = _timestamp(job.next_run_time) \
+            if job is not None else None
+        view['id'] = schedule_id
+        return view
+
+    def list(self):
+        """Return views of all schedules ordered by ids."""
+        return [self.view(schedule_id)
+                for schedule_id in sorted(self.schedules)]
+
+
+def get_manager(store_dir, execute, is_failed):
+    """Return the started manager of the agent, create it on first call."""
+    with _LOCK:
+        if _STATE['manager'] is None:
+            if not os.path.isdir(store_dir):
+                os.makedirs(store_dir)
+            _STATE['manager'] = ScheduleManager(
+                os.path.join(store_dir, STORE_NAME), execute,
+                is_failed).start()
+        return _STATE['manager']
+
+
+def resume_schedules(store_dir, execute, is_failed):
+    """Start the manager if the store of the agent has schedules.
+
+    Returns:
+      ScheduleManager: Started manager or None.
+    """
+    if not is_available() or \
+            not os.path.exists(os.path.join(store_dir, STORE_NAME)):
+        return None
+    try:
+        return get_manager(store_dir, execute, is_failed)
+    except (IOError, OSError, ValueError, KeyError) as ex:
+        sys.stderr.write('Schedules are not resumed: %s\n' % ex)
+        return None
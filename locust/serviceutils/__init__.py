@@ -66,7 +66,20 @@ if IS_LINUX or IS_OSX:
         cfg_path = os.path.join(os.path.dirname(sprv_cfg_path), cfg_path)
         return cfg_path, os.path.splitext(cfg_file_ext)[1]
 
-    SUPERVISORD_CONF_PATH, SUPERVISORD_CONF_EXT = get_supeprvisord_conf_path()
+    _SUPERVISORD_CONF = []
+
+    def get_supervisord_conf():
+        """Get path and file extension of the supervisor services.
+
+        The supervisor config is parsed on first call only, so importing
+        locust modules does not pay for it.
+
+        Returns:
+          tuple: Cached result of get_supeprvisord_conf_path.
+        """
+        if not _SUPERVISORD_CONF:
+            _SUPERVISORD_CONF.extend(get_supeprvisord_conf_path())
+        return tuple(_SUPERVISORD_CONF)
 
     MODULE_CFG_PATH = '/etc/locust/'
 
@@ -24,8 +24,8 @@ from copy import deepcopy
 from configobj import ConfigObj
 
 import locust.serviceutils.baseserviceutil as baseutil
-from locust.serviceutils import (SUPERVISORD_CONF_PATH, SUPERVISORD_CONF_EXT,
-                                 CONFIG_STORAGE, EXIT_CODE)
+from locust.serviceutils import (get_supervisord_conf, CONFIG_STORAGE,
+                                 EXIT_CODE)
 from locust.serviceutils.baseserviceutil import ErrMsg as BaseErrMsg
 
 
@@ -81,8 +81,15 @@ class UnixServiceUtil(baseutil.BaseServiceUtil):
         self.cmds = dict((k, v.format(name=name)) for k, v
                          in SUPERV_CMD_TMPL.items())
 
-        self.super_conf_path = SUPERVISORD_CONF_PATH
-        self.super_conf_ext = SUPERVISORD_CONF_EXT
+    @property
+    def super_conf_path(self):
+        """Path to the supervisor service configs directory."""
+        return get_supervisord_conf()[0]
+
+    @property
+    def super_conf_ext(self):
+        """Extension of configuration files of the supervisor services."""
+        return get_supervisord_conf()[1]
 
     def _check_supervisord_path(self):
         """Check if Supervisor is installed properly."""
@@ -17,24 +17,38 @@ from sys import exc_info
 from json import dumps, loads
 from os import path
 from hashlib import sha256
+from time import time
 from traceback import format_exception
+from types import GeneratorType
 from locust.serviceutils import MODULE_CFG_PATH
 from locust.api import Agent
-from locust import LOGGING_LEVEL
+from locust.common.clock import ClockSync
+import locust
+
+
+def _prepend(first, chunks):
+    """Yield the first chunk and then the chunks."""
+    yield first
+    for chunk in chunks:
+        yield chunk
+
 
 #pylint: disable=W0703, R0903
 class ValidatorRunner(object):
     """Validator class."""
 
     def __init__(self):
+        locust.load_config()
         self.api = Agent()
+        self.clock = ClockSync()
         try:
             file_open = open(path.join(MODULE_CFG_PATH, '.key'), 'r')
             key = file_open.read()
             file_open.close()
             self.key = sha256(key).hexdigest()
-        except OSError:
-            pass
+        except (OSError, IOError):
+            # Without the key file every request is refused
+            self.key = None
 
     #pylint: disable=R0911
     def validate_and_run(self, data):
@@ -42,7 +56,18 @@ class ValidatorRunner(object):
         Example of data to validate and run
         json_1 = u'{"command": "get_process" ,
         "arguments": {"pids": [8193], "names": []} }'
+
+        Optional fields:
+            sent_at - driver wall clock time of sending the request;
+            rtt - round trip time between the driver and the agent;
+            start_at - driver wall clock time to start the command at, up
+                       to ClockSync.max_lead seconds ahead.
+        With start_at the result is {"result": <result>, "started_at":
+        <agent time>, "start_error": <seconds late>, "clock_offset":
+        <agent time - driver time>}, a streamed result gets these fields
+        as the first chunk.
         """
+        received = time()
         err = ''
 
         try:
@@ -54,7 +79,7 @@ class ValidatorRunner(object):
                 return err, value
             try:
                 key = data['key']
-                if key != self.key:
+                if self.key is None or key != self.key:
                     raise NameError('Auth Failed')
             except NameError:
                 err = "authorization_failed"
@@ -68,12 +93,34 @@ class ValidatorRunner(object):
                         "format Exception: %s.  Data: %s" % (ex, data)
                 return err, value
             try:
+                if 'sent_at' in data:
+                    self.clock.add_sample(received, data['sent_at'],
+                                          data.get('rtt'))
+                start_at = data.get('start_at')
+                if start_at is not None:
+                    start_at = float(start_at)
+                    self.clock.check_lead(start_at)
+            except (TypeError, ValueError) as ex:
+                err = "bad_request"
+                value = "Timestamps have wrong format. Exception: %s. " \
+                        "Data: %s" % (ex, data)
+                return err, value
+            try:
+                method = getattr(self.api, command)
+                started = None
+                if start_at is not None:
+                    started = self.clock.wait(start_at)
                 if 'arguments' in data:
                     arguments = data['arguments']
                     #pylint: disable=W0142
-                    result = getattr(self.api, command)(**arguments)
+                    result = method(**arguments)
                 else:
-                    result = getattr(self.api, command)()
+                    result = method()
+                if started is not None:
+                    if isinstance(result, GeneratorType):
+                        result = _prepend(started, result)
+                    else:
+                        result = dict(started, result=result)
                 #Here we return correct result:
                 return err, result
             except AttributeError as ex:
@@ -90,7 +137,7 @@ class ValidatorRunner(object):
         except:
             err = "unexpected_error"
             value = "this is strange"
-            if LOGGING_LEVEL == 'debug':
+            if locust.LOGGING_LEVEL == 'debug':
                 value = "Exception: {exc}. Incoming values: {data}".format(
                     exc=format_exception(*exc_info()), data=data)
             return err, value
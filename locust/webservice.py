@@ -15,105 +15,126 @@
 
 """The locust agent webservice module."""
 
-import inspect
-import requests
-from json import dumps
-from gevent.wsgi import WSGIServer
-from flask import Flask
-from flask_restful import Api, Resource, request
-from locust.api import Agent
-from locust.validator_runner import ValidatorRunner
+import socket
+
+from locust.wsgiapp import LocustApp, help_message, run_command
+from locust.api import resume_schedules
 from locust.common import create_parser_for_websrv, \
     parse_websrv_kwargs
-from locust import WEB_SRV_CFG
+import locust
+
+
+__all__ = ['run', 'create_flask_app', 'create_parser', 'create_server']
+
+ENGINES = ('flask', 'lite')
+
 
+def create_parser():
+    """Creates options parser of the webservice."""
+    locust.load_config()
+    parser = create_parser_for_websrv(locust.WEB_SRV_CFG)
+    parser.add_option('--engine', dest='engine', action='store',
+                      default=None, choices=ENGINES,
+                      help='WSGI application to serve the agent with: '
+                           '"flask" or lightweight "lite" '
+                           '(Default: from config).')
+    return parser
 
-__all__ = ['run']
 
-#pylint: disable=C0103
-PARSER = create_parser_for_websrv(WEB_SRV_CFG)
+def create_flask_app():
+    """Create the locust flask application.
 
-#pylint: disable=C0103
-APP = Flask(__name__)
-API = Api(APP)
+    Flask and flask_restful are imported here, so the "lite" engine does
+    not pay for them.
+    """
+    #pylint: disable=F0401
+    from flask import Flask, Response
+    from flask_restful import Api, Resource, request
+
+    #pylint: disable=W0232,C0103
+    class locust(Resource):
+        """ locust request handler"""
 
-RUNNER = None
+        @staticmethod
+        def get():
+            """GET method for index.
 
-CMDS = dict(inspect.getmembers(Agent, predicate=inspect.ismethod))
-CMDS = dict((k, v) for k, v in CMDS.items() if not k.startswith('_'))
 
+            Returns string messages with list of available methods the locust
+            agent and usage example.
+            """
+            return help_message()
 
-#pylint: disable=W0232
-class locust(Resource):
-    """ locust request handler"""
+        @staticmethod
+        def post():
+            """Execute a given locust agent command and returns execution
+            result.
 
-    @staticmethod
-    def get():
-        """GET method for index.
+            Validate POST data and execute the locust agent command given in
+            POST data.
 
 
-        Returns string messages with list of available methods the locust
-        agent and usage example.
-        """
-        try:
-            list_of_commands = dumps(CMDS.keys(), indent=2)
-        except TypeError:
-            list_of_commands = 'ERROR: UNABLE_TO_GET_COMMANDS'
-        cmds = ('Hi there! \n '
-                'Basic usage:\n POST:\n'
-                '       json_1 = u\'{"command": "get_process" , "arguments":'
-                '{"pids": [15870,15913], "names": []},"key":host_key}\'\n\n'
-                'RESPONSE:\n    '
-                '[{"status": "sleeping", "node": "119004516906817"\n '
-                '"endpoint": "127.0.1.1", "name": "python2.7",\n '
-                '"cmd": "/usr/bin/python2.7 -u /home/usr/websevice/webservice'
-                '.py\n 8086", "pid": 15870,\n '
-                '"uuid": "e4d4951a-08d6-11e3-b487-6c3be5f4f741"},\n '
-                '{"status": "sleeping", "node": "119004516906817",\n '
-                '"endpoint": "127.0.1.1", "name": "firefox",\n '
-                '"cmd": "/usr/lib/firefox/firefox", "pid": 15913,\n '
-                '"uuid": "e4d52944-08d6-11e3-b487-6c3be5f4f741"}]\n\n '
-                'COMMANDS: \n %s') % list_of_commands
-        return cmds
+            Returns the result of the execution of a specified locust agent
+            command. The result is encoded according to Accept and
+            Accept-Encoding request headers (see locust.common.encoding).
+            """
+            code, headers, body = run_command(
+                request.data, accept=request.headers.get('Accept'),
+                accept_encoding=request.headers.get('Accept-Encoding'))
+            return Response(body, status=code, headers=headers)
 
-    @staticmethod
-    def post():
-        """Execute a given locust agent command and returns execution result.
+    app = Flask(__name__)
+    Api(app).add_resource(locust, '/')
+    return app
 
-        Validate POST data and execute the locust agent command given in POST
-        data.
 
+def create_server(listener, app, **kwargs):
+    """Create gevent WSGI server of the application.
 
-        Returns the result of the execution of a specified locust agent
-        command.
-        """
+    The server keeps HTTP/1.1 connections alive, so a driver reuses one
+    connection for many commands. gevent sends response headers and body
+    with separate writes, TCP_NODELAY is set on accepted connections to
+    not delay the body of every response on a reused connection until the
+    driver acknowledges the headers.
 
-        #pylint: disable=W0603
-        global RUNNER
-        if RUNNER is None:
-            RUNNER = ValidatorRunner()
-        err, value = RUNNER.validate_and_run(request.data)
-        #pylint: disable=E1101
-        if err:
-            return {"status": err, "value": value}, requests.codes.forbidden
-        return value, requests.codes.ok
+    Keyword arguments are passed to gevent.pywsgi.WSGIServer.
+    """
+    from gevent.pywsgi import WSGIServer, WSGIHandler
 
+    #pylint: disable=R0903
+    class NoDelayHandler(WSGIHandler):
+        """WSGI handler that disables Nagle's algorithm."""
 
-API.add_resource(locust, '/')
+        def handle(self):
+            try:
+                self.socket.setsockopt(socket.IPPROTO_TCP,
+                                       socket.TCP_NODELAY, 1)
+            except socket.error:
+                pass
+            return WSGIHandler.handle(self)
+
+    #pylint: disable=W0142
+    return WSGIServer(listener, app, handler_class=NoDelayHandler, **kwargs)
 
 
 def run(**kwargs):
     """
     Main method for webservice.
-    Run the locust flask webservice with defined options
+    Run the locust webservice with defined options. The "engine" option
+    selects the flask application or the lightweight one.
     """
+    locust.load_config()
     #pylint: disable=W0142
-    opt = parse_websrv_kwargs(WEB_SRV_CFG, **kwargs)
-    http_server = WSGIServer(opt, APP)
+    opt = parse_websrv_kwargs(locust.WEB_SRV_CFG, **kwargs)
+    engine = kwargs.get('engine') or locust.WSGI_ENGINE
+    app = LocustApp() if engine == 'lite' else create_flask_app()
+    # Recurring commands keep running without a driver
+    resume_schedules()
+    http_server = create_server(opt, app)
     http_server.serve_forever()
 
 
 if __name__ == '__main__':
-    options, _ = PARSER.parse_args()
+    options, _ = create_parser().parse_args()
     #pylint: disable=W0142
     run(**vars(options))
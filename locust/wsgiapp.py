@@ -0,0 +1,154 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+"""The lightweight WSGI application of the locust agent webservice.
+
+Serves the same request/response contract as the flask application of
+locust.webservice, but does not import Flask, flask_restful and requests.
+"""
+
+from json import dumps
+from httplib import OK, FORBIDDEN, NOT_FOUND, METHOD_NOT_ALLOWED, responses
+from types import GeneratorType
+
+from locust.api import Agent
+from locust.common import get_list_pb_methods
+from locust.common.encoding import encode_response
+
+__all__ = ['LocustApp', 'get_runner', 'help_message', 'stream_chunks']
+
+STREAM_MIMETYPE = 'application/x-ndjson'
+
+CMDS = get_list_pb_methods(Agent)
+
+#pylint: disable=C0103
+RUNNER = None
+
+
+def get_runner():
+    """Return the shared ValidatorRunner instance."""
+    #pylint: disable=W0603
+    global RUNNER
+    if RUNNER is None:
+        from locust.validator_runner import ValidatorRunner
+        RUNNER = ValidatorRunner()
+    return RUNNER
+
+
+def help_message():
+    """Return string message with list of available methods of the locust
+    agent and usage example."""
+    try:
+        list_of_commands = dumps(CMDS.keys(), indent=2)
+    except TypeError:
+        list_of_commands = 'ERROR: UNABLE_TO_GET_COMMANDS'
+    return ('Hi there! \n '
+            'Basic usage:\n POST:\n'
+            '       json_1 = u\'{"command": "get_process" , "arguments":'
+            '{"pids": [15870,15913], "names": []},"key":host_key}\'\n\n'
+            'RESPONSE:\n    '
+            '[{"status": "sleeping", "node": "119004516906817"\n '
+            '"endpoint": "127.0.1.1", "name": "python2.7",\n '
+            '"cmd": "/usr/bin/python2.7 -u /home/usr/websevice/webservice'
+            '.py\n 8086", "pid": 15870,\n '
+            '"uuid": "e4d4951a-08d6-11e3-b487-6c3be5f4f741"},\n '
+            '{"status": "sleeping", "node": "119004516906817",\n '
+            '"endpoint": "127.0.1.1", "name": "firefox",\n '
+            '"cmd": "/usr/lib/firefox/firefox", "pid": 15913,\n '
+            '"uuid": "e4d52944-08d6-11e3-b487-6c3be5f4f741"}]\n\n '
+            'COMMANDS: \n %s') % list_of_commands
+
+
+def stream_chunks(chunks):
+    """Serialize command result chunks as JSON lines.
+
+    An error raised while the command is producing chunks is sent as the
+    last line in the same format as a regular error response.
+    """
+    try:
+        for chunk in chunks:
+            yield dumps(chunk) + '\n'
+    #pylint: disable=W0703
+    except Exception as ex:
+        yield dumps({"status": "unexpected_error", "value": str(ex)}) + '\n'
+
+
+def run_command(data, accept=None, accept_encoding=None):
+    """Validate and run a command from POST data.
+
+    Args:
+      data (str): POST data.
+      accept (str): Value of the request Accept header.
+      accept_encoding (str): Value of the request Accept-Encoding header.
+
+    Returns:
+      tuple: (<status code>, <dict of headers>, <body or chunks iterator>).
+    """
+    err, value = get_runner().validate_and_run(data)
+    code = OK
+    if err:
+        value = {"status": err, "value": value}
+        code = FORBIDDEN
+    elif isinstance(value, GeneratorType):
+        return code, {'Content-Type': STREAM_MIMETYPE}, stream_chunks(value)
+    body, headers = encode_response(value, accept=accept,
+                                    accept_encoding=accept_encoding)
+    return code, headers, body
+
+
+#pylint: disable=R0903
+class LocustApp(object):
+    """Locust agent WSGI application.
+
+    Handles GET and POST requests to the index the same way as the locust
+    resource of the flask application does.
+    """
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '/') not in ('', '/'):
+            return self._respond(start_response, NOT_FOUND,
+                                 {'message': 'Not Found'})
+        method = environ.get('REQUEST_METHOD', 'GET')
+        if method == 'GET':
+            return self._respond(start_response, OK, help_message())
+        if method != 'POST':
+            return self._respond(start_response, METHOD_NOT_ALLOWED,
+                                 {'message': 'Method Not Allowed'})
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        data = environ['wsgi.input'].read(length) if length else ''
+        code, headers, body = run_command(
+            data, accept=environ.get('HTTP_ACCEPT'),
+            accept_encoding=environ.get('HTTP_ACCEPT_ENCODING'))
+        if isinstance(body, str):
+            headers['Content-Length'] = str(len(body))
+            body = [body]
+        start_response(self._status(code), headers.items())
+        return body
+
+    @staticmethod
+    def _status(code):
+        """Return WSGI status line for the given code."""
+        return '%d %s' % (code, responses[code])
+
+    def _respond(self, start_response, code, value):
+        """Send JSON encoded value."""
+        body = dumps(value) + '\n'
+        start_response(self._status(code),
+                       [('Content-Type', 'application/json'),
+                        ('Content-Length', str(len(body)))])
+        return [body]
@@ -14,13 +14,33 @@
 
 """Locust Driver module."""
 #pylint: disable=too-many-arguments,too-many-locals,unused-argument
-from urllib2 import urlopen, HTTPError, Request
-from hashlib import sha256
 from json import dumps, loads
-from time import sleep
+from multiprocessing.pool import ThreadPool
+from Queue import Queue, Full
+from threading import Event
+from time import sleep, time
+from uuid import uuid4
+
+from locustdriver.connection import (NodeError, ConnectionPool, read_chunks,
+                                     is_error, parse_address,
+                                     DEF_CONNECT_TIMEOUT, DEF_READ_TIMEOUT,
+                                     DEF_MAX_IDLE)
+from locustdriver.encoding import (REQUEST_HEADERS, STREAM_HEADERS,
+                                   decompress_body, decompress_chunks,
+                                   expand_compact, is_compact)
+from locustdriver.clock import monotonic
+from locustdriver.broadcast import (build_tree, subtree_names, DEF_FANOUT,
+                                    HOP_MARGIN)
+#pylint: disable=W0611
+from locustdriver.inventory import Inventory, Any, Percent, freeze
+from locustdriver.jsonstream import ListStream
+from locustdriver.resilience import IDEMPOTENT_PREFIXES
 
 
 DEF_TIMEOUT = 60
+DEF_WORKERS = 32
+DEF_STREAM_BUFFER = 1000
+DEF_PARTITION_MARGIN = 30
 
 
 class LocustDriver(object):
@@ -28,77 +48,524 @@ class LocustDriver(object):
     {"nodes":{"zzzz":"yyy.yyy.yyy.yyy"}
     "node_groups":{"group1":["zzzz","yyyy"]}
     "keys":{"zzzzz":"yyyyyyy"}}
+
+    Nodes are kept in an Inventory (see locustdriver.inventory).
+    node_groups of every command accept selectors of a part of a group:
+    Percent('db', 30), Any('cache', 2, seed=7) or 'db[30%]', 'cache[2@7]'.
     """
 
-    def __init__(self, nodes=None):
-        self.nodes = nodes if nodes else {}
+    def __init__(self, nodes=None, workers=DEF_WORKERS,
+                 connect_timeout=DEF_CONNECT_TIMEOUT,
+                 read_timeout=DEF_READ_TIMEOUT, keep_alive=True, retry=None,
+                 breaker=None, recorder=None):
+        """
+        Arguments:
+            nodes - nodes description, see the class docstring, or an
+                    Inventory;
+            workers - max amount of nodes a command is sent to at the same
+                      time;
+            connect_timeout - seconds to connect to a node;
+            read_timeout - seconds to wait for a node response. Commands
+                           that are executed longer on a node are reported
+                           as "timeout" for the node;
+            keep_alive - keep connections to nodes open and reuse them by
+                         following commands;
+            retry - RetryPolicy of idempotent commands that failed because
+                    of the network, no retries by default;
+            breaker - CircuitBreaker that fails commands to unreachable
+                      nodes immediately;
+            recorder - SessionRecorder of all commands sent to nodes.
+        """
+        self.nodes = nodes
+        self.workers = workers
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retry = retry
+        self.breaker = breaker
+        self.recorder = recorder
+        self._pool = None
+        self._rtt = {}
+        self.connections = ConnectionPool(
+            max_idle=DEF_MAX_IDLE if keep_alive else 0)
+
+    @classmethod
+    def from_inventory(cls, path, **kwargs):
+        """Create driver for nodes of a JSON or YAML inventory file."""
+        #pylint: disable=W0142
+        return cls(Inventory.from_file(path), **kwargs)
+
+    @property
+    def nodes(self):
+        """Nodes description in the format of the class docstring.
+
+        It is a read-only view built from the inventory, changes raise
+        TypeError. Assign a new description or an Inventory to replace the
+        nodes, add nodes by add_node() or change the inventory.
+        """
+        return freeze(self.inventory.as_dict() if self.inventory else {})
+
+    @nodes.setter
+    def nodes(self, nodes):
+        """Replace the inventory by the nodes description or Inventory."""
+        if isinstance(nodes, Inventory):
+            self.inventory = nodes
+        else:
+            self.inventory = Inventory.from_dict(nodes or {})
 
     #------------------------------------------------------------------
     # Driver section
     #------------------------------------------------------------------
-    def add_node(self, node_name='', node_ip='', node_group='', key=''):
+    def add_node(self, node_name='', node_ip='', node_group='', key='',
+                 labels=None):
         """Adding node for tests."""
-        def add(_node_name, _node_ip, _node_group, _key):
-            """Internal method for adding nodes parameters to self.nodes."""
-            if _node_group in self.nodes['node_groups']:
-                self.nodes['node_groups'][_node_group].append(_node_name)
-            else:
-                self.nodes['node_groups'][_node_group] = [_node_name]
-            self.nodes['nodes'][_node_name] = _node_ip
-            self.nodes['keys'][_node_name] = _key
-
-        if not self.nodes:
-            self.nodes = {
-                'nodes': {},
-                'node_groups': {},
-                'keys': {}
-            }
-        add(node_name, node_ip, node_group, key)
-
-    def _prepare_nodes(self, nodes=None, node_groups=None):
-        """ prepare nodes before test execution """
-        if not self.nodes:
+        if node_name in self.inventory:
+            node = self.inventory.nodes[node_name]
+            groups = node.groups
+            if node_group not in groups:
+                groups += (node_group, )
+            labels = dict(node.labels, **(labels or {}))
+        else:
+            groups = node_group
+        self.inventory.add(node_name, node_ip, key=key, groups=groups,
+                           labels=labels)
+
+    def _prepare_nodes(self, nodes=None, node_groups=None, labels=None):
+        """Return nodes selected by names, groups and labels."""
+        if not self.inventory:
             raise NameError('Nodes not initialized')
-        output = {}
-        node_groups = [node_groups] if not isinstance(node_groups, list) else \
-            node_groups
-        nodes = [nodes] if not isinstance(nodes, list) else nodes
-        if node_groups:
-            for each in node_groups:
-                if each in self.nodes['node_groups']:
-                    for every in self.nodes['node_groups'][each]:
-                        output[every] = self.nodes['nodes'][every]
-        if nodes:
-            for each in nodes:
-                if each in self.nodes['nodes'] and each not in output:
-                    output[each] = self.nodes['nodes'][each]
-        if not (nodes or node_groups):
-            output = self.nodes['nodes']
-        print output
-        return output
+        return self.inventory.resolve(nodes, node_groups, labels)
+
+    def close(self):
+        """Close connections to nodes and stop dispatch workers."""
+        self.connections.clear()
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def _send_command(self, ip_address, data):
+        """Internal send command method.
+
+        Raises NodeError if the node did not answer in time.
+        """
+        idempotent = bool(data) and self._is_idempotent(data['command'])
+        data = dumps(data) if data else None
+        headers, result = self.connections.request(
+            ip_address, data, REQUEST_HEADERS,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout, idempotent=idempotent)
+        result = loads(decompress_body(result, headers))
+        return expand_compact(result) if is_compact(headers) else result
+
+    def _is_idempotent(self, command):
+        """Check if the command could be sent to a node again."""
+        if self.retry is not None:
+            return self.retry.is_idempotent(command)
+        return command.startswith(IDEMPOTENT_PREFIXES)
+
+    def _call_node(self, task):
+        """Send command to one node.
+
+        Arguments:
+            task - tuple (<node name>, <node address>, <request data>).
+
+        Returns:
+            tuple (<node name>, <result>, <latency in seconds>). Result is
+            {"status": "timeout"|"connection_error", "value": <message>}
+            if the node did not answer and {"status": "circuit_open", ...}
+            if the circuit breaker of the node is open.
+        """
+        name, address, data = task
+        start, started = time(), monotonic()
+        attempt = 0
+        while True:
+            if self.breaker is not None and self.breaker.is_open(name):
+                return self._record(name, data, started,
+                                    self.breaker.open_result(name),
+                                    time() - start)
+            request = self._stamp(name, data)
+            try:
+                result = self._send_command(address, request)
+            except NodeError as error:
+                result = error.as_result()
+            except ValueError as error:
+                result = {'status': 'bad_response',
+                          'value': 'Could not decode response: %s' % error}
+            self._measure_rtt(name, request, result)
+            if self.breaker is not None:
+                self.breaker.record(name, address, result)
+            if not (self.retry and self.retry.should_retry(
+                    data['command'], result, attempt)):
+                return self._record(name, data, started, result,
+                                    time() - start)
+            sleep(self.retry.delay(attempt))
+            attempt += 1
+
+    def _record(self, name, data, started, result, latency):
+        """Pass the command to the recorder, return (<node name>,
+        <result>, <latency>)."""
+        if self.recorder is not None:
+            self.recorder.record(name, data, started, latency, result)
+        return name, result, latency
+
+    def _stamp(self, name, data):
+        """Return request data with the driver time of sending and the
+        round trip time of the node, the agent estimates its clock offset
+        with them."""
+        request = dict(data, sent_at=time())
+        if name in self._rtt:
+            request['rtt'] = self._rtt[name]
+        return request
+
+    def _measure_rtt(self, name, request, result):
+        """Update the round trip time of the node with the request.
+
+        Round trip time is the least time of a request, the time of
+        commands execution is in the time of other requests.
+        """
+        if 'start_at' in request or (isinstance(result, dict) and
+                                     'status' in result):
+            return
+        spent = time() - request['sent_at']
+        if spent < self._rtt.get(name, spent + 1):
+            self._rtt[name] = spent
 
     @staticmethod
-    def _send_command(ip_address, data):
-        """Internal send command method."""
+    def _tasks(data, work_nodes):
+        """Return list of (<node name>, <node address>, <request data>)
+        with the node token in request data."""
+        tasks = []
+        for node in work_nodes:
+            node_data = dict(data)
+            node_data['key'] = node.token
+            tasks.append((node.name, node.address, node_data))
+        return tasks
+
+    def _dispatch(self, data, work_nodes):
+        """Send command to the nodes concurrently.
+
+        Arguments:
+            data - request data without the key;
+            work_nodes - Node objects of the inventory.
+
+        Yields:
+            (<node name>, <result>, <latency>) as soon as a node answers.
+        """
+        return self._run_tasks(self._tasks(data, work_nodes))
+
+    def _run_tasks(self, tasks):
+        """Send prepared requests to the nodes concurrently.
+
+        Arguments:
+            tasks - list of (<node name>, <node address>, <request data>).
+
+        Yields:
+            (<node name>, <result>, <latency>) as soon as a node answers.
+        """
+        if len(tasks) == 1:
+            yield self._call_node(tasks[0])
+            return
+        if self._pool is None:
+            self._pool = ThreadPool(self.workers)
+        for each in self._pool.imap_unordered(self._call_node, tasks):
+            yield each
+
+    def _stream_records(self, address, data, key):
+        """Send command to one node and yield records of its response as
+        soon as they are decoded.
+
+        Raises NodeError if the node did not answer in time.
+        """
+        conn, response = self.connections.send(
+            address, dumps(dict(data, sent_at=time())), STREAM_HEADERS,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            idempotent=self._is_idempotent(data['command']))
+        complete = False
+        try:
+            chunks = decompress_chunks(read_chunks(response, address),
+                                       response.msg)
+            stream = ListStream(chunks, key)
+            for record in stream:
+                yield record
+            if not stream.found:
+                yield stream.rest
+            for _ in chunks:
+                pass
+            complete = True
+        finally:
+            if complete:
+                self.connections.release(address, conn, response)
+            else:
+                conn.close()
+
+    def iter_records(self, command, nodes=None, node_groups=None,
+                     arguments=None, labels=None, key='list',
+                     buffer_size=DEF_STREAM_BUFFER):
+        """
+        Send command to the nodes and iterate records of responses as they
+        arrive, without keeping whole responses in memory.
+
+        Arguments:
+            command - name of the agent command;
+            nodes - list of nodes to execute command;
+            node_groups - list of node groups to execute command;
+            arguments - dict of the command arguments;
+            labels - dict of labels the nodes must have;
+            key - name of the list of records in responses;
+            buffer_size - max amount of received records that are not
+                          iterated yet. Nodes wait while the buffer is full.
+
+        Yields:
+            (<node name>, <record>). A response without the list of records
+            (e.g. an error) is yielded as a single record.
+
+        Example:
+            for node, process in driver.iter_records('list_process'):
+                print node, process['pid']
+        """
+        data = dict(command=command)
+        if arguments:
+            data['arguments'] = arguments
+        tasks = self._tasks(data, self._prepare_nodes(nodes, node_groups,
+                                                      labels))
+        if not tasks:
+            return
+        records = Queue(buffer_size)
+        stop = Event()
+
+        def put(item):
+            """Put item to the buffer until iteration is stopped."""
+            while not stop.is_set():
+                try:
+                    records.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def stream_node(task):
+            """Put records of one node to the buffer."""
+            name, address, node_data = task
+            try:
+                if stop.is_set():
+                    return
+                for record in self._stream_records(address, node_data, key):
+                    if not put((name, record)):
+                        return
+            except NodeError as error:
+                put((name, error.as_result()))
+            except ValueError as error:
+                put((name, {'status': 'bad_response',
+                            'value': 'Could not decode response: %s' %
+                                     error}))
+            finally:
+                put(None)
+
+        pool = ThreadPool(min(self.workers, len(tasks)))
+        pool.map_async(stream_node, tasks)
+        pool.close()
         try:
-            data = dumps(data) if data else None
-            if not ip_address.startswith('http://'):
-                ip_address = 'http://' + ip_address
-            headers = {"Content-Type": "application/json"}
-            request = Request(ip_address, data=data, headers=headers)
-            result = urlopen(request).read()
-            result = result.replace('true', '1').replace('false', '0')\
-                .replace('null', '""')
-            return result
-        except HTTPError as error:
-            return error.read()
+            done = 0
+            while done < len(tasks):
+                item = records.get()
+                if item is None:
+                    done += 1
+                else:
+                    yield item
+        finally:
+            stop.set()
+
+    @staticmethod
+    def _command_data(command, arguments=None, start_at=None):
+        """Return request data of the command without the key."""
+        data = dict(command=command)
+        if arguments:
+            data['arguments'] = arguments
+        if start_at is not None:
+            data['start_at'] = start_at
+        return data
+
+    def send_command(self, command, nodes=None, node_groups=None,
+                     arguments=None, labels=None, start_at=None,
+                     callback=None):
+        """
+        Send any agent command with given arguments to the nodes.
+
+        Arguments:
+            command - name of the agent command;
+            nodes - list of nodes to execute command;
+            node_groups - list of node groups to execute command;
+            arguments - dict of the command arguments;
+            labels - dict of labels the nodes must have;
+            start_at - wall clock time (time.time() of the driver) the
+                       nodes start the command at. Agents correct it by the
+                       offset of their clocks and wrap results to
+                       {"result", "started_at", "start_error",
+                       "clock_offset"};
+            callback - callable(<node name>, <result>, <latency>) called
+                       as soon as a node answers.
+
+        Returns:
+            {<node name>: <result>}
+        """
+        results = {}
+        for name, result, latency in self.as_completed(
+                command, nodes, node_groups, arguments, labels, start_at):
+            results[name] = result
+            if callback is not None:
+                callback(name, result, latency)
+        return results
+
+    def as_completed(self, command, nodes=None, node_groups=None,
+                     arguments=None, labels=None, start_at=None):
+        """
+        Send any agent command to the nodes and yield results in the order
+        the nodes answer, see send_command for arguments.
+
+        Leaving the loop early does not cancel requests already sent, their
+        results are dropped.
+
+        Yields:
+            (<node name>, <result>, <latency in seconds>)
+        """
+        work_nodes = self._prepare_nodes(nodes, node_groups, labels)
+        return self._dispatch(self._command_data(command, arguments,
+                                                 start_at), work_nodes)
+
+    def first_successes(self, count, command, nodes=None, node_groups=None,
+                        arguments=None, labels=None, failed=is_error):
+        """
+        Send any agent command to the nodes and wait for the first "count"
+        successful results only.
+
+        Arguments:
+            count - amount of successful results to wait for;
+            failed - callable(<result>) that checks if the result is a
+                     failure, agent and driver errors by default;
+            see send_command for other arguments.
+
+        Returns:
+            {<node name>: <result>} of up to "count" nodes that answered
+            successfully first, less if too many nodes failed.
+        """
+        results = {}
+        for name, result, _ in self.as_completed(command, nodes, node_groups,
+                                                 arguments, labels):
+            if failed(result):
+                continue
+            results[name] = result
+            if len(results) >= count:
+                break
+        return results
+
+    def quorum(self, count, command, nodes=None, node_groups=None,
+               arguments=None, labels=None, failed=is_error):
+        """
+        Send any agent command to the nodes and wait until "count" of them
+        succeed or so many of them fail that it is not possible anymore.
+
+        Arguments:
+            count - amount of successful results of the quorum;
+            failed - callable(<result>) that checks if the result is a
+                     failure, agent and driver errors by default;
+            see send_command for other arguments.
+
+        Returns:
+            (<quorum reached>, {<node name>: <result>} of nodes answered
+            before the decision)
+        """
+        work_nodes = self._prepare_nodes(nodes, node_groups, labels)
+        data = self._command_data(command, arguments)
+        pending = len(work_nodes)
+        results, successes = {}, 0
+        if count <= 0:
+            return True, results
+        for name, result, _ in self._dispatch(data, work_nodes):
+            results[name] = result
+            pending -= 1
+            if not failed(result):
+                successes += 1
+            if successes >= count:
+                return True, results
+            if successes + pending < count:
+                break
+        return False, results
+
+    def broadcast(self, command, nodes=None, node_groups=None,
+                  arguments=None, labels=None, fanout=DEF_FANOUT,
+                  timeout=None):
+        """
+        Send any agent command to the nodes through a tree of relays.
+
+        The driver sends the command to "fanout" nodes only, every node
+        executes it and relays it to up to "fanout" other nodes (see
+        locustdriver.broadcast). Results of the whole tree are merged by
+        the relays.
+
+        Arguments:
+            command - name of the agent command;
+            nodes - list of nodes to execute command;
+            node_groups - list of node groups to execute command;
+            arguments - dict of the command arguments;
+            labels - dict of labels the nodes must have;
+            fanout - max amount of nodes a node relays the command to;
+            timeout - seconds the roots wait for their subtrees, by default
+                      a bit less than read_timeout.
+
+        Returns:
+            {<node name>: <result>}. An unreachable relay gives its error
+            to every node of its subtree.
+
+        Every relay receives the tokens of all nodes of its subtree, so a
+        relay could send any command to them. It trades the isolation of
+        node keys for fewer driver connections: broadcast only through
+        nodes trusted as much as the driver.
+        """
+        work_nodes = self._prepare_nodes(nodes, node_groups, labels)
+        tasks, trees = self._broadcast_tasks(command, work_nodes, arguments,
+                                             fanout, timeout)
+        return self._merge_relays(self._run_tasks(tasks), trees)
+
+    def _broadcast_tasks(self, command, work_nodes, arguments, fanout,
+                         timeout):
+        """Return relay tasks of the roots of the broadcast tree and
+        {<root name>: <root tree>}."""
+        roots = build_tree(work_nodes, fanout)
+        if timeout is None:
+            timeout = max(HOP_MARGIN, self.read_timeout - HOP_MARGIN)
+        tasks, trees = [], {}
+        for root in roots:
+            trees[root['name']] = root
+            tasks.append((root['name'], root['address'], {
+                'command': 'relay', 'key': root['token'],
+                'arguments': {'name': root['name'], 'command': command,
+                              'arguments': arguments or {},
+                              'targets': root['targets'],
+                              'timeout': timeout}}))
+        return tasks, trees
+
+    @staticmethod
+    def _merge_relays(answers, trees):
+        """Merge results of the relay roots to {<node name>: <result>}."""
+        results = {}
+        for name, result, _ in answers:
+            if isinstance(result, dict) and not is_error(result):
+                results.update(result)
+                continue
+            if not isinstance(result, dict):
+                result = {'status': 'bad_response',
+                          'value': 'Unexpected relay response: %r' % result}
+            for each in subtree_names(trees[name]):
+                results[each] = result
+        return results
 
     def _basic_cmd(self, command='', nodes=None, node_groups=None, pids=None,
                    names=None, adapters=None, timeout=0,
                    disable_network_timeout=0, enable_network_timeout=0,
                    cmd='', result_should_contain='',
                    result_should_not_contain='', file_size=None,
-                   thread_limit=None, dnsname=''):
+                   thread_limit=None, dnsname='', output_limit=None,
+                   cmds=None, workers=None):
         """
         Basic command method. It takes bunch of args specific sets is
         applied to specific methods.
@@ -118,6 +585,9 @@ class LocustDriver(object):
             result_should_not_contain - validation for not in
             file_size - for burn_hdd
             thread_limit - for burn_hdd
+            output_limit - for exec_command and exec_commands
+            cmds - for exec_commands
+            workers - for exec_commands
 
         Returns:
             Execution result
@@ -126,17 +596,8 @@ class LocustDriver(object):
         chk = lambda x, y: y and x not in ['self', 'nodes', 'node_groups',
                                            'chk']
         args = dict((k, v) for k, v in locals().items() if chk(k, v))
-        data = dict(command=args.pop('command'), arguments=args)
-
-        if not isinstance(nodes, list) and nodes:
-            nodes = [nodes]
-        work_nodes = self._prepare_nodes(nodes, node_groups)
-        result = {}
-        for key, value in work_nodes.items():
-            data['key'] = sha256(self.nodes['keys'][key]).hexdigest()
-            result[key] = loads(self._send_command(value, data))
-        print data
-        return result
+        command = args.pop('command')
+        return self.send_command(command, nodes, node_groups, args)
 
     #------------------------------------------------------------------
     # Process tools section
@@ -214,6 +675,25 @@ class LocustDriver(object):
         """
         return self._basic_cmd('list_process', nodes, node_groups)
 
+    def get_stats(self, nodes=None, node_groups=None, names=None,
+                  interval=0.2):
+        """
+        Return lightweight load stats of the nodes and of named processes,
+        see locustdriver.metrics to select nodes by them.
+
+        Arguments:
+                nodes - list of nodes to execute command
+                node_groups - list of node groups to execute COMMANDS
+                names - list of process name patterns
+                interval - seconds CPU usage is measured
+
+        Return:
+            {<node name>: {cpu, memory, load, cpu_count, processes}}
+        """
+        return self.send_command('get_stats', nodes, node_groups,
+                                 {'names': names or [],
+                                  'interval': interval})
+
     def resume_process(self, nodes=None, node_groups=None, pids=None,
                        names=None):
         """
@@ -250,8 +730,114 @@ class LocustDriver(object):
         return self._basic_cmd('suspend_process', nodes, node_groups, pids,
                                names)
 
+    def run_scenario(self, steps, nodes=None, node_groups=None,
+                     timeout=DEF_TIMEOUT, wait=True, scenario_id=None):
+        """
+        Execute a scenario of commands, delays, waits and loops on every
+        node by the node itself, see locust.scenario_tools for steps.
+        Nodes run scenarios in background, results are fetched by
+        get_scenario with the same scenario id.
+
+        Arguments:
+            steps - list of steps;
+            nodes - list of nodes to execute command
+            node_groups - list of node groups to execute COMMANDS
+            timeout - seconds the scenario may take on a node, with
+                      "wait" it is capped to a bit less than read_timeout;
+            wait - wait for the end of the scenario, otherwise the nodes
+                   answer with "running" status at once;
+            scenario_id - id of the scenario on every node, random by
+                          default.
+
+        Return:
+            {<node name>: {scenario_id, status, started_at, duration,
+            max_jitter, trace}}
+        """
+        arguments = {'steps': steps, 'timeout': timeout,
+                     'scenario_id': scenario_id or uuid4().hex[:12]}
+        if wait:
+            # the node waits a bit longer than the scenario may take to
+            # answer with its final status
+            limit = max(HOP_MARGIN, self.read_timeout - HOP_MARGIN)
+            arguments.update(timeout=min(timeout, limit),
+                             wait=max(limit,
+                                      self.read_timeout - HOP_MARGIN / 2))
+        return self.send_command('run_scenario', nodes, node_groups,
+                                 arguments)
+
+    def get_scenario(self, scenario_id, nodes=None, node_groups=None,
+                     wait=0):
+        """
+        Return traces of a scenario started by run_scenario.
+
+        Arguments:
+            scenario_id - id of the scenario;
+            nodes - list of nodes to execute command
+            node_groups - list of node groups to execute COMMANDS
+            wait - seconds to wait for the end of the scenario, capped to
+                   a bit less than read_timeout.
+
+        Return:
+            {<node name>: {scenario_id, status, started_at, duration,
+            max_jitter, trace}}
+        """
+        limit = max(HOP_MARGIN, self.read_timeout - HOP_MARGIN)
+        return self.send_command('get_scenario', nodes, node_groups,
+                                 {'scenario_id': scenario_id,
+                                  'wait': min(wait, limit)})
+
+    #pylint: disable=R0913
+    def create_schedule(self, command, nodes=None, node_groups=None,
+                        arguments=None, interval=None, cron=None,
+                        schedule_id=None):
+        """
+        Execute the command on the nodes periodically by the nodes
+        themselves. Schedules are kept over agent restarts.
+
+        Arguments:
+            command - name of the agent command;
+            nodes - list of nodes to execute command
+            node_groups - list of node groups to execute COMMANDS
+            arguments - dict of arguments of the command;
+            interval - seconds between runs;
+            cron - crontab expression of runs, either interval or cron
+                   should be given;
+            schedule_id - id of the schedule, the same id on all nodes
+                          makes it easy to delete.
+
+        Return:
+            {<node name>: {id, command, arguments, interval, cron,
+            next_run_time, runs, errors, late, missed, ...}}
+        """
+        return self.send_command('create_schedule', nodes, node_groups,
+                                 {'command': command,
+                                  'arguments': arguments or {},
+                                  'interval': interval, 'cron': cron,
+                                  'schedule_id': schedule_id})
+
+    def list_schedules(self, nodes=None, node_groups=None):
+        """
+        Return schedules of the nodes with counters of runs, late and
+        missed runs.
+
+        Return:
+            {<node name>: {list: [<schedule>]}}
+        """
+        return self.send_command('list_schedules', nodes, node_groups)
+
+    def delete_schedule(self, schedule_id, nodes=None, node_groups=None):
+        """
+        Stop and remove the schedule on the nodes.
+
+        Return:
+            {<node name>: {list: [{status, message}]}}
+        """
+        return self.send_command('delete_schedule', nodes, node_groups,
+                                 {'schedule_id': schedule_id})
+
     def exec_command(self, nodes=None, node_groups=None, cmd='',
-                     result_should_contain='', result_should_not_contain=''):
+                     result_should_contain='', result_should_not_contain='',
+                     timeout=DEF_TIMEOUT, output_limit=None):
         """
         execute shell/batch command on host.
 
@@ -264,6 +850,10 @@ class LocustDriver(object):
                              that must be in result
             result_not_contain - optional argument to pass string
             that must be not presented in result
+            timeout - seconds before the command is killed on the node
+                      (default: 60 seconds)
+            output_limit - max bytes of output kept by the node,
+                           head and tail of the output are returned
         """
         if not cmd:
             raise KeyError('cmd: command is not specified')
@@ -271,7 +861,36 @@ class LocustDriver(object):
                                node_groups=node_groups, cmd=cmd,
                                result_should_contain=result_should_contain,
                                result_should_not_contain=
-                               result_should_not_contain)
+                               result_should_not_contain,
+                               timeout=timeout, output_limit=output_limit)
+
+    def exec_commands(self, nodes=None, node_groups=None, cmds=None,
+                      timeout=DEF_TIMEOUT, workers=None, output_limit=None):
+        """
+        Execute a list of shell/batch commands concurrently on host.
+
+        Arguments:
+            nodes - list of nodes to execute get_process command
+                    (eg. ["192.168.0.1:8080","192.168.0.1:4444"])
+            node_groups - list of node groups to execute COMMANDS
+            cmds - list of commands. Each command is a string or a dict
+                   {"cmd": ..., "timeout": ..., "result_should_contain": ...}
+                   with per-command options
+            timeout - default seconds before a command is killed on the node
+                      (default: 60 seconds)
+            workers - max amount of commands running at the same time
+            output_limit - max bytes of output kept for each command
+
+        Return:
+            {list: [{command1_result}, ..., {commandN_result}], duration}
+            per node, results contain exit_code and duration of each command.
+        """
+        if not cmds:
+            raise KeyError('cmds: commands are not specified')
+        return self._basic_cmd('exec_commands', nodes=nodes,
+                               node_groups=node_groups, cmds=cmds,
+                               timeout=timeout, workers=workers,
+                               output_limit=output_limit)
 
     #------------------------------------------------------------------
     # Node tools section
@@ -380,6 +999,128 @@ class LocustDriver(object):
                                node_groups=node_groups, dnsname=dnsname,
                                timeout=timeout)
 
+    def block_peers(self, nodes=None, node_groups=None, peers=None,
+                    timeout=0):
+        """
+        Drop all traffic between the nodes and the peers.
+
+        Arguments:
+            nodes - list of nodes to execute command;
+            node_groups - list of node groups to execute command;
+            peers - list of IP addresses or host names of the peers;
+            timeout - seconds after which the nodes heal the partition,
+                      never if 0.
+        """
+        return self.send_command('block_peers', nodes, node_groups,
+                                 {'peers': peers or [], 'timeout': timeout})
+
+    def heal_partition(self, nodes=None, node_groups=None):
+        """
+        Remove all rules added by block_peers.
+
+        Arguments:
+            nodes - list of nodes to execute command;
+            node_groups - list of node groups to execute command.
+        """
+        return self.send_command('heal_partition', nodes, node_groups)
+
+    def _partition_tasks(self, groups):
+        """Return block_peers tasks of all nodes of the partition sides.
+
+        Arguments:
+            groups - list of sides, every side is a list of node names,
+                     group names or selectors.
+
+        Returns:
+            ([(<node name>, <node address>, <request data>)],
+             {<node name>: <side index>})
+        """
+        sides, owners = [], {}
+        for index, side in enumerate(groups):
+            side = side if isinstance(side, (list, tuple)) else [side]
+            nodes = self.inventory.resolve(
+                [each for each in side if each in self.inventory],
+                [each for each in side if each not in self.inventory])
+            for node in nodes:
+                if owners.setdefault(node.name, index) != index:
+                    raise ValueError('Node %s is in sides %s and %s' % (
+                        node.name, owners[node.name], index))
+            sides.append(nodes)
+        hosts = [[parse_address(node.address)[0] for node in nodes]
+                 for nodes in sides]
+        tasks = []
+        for index, nodes in enumerate(sides):
+            peers = sorted(set(host for other, side_hosts in enumerate(hosts)
+                               if other != index for host in side_hosts))
+            data = {'command': 'block_peers', 'arguments': {'peers': peers}}
+            tasks.extend(self._tasks(data, nodes))
+        return tasks, owners
+
+    def partition(self, groups, duration=None,
+                  safety_margin=DEF_PARTITION_MARGIN):
+        """
+        Split the cluster: nodes of every side can not reach nodes of other
+        sides, but stay reachable by clients and the driver.
+
+        Rules of all nodes are loaded in parallel, every node loads them by
+        one atomic batch. After "duration" seconds all nodes are healed in
+        parallel the same way.
+
+        Arguments:
+            groups - list of sides, every side is a list of node names,
+                     group names or selectors, e.g. [["db1"], ["web"]];
+            duration - seconds of the partition. If None the partition is
+                       not healed, use heal_partition;
+            safety_margin - nodes heal themselves "safety_margin" seconds
+                            after the planned end, if the driver is lost.
+
+        Returns:
+            {<node name>: {"side": <index>, "blocked": <block result>,
+            "healed": <heal result>, "window": <seconds the node was
+            partitioned by its clock or None>}}
+        """
+        tasks, report = self._partition_plan(groups, duration, safety_margin)
+        if not tasks:
+            return report
+        start = time()
+        for name, result, _ in self._run_tasks(tasks):
+            report[name]['blocked'] = result
+        if duration is None:
+            return report
+        sleep(max(0, start + duration - time()))
+        self._add_heal_results(
+            report, self._run_tasks(self._heal_tasks(report)))
+        return report
+
+    def _partition_plan(self, groups, duration, safety_margin):
+        """Return block_peers tasks of the partition and its empty
+        report."""
+        tasks, owners = self._partition_tasks(groups)
+        timeout = duration + safety_margin if duration is not None else 0
+        for _, _, data in tasks:
+            data['arguments']['timeout'] = timeout
+        report = dict((name, {'side': side, 'blocked': None, 'healed': None,
+                              'window': None})
+                      for name, side in owners.items())
+        return tasks, report
+
+    def _heal_tasks(self, report):
+        """Return heal_partition tasks of the nodes of the report."""
+        return self._tasks({'command': 'heal_partition'},
+                           self.inventory.resolve(list(report)))
+
+    @staticmethod
+    def _add_heal_results(report, answers):
+        """Add heal results and partition windows to the report."""
+        for name, result, _ in answers:
+            entry = report[name]
+            entry['healed'] = result
+            try:
+                entry['window'] = result['healed_at'] - \
+                    entry['blocked']['blocked_at']
+            except (KeyError, TypeError):
+                pass
+
     #------------------------------------------------------------------
     # Resource tools section
     #------------------------------------------------------------------
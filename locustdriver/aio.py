@@ -0,0 +1,1105 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Non-blocking Locust Driver.
+
+AsyncLocustDriver has every command of LocustDriver, but commands return a
+Future instead of waiting for the result. All requests are sent from one
+thread by an event loop over non-blocking sockets, so thousands of agents
+could be driven at the same time without a thread per agent.
+
+Only the standard library is used: a poll/select event loop, futures,
+generator based coroutines and a small HTTP/1.1 client with keep-alive
+connections.
+
+Example:
+    driver = AsyncLocustDriver()
+    driver.add_node('node1', '10.0.0.1:8086', 'db', 'secret')
+
+    @coroutine
+    def scenario():
+        processes = yield driver.get_process(node_groups='db',
+                                             names=['mysqld'])
+        yield driver.loop.sleep(5)
+        results = yield [driver.burn_cpu(nodes='node1', timeout=10),
+                         driver.list_network_adapters(node_groups='db')]
+        raise Return((processes, results))
+
+    processes, results = driver.run(scenario())
+"""
+import errno
+import heapq
+import os
+import select
+import socket
+from collections import deque
+from functools import wraps
+from json import dumps, loads
+from time import time
+from types import GeneratorType
+
+from locustdriver import LocustDriver, DEF_WORKERS, DEF_PARTITION_MARGIN
+from locustdriver.broadcast import DEF_FANOUT
+from locustdriver.clock import monotonic
+from locustdriver.connection import (NodeError, parse_address, is_error,
+                                     DEF_CONNECT_TIMEOUT, DEF_READ_TIMEOUT,
+                                     DEF_MAX_IDLE, DEF_IDLE_TIMEOUT)
+from locustdriver.encoding import (REQUEST_HEADERS, STREAM_HEADERS,
+                                   chunk_decompressor, decompress_body,
+                                   expand_compact, is_compact)
+from locustdriver.jsonstream import ListFeeder
+
+__all__ = ['AsyncLocustDriver', 'EventLoop', 'Future', 'HTTPClient',
+           'Return', 'coroutine', 'gather']
+
+READ = 1
+WRITE = 4
+ERROR = 8 | 16
+DEF_MAX_CONNECTIONS = 1024
+RECV_SIZE = 64 * 1024
+WOULD_BLOCK = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINPROGRESS,
+               getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK))
+
+
+class Future(object):
+    """Result of an operation that is not completed yet."""
+
+    def __init__(self):
+        self._done = False
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def done(self):
+        """Check if the result or the exception is set."""
+        return self._done
+
+    def result(self):
+        """Return the result or raise the exception of the operation."""
+        if not self._done:
+            raise RuntimeError('Result is not ready')
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        """Return the exception of the operation or None."""
+        if not self._done:
+            raise RuntimeError('Result is not ready')
+        return self._exception
+
+    def add_done_callback(self, callback):
+        """Call callback(future) when the future is done."""
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def _complete(self, result, exception):
+        """Set the outcome and call callbacks."""
+        if self._done:
+            raise RuntimeError('Future is already done')
+        self._result, self._exception, self._done = result, exception, True
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def set_result(self, result):
+        """Complete the future with the result."""
+        self._complete(result, None)
+
+    def set_exception(self, exception):
+        """Complete the future with the exception."""
+        self._complete(None, exception)
+
+
+def gather(futures):
+    """Return a future of the list of results of the given futures.
+
+    The first exception of the futures is the exception of the returned
+    future.
+    """
+    futures = list(futures)
+    future = Future()
+    if not futures:
+        future.set_result([])
+        return future
+    pending = [len(futures)]
+
+    def on_done(_):
+        """Complete the future when all futures are done."""
+        pending[0] -= 1
+        if pending[0] or future.done():
+            return
+        for each in futures:
+            if each.exception() is not None:
+                future.set_exception(each.exception())
+                return
+        future.set_result([each.result() for each in futures])
+
+    for each in futures:
+        each.add_done_callback(on_done)
+    return future
+
+
+class Return(Exception):
+    """Raised to return a value from a coroutine."""
+
+    def __init__(self, value=None):
+        super(Return, self).__init__(value)
+        self.value = value
+
+
+def _run_coroutine(gen, future, value=None, exception=None):
+    """Run the generator until it yields a future that is not done."""
+    while True:
+        try:
+            if exception is not None:
+                yielded = gen.throw(exception)
+            else:
+                yielded = gen.send(value)
+        except StopIteration:
+            future.set_result(None)
+            return
+        except Return as ret:
+            future.set_result(ret.value)
+            return
+        #pylint: disable=W0703
+        except Exception as ex:
+            future.set_exception(ex)
+            return
+        if isinstance(yielded, (list, tuple)):
+            yielded = gather(yielded)
+        if not isinstance(yielded, Future):
+            value, exception = None, TypeError(
+                'Coroutine yielded %r instead of a Future' % (yielded, ))
+            continue
+        if not yielded.done():
+            yielded.add_done_callback(
+                lambda done: _run_coroutine(gen, future, done._result,
+                                            done._exception))
+            return
+        value, exception = yielded._result, yielded._exception
+
+
+def coroutine(func):
+    """Make a generator function a coroutine that returns a Future.
+
+    The generator yields futures (or lists of futures) and receives their
+    results. The value of the coroutine is given with "raise Return(value)".
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        """Start the coroutine."""
+        future = Future()
+        try:
+            #pylint: disable=W0142
+            gen = func(*args, **kwargs)
+        #pylint: disable=W0703
+        except Exception as ex:
+            future.set_exception(ex)
+            return future
+        if isinstance(gen, GeneratorType):
+            _run_coroutine(gen, future)
+        else:
+            future.set_result(gen)
+        return future
+    return wrapper
+
+
+class EventLoop(object):
+    """Single threaded loop of socket events and timers.
+
+    Uses select.poll where it is available and select.select otherwise.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+        self._timers = []
+        self._ready = deque()
+        self._sequence = 0
+        self._stopped = False
+        self._poll = select.poll() if hasattr(select, 'poll') else None
+
+    def time(self):
+        """Return current loop time."""
+        return time()
+
+    def add_handler(self, fd, events, callback):
+        """Call callback(events) when events (READ|WRITE) happen on fd."""
+        self._handlers[fd] = (events, callback)
+        if self._poll is not None:
+            self._poll.register(fd, events)
+
+    def update_handler(self, fd, events, callback):
+        """Change events and callback of fd."""
+        self._handlers[fd] = (events, callback)
+        if self._poll is not None:
+            self._poll.modify(fd, events)
+
+    def remove_handler(self, fd):
+        """Stop watching fd."""
+        if self._handlers.pop(fd, None) is not None and \
+                self._poll is not None:
+            self._poll.unregister(fd)
+
+    def call_soon(self, callback, *args):
+        """Call callback(*args) on the next loop iteration."""
+        self._ready.append((callback, args))
+
+    def call_later(self, delay, callback, *args):
+        """Call callback(*args) after delay seconds.
+
+        Returns:
+          list: Timer handle for cancel_timer.
+        """
+        self._sequence += 1
+        timer = [self.time() + delay, self._sequence, callback, args]
+        heapq.heappush(self._timers, timer)
+        return timer
+
+    @staticmethod
+    def cancel_timer(timer):
+        """Cancel the timer returned by call_later."""
+        if timer is not None:
+            timer[2] = None
+
+    def sleep(self, delay):
+        """Return a future that is done after delay seconds."""
+        future = Future()
+        self.call_later(delay, future.set_result, None)
+        return future
+
+    def _wait(self, timeout):
+        """Wait for socket events and return [(fd, events)]."""
+        if self._poll is not None:
+            return self._poll.poll(timeout * 1000 if timeout is not None
+                                   else None)
+        readers = [fd for fd, (events, _) in self._handlers.items()
+                   if events & READ]
+        writers = [fd for fd, (events, _) in self._handlers.items()
+                   if events & WRITE]
+        if not (readers or writers):
+            if timeout:
+                select.select([], [], [], timeout)
+            return []
+        readable, writable, failed = select.select(readers, writers,
+                                                   readers + writers, timeout)
+        events = {}
+        for fds, event in ((readable, READ), (writable, WRITE),
+                           (failed, ERROR)):
+            for fd in fds:
+                events[fd] = events.get(fd, 0) | event
+        return events.items()
+
+    def _run_once(self):
+        """Run ready callbacks, expired timers and socket handlers."""
+        timeout = None
+        if self._ready:
+            timeout = 0
+        elif self._timers:
+            timeout = max(0, self._timers[0][0] - self.time())
+        try:
+            events = self._wait(timeout)
+        except (select.error, IOError, OSError) as ex:
+            if ex.args[0] != errno.EINTR:
+                raise
+            events = []
+        for fd, event in events:
+            handler = self._handlers.get(fd)
+            if handler is not None:
+                handler[1](event)
+        now = self.time()
+        while self._timers and self._timers[0][0] <= now:
+            _, _, callback, args = heapq.heappop(self._timers)
+            if callback is not None:
+                self._ready.append((callback, args))
+        for _ in range(len(self._ready)):
+            callback, args = self._ready.popleft()
+            callback(*args)
+
+    def run_until_complete(self, future):
+        """Run the loop until the future is done and return its result."""
+        while not future.done():
+            self._run_once()
+        return future.result()
+
+    def run_forever(self):
+        """Run the loop until stop() is called."""
+        self._stopped = False
+        while not self._stopped:
+            self._run_once()
+
+    def stop(self):
+        """Stop run_forever."""
+        self._stopped = True
+
+
+class Headers(dict):
+    """Response headers with case insensitive get."""
+
+    def get(self, name, default=None):
+        return dict.get(self, name.lower(), default)
+
+
+class ResponseParser(object):
+    """Incremental parser of HTTP/1.1 responses.
+
+    Attributes:
+      status (int): Response status code.
+      headers (Headers): Response headers.
+      keep_alive (bool): The connection could be reused.
+      on_body (callable): on_body(<headers>, <data>) is called with pieces
+        of the body as they arrive instead of keeping the body.
+    """
+
+    def __init__(self, on_body=None):
+        self.on_body = on_body
+        self.status = None
+        self.headers = None
+        self.keep_alive = False
+        self.received = False
+        self._buf = ''
+        self._body = []
+        self._length = None
+        self._chunked = False
+        self._until_close = False
+        self._done = False
+
+    def feed(self, data):
+        """Feed received data, return True if the response is complete."""
+        self.received = True
+        self._buf += data
+        if self.status is None and not self._parse_head():
+            return False
+        if self._chunked:
+            self._parse_chunks()
+        elif self._length is not None:
+            data, self._buf = self._buf[:self._length], ''
+            self._length -= len(data)
+            self._add_body(data)
+            self._done = not self._length
+        else:
+            self._add_body(self._buf)
+            self._buf = ''
+        return self._done
+
+    def _add_body(self, data):
+        """Keep the piece of the body or pass it to on_body."""
+        if not data:
+            return
+        if self.on_body is not None:
+            self.on_body(self.headers, data)
+        else:
+            self._body.append(data)
+
+    def feed_eof(self):
+        """Handle closed connection, return True if the response is
+        complete."""
+        if self._until_close and self.status is not None:
+            self._done = True
+        return self._done
+
+    def _parse_head(self):
+        """Parse status line and headers."""
+        end = self._buf.find('\r\n\r\n')
+        if end < 0:
+            return False
+        lines = self._buf[:end].split('\r\n')
+        self._buf = self._buf[end + 4:]
+        version, status = lines[0].split(' ', 2)[:2]
+        self.status = int(status)
+        self.headers = Headers()
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            self.headers[name.strip().lower()] = value.strip()
+        connection = self.headers.get('connection', '').lower()
+        self.keep_alive = (version == 'HTTP/1.1' and connection != 'close' or
+                           connection == 'keep-alive')
+        if self.status in (204, 304) or 100 <= self.status < 200:
+            self._length = 0
+        elif 'chunked' in self.headers.get('transfer-encoding', ''):
+            self._chunked = True
+        elif self.headers.get('content-length') is not None:
+            self._length = int(self.headers['content-length'])
+        else:
+            self._until_close = True
+            self.keep_alive = False
+        return True
+
+    def _parse_chunks(self):
+        """Parse chunks of chunked transfer encoding."""
+        while not self._done:
+            end = self._buf.find('\r\n')
+            if end < 0:
+                return
+            size = int(self._buf[:end].split(';')[0], 16)
+            if size == 0:
+                trailer = self._buf.find('\r\n\r\n', end)
+                if self._buf[end:end + 4] == '\r\n\r\n' or trailer >= 0:
+                    self._done = True
+                return
+            if len(self._buf) < end + 2 + size + 2:
+                return
+            data = self._buf[end + 2:end + 2 + size]
+            self._buf = self._buf[end + 2 + size + 2:]
+            self._add_body(data)
+
+    @property
+    def body(self):
+        """Response body."""
+        return ''.join(self._body)
+
+
+#pylint: disable=R0902
+class _Exchange(object):
+    """One request and response on a non-blocking connection."""
+
+    def __init__(self, client, address, request, future):
+        self.client = client
+        self.loop = client.loop
+        self.address = address
+        self.request = request
+        self.future = future
+        self.sock = None
+        self.reused = False
+        self.idempotent = False
+        self.on_body = None
+        self.parser = None
+        self.connect_timeout = client.connect_timeout
+        self.read_timeout = client.read_timeout
+        self._out = ''
+        self._timer = None
+
+    def start(self):
+        """Send the request through an idle or a new connection."""
+        self.sock = self.client.idle_socket(self.address)
+        if self.sock is None:
+            self._connect()
+        else:
+            self.reused = True
+            self._send()
+
+    def _set_timer(self, delay, message):
+        """(Re)start the timeout of the current stage."""
+        self.loop.cancel_timer(self._timer)
+        self._timer = self.loop.call_later(delay, self._fail, 'timeout',
+                                           message)
+
+    def _connect(self):
+        """Start connection to the node."""
+        host, port, _ = parse_address(self.address)
+        self.client.created += 1
+        try:
+            family, kind, proto, _, sockaddr = socket.getaddrinfo(
+                host, port, 0, socket.SOCK_STREAM)[0]
+            self.sock = socket.socket(family, kind, proto)
+            self.sock.setblocking(0)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            err = self.sock.connect_ex(sockaddr)
+        except socket.error as ex:
+            return self._fail('connection_error', 'Could not connect to '
+                                                  '%s: %s' % (self.address,
+                                                              ex))
+        if err == 0:
+            return self._send()
+        if err not in WOULD_BLOCK:
+            return self._fail('connection_error', 'Could not connect to '
+                              '%s: %s' % (self.address, os.strerror(err)))
+        self._set_timer(self.connect_timeout,
+                        'Connection to %s timed out after %s seconds' % (
+                            self.address, self.connect_timeout))
+        self.loop.add_handler(self.sock.fileno(), WRITE | ERROR,
+                              self._on_connect)
+
+    def _on_connect(self, _):
+        """Check the result of the connection."""
+        self.loop.remove_handler(self.sock.fileno())
+        err = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err:
+            return self._fail('connection_error', 'Could not connect to '
+                              '%s: %s' % (self.address, os.strerror(err)))
+        self._send()
+
+    def _send(self):
+        """Start sending the request."""
+        self.parser = ResponseParser(self.on_body)
+        self._out = self.request
+        self._set_timer(self.read_timeout,
+                        'No response from %s in %s seconds' % (
+                            self.address, self.read_timeout))
+        self.loop.add_handler(self.sock.fileno(), WRITE | ERROR,
+                              self._on_write)
+        self._on_write(WRITE)
+
+    def _on_write(self, _):
+        """Send the rest of the request."""
+        try:
+            sent = self.sock.send(self._out)
+        except socket.error as ex:
+            if ex.args[0] in WOULD_BLOCK:
+                return
+            return self._broken(ex)
+        self._out = self._out[sent:]
+        if not self._out:
+            self.loop.update_handler(self.sock.fileno(), READ | ERROR,
+                                     self._on_read)
+
+    def _on_read(self, _):
+        """Read the response."""
+        try:
+            data = self.sock.recv(RECV_SIZE)
+        except socket.error as ex:
+            if ex.args[0] in WOULD_BLOCK:
+                return
+            return self._broken(ex)
+        try:
+            if not data:
+                if self.parser.feed_eof():
+                    return self._finish()
+                return self._broken('connection closed')
+            self._set_timer(self.read_timeout,
+                            'Response from %s was not received in '
+                            'time' % self.address)
+            if self.parser.feed(data):
+                self._finish()
+        except ValueError as ex:
+            self._fail('bad_response', 'Response from %s is broken: %s' % (
+                self.address, ex))
+
+    def _broken(self, error):
+        """Handle a broken connection.
+
+        A request that could not be sent through a reused connection is
+        repeated once on a new connection: the node could have closed the
+        idle connection in the meantime. A sent request could have been
+        executed already, so it is repeated only if it is idempotent and
+        nothing was received.
+        """
+        if self.reused and not self.parser.received and \
+                (self._out or self.idempotent):
+            self._close()
+            self.reused = False
+            return self._connect()
+        self._fail('connection_error', 'Request to %s failed: %s' % (
+            self.address, error))
+
+    def _close(self):
+        """Stop watching and close the socket."""
+        self.loop.cancel_timer(self._timer)
+        self._timer = None
+        if self.sock is not None:
+            try:
+                self.loop.remove_handler(self.sock.fileno())
+            except (KeyError, socket.error):
+                pass
+            self.sock.close()
+            self.sock = None
+
+    def _finish(self):
+        """Complete the future with the response."""
+        self.loop.cancel_timer(self._timer)
+        self.loop.remove_handler(self.sock.fileno())
+        if self.parser.keep_alive:
+            self.client.release(self.address, self.sock)
+        else:
+            self.sock.close()
+        self.sock = None
+        self.client.done(self)
+        self.future.set_result((self.parser.status, self.parser.headers,
+                                self.parser.body))
+
+    def _fail(self, status, message):
+        """Complete the future with NodeError."""
+        if self.future.done():
+            return
+        self._close()
+        self.client.done(self)
+        self.future.set_exception(NodeError(status, message))
+
+
+class HTTPClient(object):
+    """Non-blocking HTTP/1.1 client with keep-alive connections.
+
+    Attributes:
+      max_connections (int): Max amount of requests in progress, following
+        requests wait in a queue.
+      max_idle (int): Max amount of idle connections per node.
+    """
+
+    #pylint: disable=R0913
+    def __init__(self, loop, connect_timeout=DEF_CONNECT_TIMEOUT,
+                 read_timeout=DEF_READ_TIMEOUT, max_idle=DEF_MAX_IDLE,
+                 idle_timeout=DEF_IDLE_TIMEOUT,
+                 max_connections=DEF_MAX_CONNECTIONS):
+        self.loop = loop
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.created = 0
+        self.reused = 0
+        self._active = set()
+        self._queue = deque()
+        self._idle = {}
+
+    def request(self, address, body=None, headers=None, connect_timeout=None,
+                read_timeout=None, idempotent=False, on_body=None):
+        """Send request to the node.
+
+        Timeouts are taken from the client attributes if they are not
+        given. idempotent allows to repeat the request after it was sent,
+        see _Exchange._broken(). on_body receives the body by pieces, see
+        ResponseParser.
+
+        Returns:
+          Future: (<status>, <Headers>, <body>) or NodeError.
+        """
+        host, port, path = parse_address(address)
+        headers = dict(headers or {})
+        headers.setdefault('Host', '%s:%s' % (host, port))
+        if body:
+            headers['Content-Length'] = str(len(body))
+        lines = ['%s %s HTTP/1.1' % ('POST' if body else 'GET', path)]
+        lines.extend('%s: %s' % each for each in headers.items())
+        request = '\r\n'.join(lines) + '\r\n\r\n' + (body or '')
+        future = Future()
+        exchange = _Exchange(self, address, request, future)
+        exchange.connect_timeout = connect_timeout or self.connect_timeout
+        exchange.read_timeout = read_timeout or self.read_timeout
+        exchange.idempotent = idempotent
+        exchange.on_body = on_body
+        if len(self._active) < self.max_connections:
+            self._start(exchange)
+        else:
+            self._queue.append(exchange)
+        return future
+
+    def _start(self, exchange):
+        """Start the exchange."""
+        self._active.add(exchange)
+        exchange.start()
+
+    def done(self, exchange):
+        """Start a queued exchange when one is completed."""
+        self._active.discard(exchange)
+        while self._queue and len(self._active) < self.max_connections:
+            self._start(self._queue.popleft())
+
+    def idle_socket(self, address):
+        """Return an alive idle connection to the node or None."""
+        idle = self._idle.get(address, [])
+        while idle:
+            sock, released = idle.pop()
+            if time() - released < self.idle_timeout and _is_alive(sock):
+                self.reused += 1
+                return sock
+            sock.close()
+        return None
+
+    def release(self, address, sock):
+        """Keep the connection for following requests or close it."""
+        idle = self._idle.setdefault(address, [])
+        if len(idle) < self.max_idle:
+            idle.append((sock, time()))
+        else:
+            sock.close()
+
+    def clear(self):
+        """Close all idle connections."""
+        idle, self._idle = self._idle, {}
+        for socks in idle.values():
+            for sock, _ in socks:
+                sock.close()
+
+
+def _is_alive(sock):
+    """Check that the node has not closed an idle connection.
+
+    Nothing must be readable from an idle connection: EOF means the node
+    has closed it.
+    """
+    try:
+        sock.recv(1, socket.MSG_PEEK)
+    except socket.error as ex:
+        return ex.args[0] in WOULD_BLOCK
+    return False
+
+
+class AsyncLocustDriver(LocustDriver):
+    """Locust Driver that sends commands without blocking.
+
+    Every command of LocustDriver returns a Future of the same result.
+    Futures are completed by the event loop: run the loop with run() or
+    loop.run_until_complete(), or yield futures from a coroutine.
+    """
+
+    #pylint: disable=R0913
+    def __init__(self, nodes=None, loop=None,
+                 connect_timeout=DEF_CONNECT_TIMEOUT,
+                 read_timeout=DEF_READ_TIMEOUT, keep_alive=True,
+                 max_connections=DEF_MAX_CONNECTIONS, retry=None,
+                 breaker=None, recorder=None):
+        """
+        Arguments:
+            nodes - nodes description, see LocustDriver;
+            loop - EventLoop, a new one by default;
+            connect_timeout - seconds to connect to a node;
+            read_timeout - seconds to wait for a node response;
+            keep_alive - reuse connections to nodes;
+            max_connections - max amount of requests in progress;
+            retry - RetryPolicy, see LocustDriver;
+            breaker - CircuitBreaker, see LocustDriver;
+            recorder - SessionRecorder, see LocustDriver.
+        """
+        super(AsyncLocustDriver, self).__init__(
+            nodes, workers=DEF_WORKERS, connect_timeout=connect_timeout,
+            read_timeout=read_timeout, keep_alive=keep_alive, retry=retry,
+            breaker=breaker, recorder=recorder)
+        self.loop = loop or EventLoop()
+        self.client = HTTPClient(
+            self.loop, max_idle=DEF_MAX_IDLE if keep_alive else 0,
+            max_connections=max_connections)
+
+    def run(self, future):
+        """Run the event loop until the future is done, return its
+        result."""
+        return self.loop.run_until_complete(future)
+
+    def close(self):
+        """Close connections to nodes."""
+        super(AsyncLocustDriver, self).close()
+        self.client.clear()
+
+    @coroutine
+    def _request_node(self, task):
+        """Send command to one node.
+
+        Returns future of (<node name>, <result>, <latency in seconds>).
+        """
+        name, address, data = task
+        start, started = time(), monotonic()
+        attempt = 0
+        while True:
+            if self.breaker is not None and self.breaker.is_open(name):
+                raise Return(self._record(name, data, started,
+                                          self.breaker.open_result(name),
+                                          time() - start))
+            request = self._stamp(name, data)
+            try:
+                _, headers, body = yield self.client.request(
+                    address, dumps(request), REQUEST_HEADERS,
+                    connect_timeout=self.connect_timeout,
+                    read_timeout=self.read_timeout,
+                    idempotent=self._is_idempotent(data['command']))
+                result = loads(decompress_body(body, headers))
+                if is_compact(headers):
+                    result = expand_compact(result)
+            except NodeError as error:
+                result = error.as_result()
+            except ValueError as error:
+                result = {'status': 'bad_response',
+                          'value': 'Could not decode response: %s' % error}
+            self._measure_rtt(name, request, result)
+            if self.breaker is not None:
+                self.breaker.record(name, address, result)
+            if not (self.retry and self.retry.should_retry(
+                    data['command'], result, attempt)):
+                raise Return(self._record(name, data, started, result,
+                                          time() - start))
+            yield self.loop.sleep(self.retry.delay(attempt))
+            attempt += 1
+
+    def send_command(self, command, nodes=None, node_groups=None,
+                     arguments=None, labels=None, start_at=None,
+                     callback=None):
+        """
+        Send any agent command with given arguments to the nodes, see
+        LocustDriver.send_command. The callback is called by the loop as
+        soon as a node answers.
+
+        Returns:
+            Future of {<node name>: <result>}
+        """
+        requests = self._requests(command, nodes, node_groups, arguments,
+                                  labels, start_at)
+        if callback is not None:
+            for request in requests:
+                #pylint: disable=W0142
+                request.add_done_callback(
+                    lambda done: callback(*done.result()))
+        future = Future()
+        gather(requests).add_done_callback(lambda done: future.set_result(
+            dict((name, result) for name, result, _ in done.result())))
+        return future
+
+    @coroutine
+    def wait_for_process(self, nodes=None, node_groups=None, pids=None,
+                         names=None, timeout=60):
+        """
+        Waits for <timeout> seconds for process to appear on all nodes.
+
+        Return:
+            Future of {<node name>: {list: [{process_dict}, ...]}}
+            or {list: []} if processes did not appear in time.
+        """
+        for _ in range(timeout):
+            result = yield self.get_process(nodes, node_groups, pids, names)
+            if result and all(isinstance(each, dict) and each.get('list')
+                              for each in result.values()):
+                raise Return(result)
+            yield self.loop.sleep(1)
+        raise Return({'list': []})
+
+    @coroutine
+    def broadcast(self, command, nodes=None, node_groups=None,
+                  arguments=None, labels=None, fanout=DEF_FANOUT,
+                  timeout=None):
+        """
+        Send any agent command to the nodes through a tree of relays, see
+        LocustDriver.broadcast.
+
+        Returns:
+            Future of {<node name>: <result>}
+        """
+        work_nodes = self._prepare_nodes(nodes, node_groups, labels)
+        tasks, trees = self._broadcast_tasks(command, work_nodes, arguments,
+                                             fanout, timeout)
+        answers = yield [self._request_node(task) for task in tasks]
+        raise Return(self._merge_relays(answers, trees))
+
+    @coroutine
+    def partition(self, groups, duration=None,
+                  safety_margin=DEF_PARTITION_MARGIN):
+        """
+        Split the cluster, see LocustDriver.partition. The loop keeps
+        running while the partition lasts.
+
+        Returns:
+            Future of {<node name>: {"side", "blocked", "healed",
+            "window"}}
+        """
+        tasks, report = self._partition_plan(groups, duration, safety_margin)
+        if not tasks:
+            raise Return(report)
+        start = time()
+        answers = yield [self._request_node(task) for task in tasks]
+        for name, result, _ in answers:
+            report[name]['blocked'] = result
+        if duration is None:
+            raise Return(report)
+        yield self.loop.sleep(max(0, start + duration - time()))
+        answers = yield [self._request_node(task)
+                         for task in self._heal_tasks(report)]
+        self._add_heal_results(report, answers)
+        raise Return(report)
+
+    def _requests(self, command, nodes=None, node_groups=None,
+                  arguments=None, labels=None, start_at=None):
+        """Send the command to the nodes, return futures of
+        (<node name>, <result>, <latency>)."""
+        data = self._command_data(command, arguments, start_at)
+        tasks = self._tasks(data, self._prepare_nodes(nodes, node_groups,
+                                                      labels))
+        return [self._request_node(task) for task in tasks]
+
+    def as_completed(self, command, nodes=None, node_groups=None,
+                     arguments=None, labels=None, start_at=None):
+        """
+        Send any agent command to the nodes, see
+        LocustDriver.as_completed.
+
+        Returns:
+            list of futures of (<node name>, <result>, <latency>) in the
+            order the nodes answer: the first future is completed by the
+            first answer and so on.
+
+        Example:
+            for future in driver.as_completed('get_process', ...):
+                name, result, latency = yield future
+        """
+        requests = self._requests(command, nodes, node_groups, arguments,
+                                  labels, start_at)
+        slots = [Future() for _ in requests]
+        pending = iter(slots)
+
+        def on_done(done):
+            """Complete the next slot by the answer."""
+            slot = next(pending)
+            if done.exception() is not None:
+                slot.set_exception(done.exception())
+            else:
+                slot.set_result(done.result())
+
+        for request in requests:
+            request.add_done_callback(on_done)
+        return slots
+
+    def _decide(self, requests, decide):
+        """Return a future completed by decide(<answer>, <pending>).
+
+        decide is called for every answer until it returns a value other
+        than None, the value is the result of the future. Later answers
+        are dropped.
+        """
+        future = Future()
+        pending = [len(requests)]
+
+        def on_done(done):
+            """Pass the answer to decide."""
+            if future.done():
+                return
+            if done.exception() is not None:
+                future.set_exception(done.exception())
+                return
+            pending[0] -= 1
+            outcome = decide(done.result(), pending[0])
+            if outcome is not None:
+                future.set_result(outcome)
+
+        for request in requests:
+            request.add_done_callback(on_done)
+        return future
+
+    def first_successes(self, count, command, nodes=None, node_groups=None,
+                        arguments=None, labels=None, failed=is_error):
+        """
+        Send any agent command to the nodes and wait for the first "count"
+        successful results only, see LocustDriver.first_successes.
+
+        Returns:
+            Future of {<node name>: <result>} completed as soon as "count"
+            nodes succeed or all nodes answer.
+        """
+        requests = self._requests(command, nodes, node_groups, arguments,
+                                  labels)
+        results = {}
+        if count <= 0 or not requests:
+            future = Future()
+            future.set_result(results)
+            return future
+
+        def decide(answer, pending):
+            """Complete on enough successes or when all nodes answered."""
+            name, result, _ = answer
+            if not failed(result):
+                results[name] = result
+            if len(results) >= count or not pending:
+                return results
+
+        return self._decide(requests, decide)
+
+    def quorum(self, count, command, nodes=None, node_groups=None,
+               arguments=None, labels=None, failed=is_error):
+        """
+        Send any agent command to the nodes and wait until "count" of them
+        succeed or so many of them fail that it is not possible anymore,
+        see LocustDriver.quorum.
+
+        Returns:
+            Future of (<quorum reached>, {<node name>: <result>} of nodes
+            answered before the decision)
+        """
+        requests = self._requests(command, nodes, node_groups, arguments,
+                                  labels)
+        results, successes = {}, [0]
+        if count <= 0 or not requests:
+            future = Future()
+            future.set_result((count <= 0, results))
+            return future
+
+        def decide(answer, pending):
+            """Complete when the quorum is reached or is not reachable."""
+            name, result, _ = answer
+            results[name] = result
+            if not failed(result):
+                successes[0] += 1
+            if successes[0] >= count:
+                return True, results
+            if successes[0] + pending < count:
+                return False, results
+
+        return self._decide(requests, decide)
+
+    @coroutine
+    def _stream_node(self, task, key, callback):
+        """Pass records of one node to the callback as they are decoded.
+
+        Returns future of the amount of passed records.
+        """
+        name, address, data = task
+        feeder = ListFeeder(key)
+        state = {'count': 0, 'decompressor': False}
+
+        def records(items):
+            """Pass decoded records to the callback."""
+            for record in items:
+                state['count'] += 1
+                callback(name, record)
+
+        def on_body(headers, chunk):
+            """Decode a piece of the body."""
+            if state['decompressor'] is False:
+                state['decompressor'] = chunk_decompressor(headers)
+            if state['decompressor'] is not None:
+                chunk = state['decompressor'].decompress(chunk)
+            records(feeder.feed(chunk))
+
+        try:
+            yield self.client.request(
+                address, dumps(dict(data, sent_at=time())), STREAM_HEADERS,
+                connect_timeout=self.connect_timeout,
+                read_timeout=self.read_timeout,
+                idempotent=self._is_idempotent(data['command']),
+                on_body=on_body)
+            if state['decompressor']:
+                records(feeder.feed(state['decompressor'].flush()))
+            records(feeder.close())
+            if not feeder.found:
+                records([feeder.rest])
+        except NodeError as error:
+            records([error.as_result()])
+        except ValueError as error:
+            records([{'status': 'bad_response',
+                      'value': 'Could not decode response: %s' % error}])
+        raise Return(state['count'])
+
+    def iter_records(self, command, nodes=None, node_groups=None,
+                     arguments=None, labels=None, key='list', callback=None):
+        """
+        Send command to the nodes and pass records of responses to the
+        callback as they arrive, see LocustDriver.iter_records.
+
+        Arguments:
+            callback - callable(<node name>, <record>), it is required;
+            see LocustDriver.iter_records for other arguments.
+
+        Returns:
+            Future of {<node name>: <amount of records>} completed when
+            all responses are received.
+        """
+        if callback is None:
+            raise TypeError('Records of AsyncLocustDriver are passed to '
+                            'the callback, specify it')
+        data = self._command_data(command, arguments)
+        tasks = self._tasks(data, self._prepare_nodes(nodes, node_groups,
+                                                      labels))
+        names = [name for name, _, _ in tasks]
+        future = Future()
+        gather(self._stream_node(task, key, callback)
+               for task in tasks).add_done_callback(
+                   lambda done: future.set_result(
+                       dict(zip(names, done.result()))))
+        return future
@@ -0,0 +1,74 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Broadcast trees of agents.
+
+The driver sends a command to "fanout" root agents only, every agent of
+the tree relays it to up to "fanout" children (see locust.relay_tools), so
+N agents are reached in about log_fanout(N) hops and the driver keeps
+"fanout" connections instead of N.
+
+Targets of a relay carry the tokens of the whole subtree to authorize the
+forwarded requests, see LocustDriver.broadcast for the trade-off.
+"""
+
+__all__ = ['build_tree', 'tree_depth', 'subtree_names', 'DEF_FANOUT',
+           'HOP_MARGIN']
+
+DEF_FANOUT = 8
+# Agents give their subtrees this much less time than they have, the same
+# margin as locust.relay_tools
+HOP_MARGIN = 1.0
+
+
+def build_tree(nodes, fanout=DEF_FANOUT):
+    """Arrange nodes to a complete k-ary forest in the given order.
+
+    Node i (from 0) is a child of node i // fanout - 1, the first "fanout"
+    nodes are roots.
+
+    Args:
+      nodes (list): Node objects of the inventory.
+      fanout (int): Max amount of children of a node and of roots.
+
+    Returns:
+      list: Roots {"name", "address", "token", "targets": [<children>]}.
+    """
+    if fanout < 1:
+        raise ValueError('Fanout should be positive: %s' % fanout)
+    entries = [{'name': node.name, 'address': node.address,
+                'token': node.token, 'targets': []} for node in nodes]
+    roots = []
+    for index, entry in enumerate(entries):
+        parent = index // fanout - 1
+        if parent < 0:
+            roots.append(entry)
+        else:
+            entries[parent]['targets'].append(entry)
+    return roots
+
+
+def tree_depth(roots):
+    """Return amount of levels of the forest."""
+    if not roots:
+        return 0
+    return 1 + max(tree_depth(root['targets']) for root in roots)
+
+
+def subtree_names(root):
+    """Return names of all nodes of the tree."""
+    names = [root['name']]
+    for child in root.get('targets') or []:
+        names.extend(subtree_names(child))
+    return names
@@ -0,0 +1,197 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Randomized failure injection.
+
+A chaos monkey injects random faults from a weighted menu to random nodes:
+
+    menu = [
+        {"command": "kill_process", "weight": 1,
+         "arguments": {"names": ["mysqld"]}},
+        {"command": "burn_cpu", "weight": 3, "arguments": {"timeout": 30},
+         "duration": 30},
+        {"command": "blink_networking", "weight": 1, "duration": 10,
+         "arguments": {"enable_network_timeout": 5,
+                       "disable_network_timeout": 5}}]
+    monkey = ChaosMonkey(driver, menu, node_groups='web', seed=42,
+                         interval=5, duration=3600, budget=500,
+                         max_active=3, min_spacing=60)
+    report = monkey.run(log='chaos.jsonl')
+
+All faults are planned before the start from the seed alone, so the same
+seed, menu and nodes give the same plan. The plan is dispatched by a
+Timeline, so faults are sent at their planned time without waiting for
+each other. The event log holds the plan and the results, the plan is
+replayed exactly with:
+
+    ChaosMonkey.replay(driver, 'chaos.jsonl')
+"""
+import random
+from bisect import bisect
+from json import dumps, loads
+
+from locustdriver.connection import is_error
+from locustdriver.timeline import Timeline, DEF_MAX_WORKERS
+
+DEF_INTERVAL = 10.0
+
+
+class ChaosMonkey(object):
+    """Seeded generator and runner of random faults.
+
+    Attributes:
+      driver (LocustDriver): Driver of the nodes.
+      menu (list): Fault dicts {"command", "arguments", "weight",
+        "duration"}. Duration is seconds the fault keeps the node busy.
+      seed: Seed of the random plan.
+      interval (float): Mean seconds between faults.
+      duration (float): Seconds of the chaos run.
+      budget (int): Max amount of faults, unlimited if None.
+      max_active (int): Max amount of faults active at the same time.
+      min_spacing (float): Min seconds between the end of a fault of a
+        node and the next fault of the node.
+    """
+
+    #pylint: disable=R0913,R0902
+    def __init__(self, driver, menu, nodes=None, node_groups=None,
+                 labels=None, seed=None, interval=DEF_INTERVAL, duration=60,
+                 budget=None, max_active=1, min_spacing=0,
+                 max_workers=DEF_MAX_WORKERS):
+        if not menu:
+            raise ValueError('Menu of faults is empty')
+        self.driver = driver
+        self.menu = [dict(entry) for entry in menu]
+        self.nodes = nodes
+        self.node_groups = node_groups
+        self.labels = labels
+        self.seed = seed
+        self.interval = interval
+        self.duration = duration
+        self.budget = budget
+        self.max_active = max_active
+        self.min_spacing = min_spacing
+        self.max_workers = max_workers
+
+    def _targets(self):
+        """Return names of the target nodes in a stable order."""
+        #pylint: disable=W0212
+        return sorted(node.name for node in self.driver._prepare_nodes(
+            self.nodes, self.node_groups, self.labels))
+
+    def plan(self):
+        """Return the planned faults.
+
+        Returns:
+          list: Events {"at", "node", "command", "arguments", "duration"}
+            ordered by time.
+        """
+        rand = random.Random(self.seed)
+        names = self._targets()
+        bounds, total = [], 0
+        for entry in self.menu:
+            total += entry.get('weight', 1)
+            bounds.append(total)
+        events = []
+        ends = {}
+        at = 0.0
+        while self.budget is None or len(events) < self.budget:
+            at += rand.expovariate(1.0 / self.interval)
+            if at >= self.duration:
+                break
+            active = sum(1 for end in ends.values() if end > at)
+            if active >= self.max_active:
+                continue
+            eligible = [name for name in names if name not in ends or
+                        at >= ends[name] + self.min_spacing]
+            if not eligible:
+                continue
+            entry = self.menu[bisect(bounds, rand.random() * total)]
+            node = eligible[rand.randrange(len(eligible))]
+            length = entry.get('duration', 0)
+            ends[node] = at + length
+            events.append(dict(at=round(at, 6), node=node,
+                               command=entry['command'],
+                               arguments=entry.get('arguments') or {},
+                               duration=length))
+        return events
+
+    def run(self, log=None, wait=True):
+        """Plan the faults and dispatch them.
+
+        Args:
+          log (str): Path of the JSON lines event log.
+          wait (bool): Wait for results of all faults.
+
+        Returns:
+          TimelineReport: Dispatch records, step numbers are event numbers.
+        """
+        return run_events(self.driver, self.plan(), log, wait,
+                          self.max_workers,
+                          header=dict(type='chaos', seed=self.seed,
+                                      targets=self._targets()))
+
+    @staticmethod
+    def load(log):
+        """Return planned events of the event log."""
+        with open(log) as source:
+            records = [loads(line) for line in source if line.strip()]
+        return [dict((key, value) for key, value in record.items()
+                     if key != 'type')
+                for record in records if record.get('type') == 'event']
+
+    @classmethod
+    def replay(cls, driver, log, new_log=None, wait=True,
+               max_workers=DEF_MAX_WORKERS):
+        """Dispatch the events of the event log at their times again.
+
+        Returns:
+          TimelineReport: Dispatch records of the replay.
+        """
+        return run_events(driver, cls.load(log), new_log, wait, max_workers,
+                          header=dict(type='replay', source=log))
+
+
+def run_events(driver, events, log=None, wait=True,
+               max_workers=DEF_MAX_WORKERS, header=None):
+    """Dispatch events with a Timeline and write the event log.
+
+    The plan is written before the dispatch, results of events are added
+    after the dispatch if wait is True.
+    """
+    timeline = Timeline(driver, max_workers=max_workers)
+    for event in events:
+        timeline.add(event['at'], event['command'], nodes=[event['node']],
+                     arguments=event['arguments'])
+    output = open(log, 'w') if log else None
+    try:
+        if output:
+            output.write(dumps(header or {}) + '\n')
+            for event in events:
+                output.write(dumps(dict(event, type='event')) + '\n')
+            output.flush()
+        report = timeline.run(wait=wait)
+        if output and wait:
+            for record in sorted(report.records, key=lambda each:
+                                 each['step']):
+                result = record['result']
+                output.write(dumps(dict(
+                    type='result', event=record['step'],
+                    node=record['node'], dispatched=record['dispatched'],
+                    latency=record['latency'],
+                    status=result['status'] if is_error(result) else 'ok'))
+                             + '\n')
+    finally:
+        if output:
+            output.close()
+    return report
@@ -12,21 +12,108 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-"""Remote CLI module for Locust Client."""
+"""Remote CLI module for Locust Client.
+
+The command is sent to all given agents concurrently and results are
+printed as they arrive, one JSON line per node:
+
+    python -m locustdriver.cli -a 10.0.0.1:8086 -a 10.0.0.2:8086 -k <token> \\
+        list process
+    python -m locustdriver.cli -i nodes.yaml -g db -g 'web[30%]' \\
+        kill process --names=mysqld
+
+Lines are {"node", "address", "latency", "result"}. The exit code is 1 if
+any node returned an error.
+"""
+import sys
 from os import environ
 from argparse import ArgumentParser
 from urllib2 import urlopen, HTTPError
 from json import dumps
 
+from locustdriver import LocustDriver, DEF_WORKERS
+from locustdriver.connection import (is_error, DEF_CONNECT_TIMEOUT,
+                                     DEF_READ_TIMEOUT)
+from locustdriver.inventory import Inventory
+
+
+def _split(values):
+    """Return comma separated values of repeated options as a list."""
+    return [each.strip() for value in values or []
+            for each in value.split(',') if each.strip()]
+
+
+def build_parser():
+    """Return parser of the CLI options."""
+    parser = ArgumentParser()
+    parser.add_argument('-a', '--address', dest='address', action='append',
+                        help='address of Locust Agent, could be repeated or '
+                             'comma separated')
+    parser.add_argument('-k', '--key', dest='key',
+                        help='secret key (token) of the agents given by '
+                             '--address')
+    parser.add_argument('-i', '--inventory', dest='inventory',
+                        help='JSON or YAML inventory of nodes')
+    parser.add_argument('-g', '--group', dest='group', action='append',
+                        help='node group of the inventory or a selector as '
+                             '"db[30%%]", could be repeated')
+    parser.add_argument('-n', '--node', dest='node', action='append',
+                        help='node name of the inventory, could be repeated')
+    parser.add_argument('--parallel', dest='parallel', type=int,
+                        default=DEF_WORKERS,
+                        help='max amount of agents called at the same time')
+    parser.add_argument('--connect-timeout', dest='connect_timeout',
+                        type=float, default=DEF_CONNECT_TIMEOUT,
+                        help='seconds to connect to an agent')
+    parser.add_argument('--read-timeout', dest='read_timeout', type=float,
+                        default=DEF_READ_TIMEOUT,
+                        help='seconds to wait for an agent response')
+    return parser
+
+
+def _inventory(parser, options):
+    """Return inventory of the agents and (<nodes>, <node groups>)."""
+    addresses = _split(options.address)
+    if not addresses and not options.inventory and \
+            environ.get('LOCUST_AGENT'):
+        addresses = _split([environ['LOCUST_AGENT']])
+    if not addresses and not options.inventory:
+        parser.error('Agent address is not specified. '
+                     'Please provide -a|--address or -i|--inventory option '
+                     'or set environment variable LOCUST_AGENT.')
+    inventory = Inventory()
+    if options.inventory:
+        inventory = Inventory.from_file(options.inventory)
+    nodes, groups = _split(options.node), _split(options.group)
+    if addresses:
+        key = options.key or environ.get('LOCUST_KEY')
+        if not key:
+            parser.error('Secret key is not specified. '
+                         'Please provide -k | --key option '
+                         'or set environment variable LOCUST_KEY.')
+        for address in addresses:
+            inventory.add(address, address, token=key)
+            nodes.append(address)
+    if options.inventory and not nodes and not groups:
+        nodes = [node.name for node in inventory]
+    return inventory, nodes, groups
+
+
+def _help(address):
+    """Print the help of the agent."""
+    if 'http' not in address:
+        address = 'http://' + address
+    try:
+        print urlopen(address).read()
+    except HTTPError as error:
+        print error
+        print error.read()
+
 
 #pylint: disable=R0912
 def main():
     """Main method in CLI method."""
-    parser = ArgumentParser()
-    parser.add_argument('-a', '--address', dest='address',
-                        help='address of Locust Agent')
-    parser.add_argument('-k', '--key', dest='key',
-                        help='secret key for particular node')
+    parser = build_parser()
     options, args = parser.parse_known_args()
     for arg in args:
         if arg.startswith('--'):
@@ -35,44 +122,38 @@ def main():
     all_options, args = parser.parse_known_args()
     command_options = dict((k, v) for k, v in all_options.__dict__.items() if
                            k not in options.__dict__)
-    if not options.address:
-        if environ.get('LOCUST_AGENT'):
-            options.address = environ['LOCUST_AGENT']
-        else:
-            parser.error('Agent address is not specified. '
-                         'Please provide -a|--address option '
-                         'or set environment variable LOCUST_AGENT.')
-    if not options.key:
-        if environ.get('LOCUST_KEY'):
-            options.key = environ['LOCUST_KEY']
-        else:
-            parser.error('Secret key is not specified. '
-                         'Please provide -k | --key option '
-                         'or set environment variable LOCUST_KEY.')
-
-    if 'http' not in options.address:
-        options.address = 'http://' + options.address
+    inventory, nodes, groups = _inventory(parser, options)
     command = []
     arguments = {}
     arguments.update(command_options)
     for arg in args:
         if '=' in arg:
-            option, value = arg.split('=')
+            option, value = arg.split('=', 1)
             arguments[option] = value
         else:
             command.append(arg)
-    data = {}
-    if command:
-        data['command'] = '_'.join(command)
-        if arguments:
-            data['arguments'] = arguments
-        data['key'] = options.key
+    if not command:
+        selected = inventory.resolve(nodes, groups)
+        if selected:
+            _help(selected[0].address)
+        return
+    driver = LocustDriver(inventory, workers=options.parallel,
+                          connect_timeout=options.connect_timeout,
+                          read_timeout=options.read_timeout)
+    failed = False
     try:
-        data = dumps(data) if data else None
-        print urlopen(options.address, data).read()
-    except HTTPError as error:
-        print error
-        print error.read()
+        for name, result, latency in driver.as_completed(
+                '_'.join(command), nodes, groups, arguments or None):
+            failed = failed or is_error(result)
+            sys.stdout.write(dumps({'node': name,
+                                    'address': inventory.nodes[name].address,
+                                    'latency': round(latency, 6),
+                                    'result': result}) + '\n')
+            sys.stdout.flush()
+    finally:
+        driver.close()
+    if failed:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,82 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Monotonic clock of Locust Driver.
+
+Python 2 has no time.monotonic, CLOCK_MONOTONIC is read with ctypes where
+it is available. Wall clock is used as a fallback.
+
+The agent has its own copy in locust.common.clock, the driver does not
+import the agent package.
+"""
+import ctypes
+import ctypes.util
+import os
+import time
+
+__all__ = ['monotonic', 'sleep_until', 'SPIN']
+
+# The last part of a wait is spent in a busy loop, sleep() could oversleep
+SPIN = 0.002
+CLOCK_MONOTONIC = 1
+
+
+class _Timespec(ctypes.Structure):
+    """struct timespec"""
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+
+def _clock_gettime():
+    """Return clock_gettime function of libc or librt, None if there is
+    not any."""
+    if os.name != 'posix':
+        return None
+    for name in ('c', 'rt'):
+        path = ctypes.util.find_library(name)
+        if not path:
+            continue
+        try:
+            func = getattr(ctypes.CDLL(path, use_errno=True),
+                           'clock_gettime')
+        except (OSError, AttributeError):
+            continue
+        func.argtypes = [ctypes.c_int, ctypes.POINTER(_Timespec)]
+        return func
+    return None
+
+_GETTIME = _clock_gettime()
+
+
+def monotonic():
+    """Return seconds of a clock that never goes backwards."""
+    if _GETTIME is None:
+        return time.time()
+    spec = _Timespec()
+    if _GETTIME(CLOCK_MONOTONIC, ctypes.byref(spec)):
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    return spec.tv_sec + spec.tv_nsec * 1e-9
+
+
+def sleep_until(deadline, spin=SPIN):
+    """Wait until monotonic() reaches the deadline.
+
+    Sleeps until "spin" seconds before the deadline and spins after that.
+    """
+    while True:
+        left = deadline - monotonic()
+        if left <= 0:
+            return
+        if left > spin:
+            time.sleep(left - spin)
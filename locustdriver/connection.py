@@ -0,0 +1,308 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""HTTP connections to Locust Agents."""
+import select
+import socket
+from httplib import HTTPConnection, HTTPException
+from threading import Lock
+from time import time
+from urlparse import urlsplit
+
+DEF_CONNECT_TIMEOUT = 5
+DEF_READ_TIMEOUT = 120
+DEF_PORT = 80
+DEF_MAX_IDLE = 4
+DEF_IDLE_TIMEOUT = 30
+DEF_CHUNK_SIZE = 64 * 1024
+
+
+class NodeError(Exception):
+    """Node did not answer properly.
+
+    Attributes:
+      status (str): "timeout" or "connection_error".
+      sent (bool): The request could have reached the node.
+    """
+
+    def __init__(self, status, message, sent=True):
+        super(NodeError, self).__init__(message)
+        self.status = status
+        self.sent = sent
+
+    def as_result(self):
+        """Return the error in the format of agent error responses."""
+        return {'status': self.status, 'value': str(self)}
+
+
+def is_error(result):
+    """Check if the result is an error of the agent or of the driver,
+    {"status": <error status>, "value": <message>}."""
+    return isinstance(result, dict) and set(result) == set(['status',
+                                                            'value'])
+
+
+def parse_address(address):
+    """Split node address to (host, port, path).
+
+    Examples:
+        parse_address('127.0.0.1:6969') ==> ('127.0.0.1', 6969, '/')
+        parse_address('http://host/node1') ==> ('host', 80, '/node1')
+    """
+    if '://' not in address:
+        address = 'http://' + address
+    parts = urlsplit(address)
+    return parts.hostname, parts.port or DEF_PORT, parts.path or '/'
+
+
+def connect(address, connect_timeout=DEF_CONNECT_TIMEOUT,
+            read_timeout=DEF_READ_TIMEOUT):
+    """Open HTTP connection to the node.
+
+    Args:
+      address (str): Node address.
+      connect_timeout (float): Seconds to establish TCP connection.
+      read_timeout (float): Seconds to wait for every read of a response.
+
+    Returns:
+      httplib.HTTPConnection: Connected HTTP/1.1 connection.
+
+    Raises:
+      NodeError: If connection could not be established in time.
+    """
+    host, port, _ = parse_address(address)
+    conn = HTTPConnection(host, port, timeout=connect_timeout)
+    try:
+        conn.connect()
+    except socket.timeout:
+        conn.close()
+        raise NodeError('timeout', 'Connection to %s timed out after %s '
+                                   'seconds' % (address, connect_timeout))
+    except socket.error as ex:
+        conn.close()
+        raise NodeError('connection_error',
+                        'Could not connect to %s: %s' % (address, ex))
+    conn.sock.settimeout(read_timeout)
+    # Requests are small, so do not wait for ACK of the previous segment
+    conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return conn
+
+
+def send_request(conn, address, body=None, headers=None):
+    """Send request through the connection and wait for the response.
+
+    Returns:
+      httplib.HTTPResponse: Response with unread body.
+
+    Raises:
+      NodeError: If the node did not answer in time or connection failed.
+        Its "sent" attribute is False if the request was not sent.
+    """
+    _, _, path = parse_address(address)
+    try:
+        conn.request('POST' if body else 'GET', path, body, headers or {})
+    except (socket.error, HTTPException) as ex:
+        raise NodeError('connection_error', 'Request to %s failed: %r' % (
+            address, ex), sent=False)
+    try:
+        return conn.getresponse()
+    except socket.timeout:
+        raise NodeError('timeout', 'No response from %s in %s seconds' % (
+            address, conn.sock.gettimeout() if conn.sock else '?'))
+    except (socket.error, HTTPException) as ex:
+        raise NodeError('connection_error',
+                        'Request to %s failed: %r' % (address, ex))
+
+
+def read_body(response, address):
+    """Read the whole response body.
+
+    Raises:
+      NodeError: If the node did not send the body in time.
+    """
+    try:
+        return response.read()
+    except socket.timeout:
+        raise NodeError('timeout', 'Response from %s was not received in '
+                                   'time' % address)
+    except (socket.error, HTTPException) as ex:
+        raise NodeError('connection_error',
+                        'Response from %s is broken: %r' % (address, ex))
+
+
+def read_chunks(response, address, size=DEF_CHUNK_SIZE):
+    """Yield the response body by chunks.
+
+    Raises:
+      NodeError: If the node did not send the body in time.
+    """
+    while True:
+        try:
+            chunk = response.read(size)
+        except socket.timeout:
+            raise NodeError('timeout', 'Response from %s was not received '
+                                       'in time' % address)
+        except (socket.error, HTTPException) as ex:
+            raise NodeError('connection_error',
+                            'Response from %s is broken: %r' % (address, ex))
+        if not chunk:
+            return
+        yield chunk
+
+
+def is_alive(conn):
+    """Check that an idle keep-alive connection was not closed by the node.
+
+    An idle connection must not be readable: readable socket means the
+    node has closed it (EOF) or has sent something unexpected.
+    """
+    if conn.sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (select.error, socket.error, ValueError):
+        return False
+    return not readable
+
+
+class ConnectionPool(object):
+    """Persistent HTTP/1.1 connections to nodes.
+
+    Connections are kept alive between requests and reused by following
+    requests to the same node. Idle connections that are older than
+    idle_timeout or closed by the node are evicted instead of being reused.
+    A request that could not be sent through a reused connection is
+    repeated once on a new connection. If the request was sent, the node
+    could have executed it already, so it is repeated only for idempotent
+    commands.
+
+    Attributes:
+      max_idle (int): Max amount of idle connections per node, 0 disables
+        keep-alive.
+      idle_timeout (float): Seconds an idle connection could be reused.
+      created (int): Amount of opened connections.
+      reused (int): Amount of requests sent through reused connections.
+    """
+
+    def __init__(self, max_idle=DEF_MAX_IDLE, idle_timeout=DEF_IDLE_TIMEOUT):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.created = 0
+        self.reused = 0
+        self._idle = {}
+        self._lock = Lock()
+
+    def _get(self, address):
+        """Return (<connection>, <reused>) for the node."""
+        with self._lock:
+            idle = self._idle.get(address, [])
+            while idle:
+                conn, released = idle.pop()
+                if time() - released < self.idle_timeout and is_alive(conn):
+                    self.reused += 1
+                    return conn, True
+                conn.close()
+        return None, False
+
+    def _put(self, address, conn):
+        """Return the connection to the pool or close it."""
+        with self._lock:
+            idle = self._idle.setdefault(address, [])
+            if len(idle) < self.max_idle:
+                idle.append((conn, time()))
+                return
+        conn.close()
+
+    def _connect(self, address, connect_timeout, read_timeout):
+        """Open a new connection to the node."""
+        conn = connect(address, connect_timeout, read_timeout)
+        with self._lock:
+            self.created += 1
+        return conn
+
+    #pylint: disable=R0913
+    def send(self, address, body=None, headers=None,
+             connect_timeout=DEF_CONNECT_TIMEOUT,
+             read_timeout=DEF_READ_TIMEOUT, idempotent=False):
+        """Send request to the node through a pooled connection.
+
+        The response body is not read, the caller reads it and passes the
+        connection to release() or closes it. idempotent allows to repeat
+        a request that failed on a reused connection after it was sent.
+
+        Returns:
+          tuple: (<connection>, <response>).
+
+        Raises:
+          NodeError: If the node did not answer properly.
+        """
+        conn, reused = self._get(address)
+        if conn is None:
+            conn = self._connect(address, connect_timeout, read_timeout)
+        else:
+            conn.sock.settimeout(read_timeout)
+        try:
+            try:
+                return conn, send_request(conn, address, body, headers)
+            except NodeError as error:
+                if not (reused and error.status == 'connection_error' and
+                        (idempotent or not error.sent)):
+                    raise
+                # The node has closed the idle connection in the meantime
+                conn.close()
+                conn = self._connect(address, connect_timeout, read_timeout)
+                return conn, send_request(conn, address, body, headers)
+        except NodeError:
+            conn.close()
+            raise
+
+    def release(self, address, conn, response):
+        """Return the connection of a completely read response to the
+        pool."""
+        if response.will_close:
+            conn.close()
+        else:
+            self._put(address, conn)
+
+    #pylint: disable=R0913
+    def request(self, address, body=None, headers=None,
+                connect_timeout=DEF_CONNECT_TIMEOUT,
+                read_timeout=DEF_READ_TIMEOUT, idempotent=False):
+        """Send request to the node and read the response.
+
+        See send() for idempotent.
+
+        Returns:
+          tuple: (<response headers>, <response body>).
+
+        Raises:
+          NodeError: If the node did not answer properly.
+        """
+        conn, response = self.send(address, body, headers, connect_timeout,
+                                   read_timeout, idempotent)
+        try:
+            data = read_body(response, address)
+        except NodeError:
+            conn.close()
+            raise
+        self.release(address, conn, response)
+        return response.msg, data
+
+    def clear(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn, _ in conns:
+                conn.close()
@@ -0,0 +1,87 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Decoding of Locust Agent responses.
+
+The driver asks agents for the compact columnar form of record lists and
+for gzip compression (see locust.common.encoding), this module turns such
+responses back to plain python objects.
+"""
+import zlib
+
+COMPACT_MIMETYPE = 'application/vnd.locust.compact+json'
+COMPACT_MARKER = '__compact__'
+
+REQUEST_HEADERS = {'Content-Type': 'application/json',
+                   'Accept': COMPACT_MIMETYPE + ', application/json',
+                   'Accept-Encoding': 'gzip'}
+# Columnar form could not be decoded record by record, streamed responses
+# are requested as plain JSON
+STREAM_HEADERS = dict(REQUEST_HEADERS, Accept='application/json')
+
+
+def expand_records(value):
+    """Convert columnar form of records back to a list of dicts."""
+    if not (isinstance(value, dict) and COMPACT_MARKER in value):
+        return value
+    const, columns = value['const'], value['columns']
+    names = columns.keys()
+    records = []
+    for row in zip(*[columns[name] for name in names]) if names else \
+            [()] * value['length']:
+        record = dict(const)
+        record.update(zip(names, row))
+        records.append(record)
+    return records
+
+
+def expand_compact(value):
+    """Expand all compacted lists in the top level of a response."""
+    if isinstance(value, dict):
+        if COMPACT_MARKER in value:
+            return expand_records(value)
+        return dict((k, expand_records(v)) for k, v in value.items())
+    return value
+
+
+def decompress_body(body, headers):
+    """Return response body decompressed according to its headers."""
+    if 'gzip' in (headers.get('Content-Encoding') or ''):
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    return body
+
+
+def chunk_decompressor(headers):
+    """Return zlib decompressor of a gzipped response body, None if the
+    body is not compressed."""
+    if 'gzip' not in (headers.get('Content-Encoding') or ''):
+        return None
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+def decompress_chunks(chunks, headers):
+    """Decompress response body chunks according to response headers."""
+    decompressor = chunk_decompressor(headers)
+    if decompressor is None:
+        for chunk in chunks:
+            yield chunk
+        return
+    for chunk in chunks:
+        yield decompressor.decompress(chunk)
+    yield decompressor.flush()
+
+
+def is_compact(headers):
+    """Check if a response contains compacted records."""
+    return COMPACT_MIMETYPE in (headers.get('Content-Type') or '')
@@ -0,0 +1,263 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Fleet of fake agents in one process.
+
+Fake agents speak the protocol of locust/webservice.py: a POST of
+{"command", "key", "arguments"} to the index is answered with the JSON
+result, errors are {"status", "value"} with the 403 code. Commands are not
+executed, every command returns a record of the given payload size after
+the given latency.
+
+Virtual nodes are spread over "ports" servers. If there are less ports than
+nodes, nodes share a port and are routed by the path of the address:
+
+    fleet = FakeFleet(1000, ports=10, latency=0.05, error_rate=0.01).start()
+    driver = LocustDriver(fleet.inventory())
+    driver.send_command('list_process', node_groups='fleet')
+    fleet.stop()
+
+The fleet could be started as a separate process, so that benchmarks
+measure the driver alone:
+
+    python -m locustdriver.fakefleet --nodes=1000 --ports=10 --port=17000
+
+Node N of such a fleet is "node<N>" at FakeFleet.address_of(N, ...).
+"""
+import random
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from hashlib import sha256
+from json import dumps, loads
+from optparse import OptionParser
+from SocketServer import ThreadingMixIn
+from threading import Lock, Thread
+from time import sleep
+
+from locustdriver.inventory import Inventory
+
+DEF_KEY = 'fake'
+DEF_HOST = '127.0.0.1'
+DEF_GROUP = 'fleet'
+ERROR_STATUS = 'unexpected_error'
+
+
+class FakeServer(ThreadingMixIn, HTTPServer):
+    """HTTP/1.1 server of fake agents, a thread per connection."""
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def __init__(self, address, fleet):
+        HTTPServer.__init__(self, address, FakeHandler)
+        self.fleet = fleet
+        self.routes = {}
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """Answers requests of the driver for nodes of the server."""
+    protocol_version = 'HTTP/1.1'
+    # Send headers and body of an answer in one segment
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        """Skip logging."""
+        pass
+
+    def _send(self, code, value):
+        """Send JSON encoded value."""
+        body = dumps(value)
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        """Answer the command of the node the path is routed to."""
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length)
+        name = self.server.routes.get(self.path.rstrip('/') or '/')
+        if name is None:
+            return self._send(404, {'message': 'Not Found'})
+        code, value = self.server.fleet.answer(name, data)
+        self._send(code, value)
+
+    def do_GET(self):
+        """Answer the help request."""
+        self._send(200, 'Fake locust agent')
+
+
+class FakeFleet(object):
+    """Fake agents served from this process.
+
+    Attributes:
+      names (list): Names of the nodes.
+      requests (int): Amount of answered requests.
+      errors (int): Amount of injected errors.
+    """
+
+    #pylint: disable=R0913
+    def __init__(self, count, ports=None, host=DEF_HOST, base_port=0,
+                 key=DEF_KEY, latency=0.0, jitter=0.0, error_rate=0.0,
+                 payload_size=0, seed=None, handlers=None):
+        """
+        Arguments:
+            count - amount of nodes;
+            ports - amount of servers, a server per node by default;
+            host - interface of the servers;
+            base_port - port of the first server, following servers listen
+                        on following ports. Free ports are used if 0;
+            key - key of all nodes;
+            latency - seconds every answer is delayed;
+            jitter - max random seconds added to the latency;
+            error_rate - probability of an error answer from 0 to 1;
+            payload_size - size of the "payload" string of results;
+            handlers - {<command>: callable(<node name>, <arguments>)}
+                       returning results of the command.
+        """
+        self.names = ['node%d' % index for index in range(count)]
+        self.ports = min(ports or count, count) or 1
+        self.host = host
+        self.base_port = base_port
+        self.key = key
+        self.token = sha256(key).hexdigest()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.payload = 'x' * payload_size
+        self.handlers = dict(handlers or {})
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = Lock()
+        self._servers = []
+        self._addresses = {}
+
+    @staticmethod
+    def address_of(index, count, ports, host=DEF_HOST, base_port=0):
+        """Return the address of node number "index" of a fleet started
+        with base_port."""
+        ports = min(ports or count, count) or 1
+        port = base_port + index % ports
+        if ports == count:
+            return '%s:%d' % (host, port)
+        return '%s:%d/node%d' % (host, port, index)
+
+    def start(self):
+        """Start servers of all nodes."""
+        for index in range(self.ports):
+            port = self.base_port + index if self.base_port else 0
+            server = FakeServer((self.host, port), self)
+            self._servers.append(server)
+            thread = Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+        shared = self.ports < len(self.names)
+        for index, name in enumerate(self.names):
+            server = self._servers[index % self.ports]
+            address = '%s:%d' % (self.host, server.server_port)
+            path = '/' + name if shared else '/'
+            server.routes[path] = name
+            self._addresses[name] = address + path if shared else address
+        return self
+
+    def stop(self):
+        """Stop all servers."""
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+
+    def serve_forever(self):
+        """Start the fleet and block until interrupted."""
+        self.start()
+        try:
+            while True:
+                sleep(3600)
+        except KeyboardInterrupt:
+            self.stop()
+
+    def address(self, name):
+        """Return the address of the node."""
+        return self._addresses[name]
+
+    def inventory(self, group=DEF_GROUP):
+        """Return Inventory of all nodes in the group."""
+        inventory = Inventory()
+        for name in self.names:
+            inventory.add(name, self._addresses[name], token=self.token,
+                          groups=[group])
+        return inventory
+
+    def answer(self, name, data):
+        """Return (<HTTP code>, <value>) of the request to the node."""
+        try:
+            data = loads(data)
+            command = data['command']
+        except (ValueError, TypeError, KeyError) as ex:
+            return 403, {'status': 'bad_request',
+                         'value': 'Data has wrong format: %s' % ex}
+        if data.get('key') != self.token:
+            return 403, {'status': 'authorization_failed',
+                         'value': 'Authorisation failed'}
+        with self._lock:
+            delay = self.latency + self._random.random() * self.jitter
+            failed = self._random.random() < self.error_rate
+            self.requests += 1
+            self.errors += failed
+        if delay:
+            sleep(delay)
+        if failed:
+            return 403, {'status': ERROR_STATUS,
+                         'value': 'Injected error of %s' % name}
+        if command in self.handlers:
+            return 200, self.handlers[command](name,
+                                               data.get('arguments') or {})
+        return 200, {'node': name, 'command': command,
+                     'payload': self.payload}
+
+
+def main():
+    """Serve a fake fleet until interrupted."""
+    parser = OptionParser()
+    parser.add_option('--nodes', dest='nodes', type='int', default=100,
+                      help='Amount of nodes.')
+    parser.add_option('--ports', dest='ports', type='int', default=None,
+                      help='Amount of ports, a port per node by default.')
+    parser.add_option('--host', dest='host', default=DEF_HOST,
+                      help='Interface to listen on.')
+    parser.add_option('--port', dest='port', type='int', default=17000,
+                      help='Port of the first server.')
+    parser.add_option('--key', dest='key', default=DEF_KEY,
+                      help='Key of all nodes.')
+    parser.add_option('--latency', dest='latency', type='float', default=0,
+                      help='Seconds every answer is delayed.')
+    parser.add_option('--jitter', dest='jitter', type='float', default=0,
+                      help='Max random seconds added to the latency.')
+    parser.add_option('--error-rate', dest='error_rate', type='float',
+                      default=0, help='Probability of an error answer.')
+    parser.add_option('--payload', dest='payload', type='int', default=0,
+                      help='Size of results in bytes.')
+    parser.add_option('--seed', dest='seed', type='int', default=None,
+                      help='Seed of latencies and errors.')
+    options, _ = parser.parse_args()
+    FakeFleet(options.nodes, ports=options.ports, host=options.host,
+              base_port=options.port, key=options.key,
+              latency=options.latency, jitter=options.jitter,
+              error_rate=options.error_rate, payload_size=options.payload,
+              seed=options.seed).serve_forever()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Consistent hash ring of node names.
+
+Every node has "replicas" points on the ring. A seed is a point on the
+ring too, nodes picked for the seed are the first distinct nodes clockwise
+from it. Adding a node changes only the picks its points fall in front of,
+so the same seed keeps hitting the same nodes while the inventory grows.
+"""
+from bisect import bisect
+from hashlib import md5
+
+DEF_REPLICAS = 32
+
+
+def ring_hash(value):
+    """Return the ring point of the string."""
+    return int(md5(value).hexdigest()[:16], 16)
+
+
+class HashRing(object):
+    """Sorted ring points of node names."""
+
+    def __init__(self, names=(), replicas=DEF_REPLICAS):
+        points = sorted((ring_hash('%s#%d' % (name, replica)), name)
+                        for name in names for replica in range(replicas))
+        self._points = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def walk(self, seed):
+        """Yield distinct node names clockwise from the point of the
+        seed."""
+        total = len(self._points)
+        start = bisect(self._points, ring_hash(str(seed)))
+        seen = set()
+        for index in xrange(total):
+            name = self._names[(start + index) % total]
+            if name not in seen:
+                seen.add(name)
+                yield name
+
+    def pick(self, count, seed, accept=None):
+        """Return up to "count" node names of the seed.
+
+        Args:
+          count (int): Amount of nodes.
+          seed: Seed of the pick, the same seed gives the same nodes.
+          accept (callable): Filter of node names.
+        """
+        picked = []
+        if count <= 0:
+            return picked
+        for name in self.walk(seed):
+            if accept is None or accept(name):
+                picked.append(name)
+                if len(picked) >= count:
+                    break
+        return picked
@@ -0,0 +1,376 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Inventory of nodes managed by Locust Driver.
+
+Inventory file is JSON or YAML (.yaml, .yml) with the nodes:
+
+    {"nodes": {
+        "node1": {"address": "10.0.0.1:8086", "key": "secret",
+                  "groups": ["db"], "labels": {"dc": "east"}},
+        "node2": {"address": "10.0.0.2:8086", "key": "secret2"}}}
+
+"nodes" could be a list of node records with a "name" field as well. A
+record may have a "token" (sha256 of the key, sent in requests) instead of
+the key. The format of LocustDriver "nodes" argument is accepted too:
+
+    {"nodes": {"node1": "10.0.0.1:8086"},
+     "node_groups": {"db": ["node1"]},
+     "keys": {"node1": "secret"}}
+
+Groups of a selection could be limited to a part of their nodes:
+
+    inventory.resolve(groups=[Percent('db', 30), Any('cache', 2, seed=7)])
+    inventory.resolve(groups=['db[30%]', 'cache[2@7]'])
+
+Without a seed random nodes are picked every time. With a seed nodes are
+picked by consistent hashing (see locustdriver.hashring), the same seed
+gives the same nodes and mostly the same nodes after the group grows.
+"""
+import random
+import re
+from hashlib import sha256
+from json import load
+from math import ceil
+from os.path import splitext
+
+from locustdriver.hashring import HashRing
+
+MAX_CACHED = 1024
+SELECTOR = re.compile(r'^(?P<group>.+)\[(?P<value>\d+(?:\.\d+)?)'
+                      r'(?P<percent>%?)(?:@(?P<seed>[^\]]+))?\]$')
+
+
+#pylint: disable=R0903
+class Node(object):
+    """Node record.
+
+    Attributes:
+      name (str): Node name.
+      address (str): Address of the node agent.
+      token (str): Authentication token sent to the agent, sha256 of the
+        node key.
+      groups (tuple): Names of node groups.
+      labels (dict): Node labels.
+    """
+    __slots__ = ('name', 'address', 'key', 'token', 'groups', 'labels')
+
+    def __init__(self, name, address, key=None, token=None, groups=(),
+                 labels=None):
+        self.name = name
+        self.address = address
+        self.key = key
+        self.token = token or sha256(key or '').hexdigest()
+        self.groups = tuple(groups)
+        self.labels = dict(labels or {})
+
+    def __repr__(self):
+        return 'Node(%r, %r)' % (self.name, self.address)
+
+
+def _read_only(*args, **kwargs):
+    """Refuse to change a frozen view."""
+    raise TypeError('Nodes description is a read-only view of the '
+                    'inventory: assign LocustDriver.nodes, call add_node() '
+                    'or change LocustDriver.inventory')
+
+
+class FrozenDict(dict):
+    """Dict which refuses changes with TypeError."""
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+
+class FrozenList(list):
+    """List which refuses changes with TypeError."""
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = _read_only
+    __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = reverse = sort = _read_only
+
+
+def freeze(value):
+    """Return a read-only copy of nested dicts and lists."""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+def _as_list(value):
+    """Return value as a list, None as an empty list."""
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+class Any(object):
+    """Selector of "count" nodes of the group.
+
+    Attributes:
+      group (str): Group name.
+      value (float): Amount of nodes.
+      seed: Seed of a stable pick, random nodes are picked if None.
+    """
+
+    def __init__(self, group, value, seed=None):
+        if value < 0:
+            raise ValueError('Amount of nodes should not be negative: %s' %
+                             value)
+        self.group = group
+        self.value = value
+        self.seed = seed
+
+    @property
+    def stable(self):
+        """Check if the same nodes are picked every time."""
+        return self.seed is not None
+
+    def amount(self, size):
+        """Return amount of nodes to pick from a group of the size."""
+        return min(int(self.value), size)
+
+    def _key(self):
+        """Return the identity of the selector."""
+        return type(self).__name__, self.group, self.value, self.seed
+
+    def __eq__(self, other):
+        #pylint: disable=W0212
+        return isinstance(other, Any) and self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return '%s(%r, %r, seed=%r)' % self._key()
+
+
+class Percent(Any):
+    """Selector of "value" percent of nodes of the group, rounded up."""
+
+    def amount(self, size):
+        return min(int(ceil(size * self.value / 100.0)), size)
+
+
+def parse_selector(group):
+    """Return selector of the "group[N]", "group[N%]", "group[N@seed]" or
+    "group[N%@seed]" string, other values are returned as is."""
+    match = SELECTOR.match(group) if isinstance(group, basestring) else None
+    if match is None:
+        return group
+    selector = Percent if match.group('percent') else Any
+    return selector(match.group('group'), float(match.group('value')),
+                    seed=match.group('seed'))
+
+
+class Inventory(object):
+    """Indexed set of nodes.
+
+    Group and label indexes and resolved target sets are kept up to date on
+    every change, so resolving targets costs as much as the amount of
+    selected nodes, not the amount of all nodes.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self._groups = {}
+        self._labels = {}
+        self._cache = {}
+        self._rings = {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, name):
+        return name in self.nodes
+
+    def __iter__(self):
+        return iter(self.nodes.values())
+
+    def add(self, name, address, key=None, groups=None, labels=None,
+            token=None):
+        """Add the node or replace the node with the same name.
+
+        Returns:
+          Node: Added node.
+        """
+        if name in self.nodes:
+            self.remove(name)
+        node = Node(name, address, key=key, token=token,
+                    groups=_as_list(groups), labels=labels)
+        self.nodes[name] = node
+        for group in node.groups:
+            self._groups.setdefault(group, []).append(name)
+            self._rings.pop(group, None)
+        for label in node.labels.items():
+            self._labels.setdefault(label, set()).add(name)
+        self._cache.clear()
+        return node
+
+    def remove(self, name):
+        """Remove the node."""
+        node = self.nodes.pop(name)
+        for group in node.groups:
+            self._groups[group].remove(name)
+            self._rings.pop(group, None)
+            if not self._groups[group]:
+                del self._groups[group]
+        for label in node.labels.items():
+            self._labels[label].discard(name)
+            if not self._labels[label]:
+                del self._labels[label]
+        self._cache.clear()
+
+    def groups(self):
+        """Return dict {<group>: [<node name>]}."""
+        return dict((group, list(names))
+                    for group, names in self._groups.items())
+
+    def resolve(self, nodes=None, groups=None, labels=None):
+        """Return nodes selected by names, groups and labels.
+
+        Args:
+          nodes (str|list): Node names.
+          groups (str|list): Group names or selectors (Any, Percent or
+            their strings), nodes of all given groups are selected.
+          labels (dict): Labels every selected node must have. If neither
+            nodes nor groups are given, labels select from all nodes.
+
+        Returns:
+          tuple: Selected Node objects. All nodes if nothing is given.
+          Unknown names are ignored.
+        """
+        nodes = _as_list(nodes)
+        groups = [parse_selector(group) for group in _as_list(groups)]
+        labels = tuple(sorted((labels or {}).items()))
+        cache_key = (tuple(nodes), tuple(groups), labels)
+        if not all(group.stable for group in groups
+                   if isinstance(group, Any)):
+            # Random picks are not cached
+            cache_key = None
+        try:
+            return self._cache[cache_key]
+        except KeyError:
+            pass
+        except TypeError:
+            cache_key = None
+        selected = self._select(nodes, groups, labels)
+        if cache_key is not None:
+            if len(self._cache) >= MAX_CACHED:
+                self._cache.clear()
+            self._cache[cache_key] = selected
+        return selected
+
+    def _select(self, nodes, groups, labels):
+        """Select nodes without the cache."""
+        if nodes or groups:
+            names = []
+            seen = set()
+            for group in groups:
+                if isinstance(group, Any):
+                    members = self._pick(group, labels)
+                else:
+                    members = self._groups.get(group, ())
+                for name in members:
+                    if name not in seen:
+                        seen.add(name)
+                        names.append(name)
+            for name in nodes:
+                if name in self.nodes and name not in seen:
+                    seen.add(name)
+                    names.append(name)
+            if labels:
+                names = [name for name in names
+                         if all(self.nodes[name].labels.get(label) == value
+                                for label, value in labels)]
+        elif labels:
+            sets = sorted((self._labels.get(label, set())
+                           for label in labels), key=len)
+            names = set.intersection(*sets)
+        else:
+            names = self.nodes.keys()
+        return tuple(self.nodes[name] for name in names)
+
+    def _pick(self, selector, labels):
+        """Return names of nodes of the group picked by the selector.
+
+        Nodes without the labels are skipped, the amount of nodes is
+        counted from the size of the whole group.
+        """
+        members = self._groups.get(selector.group, ())
+        count = selector.amount(len(members))
+        accept = None
+        if labels:
+            accept = lambda name: all(
+                self.nodes[name].labels.get(label) == value
+                for label, value in labels)
+        if not selector.stable:
+            if accept is not None:
+                members = [name for name in members if accept(name)]
+            return random.sample(members, min(count, len(members)))
+        ring = self._rings.get(selector.group)
+        if ring is None:
+            ring = self._rings[selector.group] = HashRing(members)
+        return ring.pick(count, selector.seed, accept)
+
+    def update(self, data):
+        """Add nodes from inventory data, see the module docstring."""
+        records = data.get('nodes') or {}
+        if 'keys' in data or 'node_groups' in data:
+            groups = {}
+            for group, names in (data.get('node_groups') or {}).items():
+                for name in names:
+                    groups.setdefault(name, []).append(group)
+            keys = data.get('keys') or {}
+            for name, address in records.items():
+                self.add(name, address, key=keys.get(name),
+                         groups=groups.get(name))
+            return self
+        if isinstance(records, dict):
+            records = [dict(record, name=name)
+                       for name, record in records.items()]
+        for record in records:
+            record = dict(record)
+            #pylint: disable=W0142
+            self.add(record.pop('name'), record.pop('address'), **record)
+        return self
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create inventory from a dict, see the module docstring."""
+        return cls().update(data)
+
+    @classmethod
+    def from_file(cls, path):
+        """Load inventory from a JSON or YAML file.
+
+        YAML files require PyYAML installed.
+        """
+        with open(path) as source:
+            if splitext(path)[1].lower() in ('.yaml', '.yml'):
+                #pylint: disable=F0401
+                import yaml
+                data = yaml.safe_load(source)
+            else:
+                data = load(source)
+        return cls.from_dict(data or {})
+
+    def as_dict(self):
+        """Return nodes in the format of LocustDriver "nodes" argument."""
+        return {'nodes': dict((node.name, node.address) for node in self),
+                'node_groups': self.groups(),
+                'keys': dict((node.name, node.key) for node in self)}
@@ -0,0 +1,276 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Incremental decoding of JSON list responses.
+
+Agents return lists of records as {"list": [{record}, ...]}. ListStream
+decodes such a document from an iterator of chunks and yields records one
+by one, so only the record being decoded and a chunk of the body are kept
+in memory instead of the whole body and the whole list. ListFeeder is the
+same decoder for chunks pushed by an event loop.
+"""
+from json import JSONDecoder
+
+WHITESPACE = ' \t\n\r'
+DELIMITERS = WHITESPACE + ',:]}'
+
+
+class ListFeeder(object):
+    """Decodes items of a list in a JSON document fed by chunks.
+
+    feed() returns items completed by the chunk, close() returns the rest
+    of them at the end of the document. See ListStream for the document
+    format and the "rest" and "found" attributes.
+
+    Example:
+        feeder = ListFeeder()
+        feeder.feed('{"list": [1, 2') ==> [1]
+        feeder.feed(', 3], "x": true}') ==> [2, 3]
+        feeder.close() ==> []
+        feeder.rest ==> {u'x': True}
+    """
+
+    def __init__(self, key='list'):
+        self.key = key
+        self.rest = {}
+        self.found = False
+        self._decoder = JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._in_object = False
+        self._name = None
+        self._state = self._start
+
+    @property
+    def done(self):
+        """The document is complete."""
+        return self._state is None
+
+    def feed(self, chunk):
+        """Decode the next chunk, return list of completed items."""
+        if self.done:
+            return []
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return self._run()
+
+    def close(self):
+        """Complete the document, return list of the last items.
+
+        Raises:
+          ValueError: If the document is incomplete.
+        """
+        self._eof = True
+        return self._run()
+
+    def _run(self):
+        """Decode the buffer as far as possible."""
+        items = []
+        while not self.done:
+            if not self._state(items):
+                if self._eof:
+                    raise ValueError('Unexpected end of the document at '
+                                     'position %d' % self._pos)
+                break
+        return items
+
+    def _peek(self):
+        """Skip whitespace and return the next char, None if more data is
+        needed."""
+        while self._pos < len(self._buf) and \
+                self._buf[self._pos] in WHITESPACE:
+            self._pos += 1
+        if self._pos < len(self._buf):
+            return self._buf[self._pos]
+        return None
+
+    def _expect(self, chars):
+        """Consume the next char if it is one of chars."""
+        char = self._peek()
+        if char is not None:
+            if char not in chars:
+                raise ValueError('Expecting one of %r at position %d, got '
+                                 '%r' % (chars, self._pos, char))
+            self._pos += 1
+        return char
+
+    def _value(self):
+        """Decode a complete JSON value at the current position.
+
+        A value is accepted only if a delimiter follows it, otherwise a
+        number split between chunks would be decoded partially.
+
+        Returns:
+          tuple: (<decoded>, <value>), decoded is False if more data is
+            needed.
+        """
+        if self._peek() is None:
+            return False, None
+        try:
+            value, end = self._decoder.raw_decode(self._buf, self._pos)
+        except ValueError:
+            if self._eof:
+                raise
+            return False, None
+        if self._eof or end < len(self._buf) and \
+                self._buf[end] in DELIMITERS:
+            self._pos = end
+            return True, value
+        return False, None
+
+    # States of the decoder, they return False if more data is needed
+
+    def _start(self, _):
+        """Beginning of the document."""
+        char = self._peek()
+        if char == '[':
+            self._pos += 1
+            self._state = self._first_item
+        elif char == '{':
+            self._pos += 1
+            self._in_object = True
+            self._state = self._first_member
+        elif char is not None:
+            self._state = self._scalar
+        return char is not None
+
+    def _scalar(self, _):
+        """Document that is neither a list nor an object."""
+        decoded, value = self._value()
+        if decoded:
+            self.rest = value
+            self._state = None
+        return decoded
+
+    def _first_member(self, _):
+        """Beginning of an object."""
+        char = self._peek()
+        if char == '}':
+            self._pos += 1
+            self._state = None
+        elif char is not None:
+            self._state = self._member_name
+        return char is not None
+
+    def _member_name(self, _):
+        """Name of an object member."""
+        decoded, self._name = self._value()
+        if decoded:
+            self._state = self._colon
+        return decoded
+
+    def _colon(self, _):
+        """Separator of the name and the value of a member."""
+        if self._expect(':') is None:
+            return False
+        self._state = self._member_start
+        return True
+
+    def _member_start(self, _):
+        """Value of a member, the list of items or any other value."""
+        char = self._peek()
+        if char is None:
+            return False
+        if self._name == self.key and char == '[':
+            self._pos += 1
+            self._state = self._first_item
+        else:
+            self._state = self._member_value
+        return True
+
+    def _member_value(self, _):
+        """Value of a member that is not the list of items."""
+        decoded, value = self._value()
+        if decoded:
+            self.rest[self._name] = value
+            self._state = self._member_end
+        return decoded
+
+    def _member_end(self, _):
+        """Separator of members or the end of the object."""
+        char = self._expect(',}')
+        if char is None:
+            return False
+        self._state = self._member_name if char == ',' else None
+        return True
+
+    def _first_item(self, _):
+        """Beginning of the list of items."""
+        self.found = True
+        char = self._peek()
+        if char == ']':
+            self._pos += 1
+            self._state = self._member_end if self._in_object else None
+        elif char is not None:
+            self._state = self._item
+        return char is not None
+
+    def _item(self, items):
+        """Item of the list."""
+        decoded, value = self._value()
+        if decoded:
+            items.append(value)
+            self._state = self._item_end
+        return decoded
+
+    def _item_end(self, _):
+        """Separator of items or the end of the list."""
+        char = self._expect(',]')
+        if char is None:
+            return False
+        if char == ',':
+            self._state = self._item
+        else:
+            self._state = self._member_end if self._in_object else None
+        return True
+
+
+class ListStream(object):
+    """Iterates items of a list in a JSON document read by chunks.
+
+    The document is either a list or an object. Items of the object member
+    named "key" are yielded if it is a list, other members are collected
+    in the "rest" attribute, that is complete after the iteration. The
+    "found" attribute tells if the list was found in the document.
+
+    Example:
+        stream = ListStream(iter(['{"list": [1, 2', ', 3], "x": true}']))
+        list(stream) ==> [1, 2, 3]
+        stream.rest ==> {u'x': True}
+    """
+
+    def __init__(self, chunks, key='list'):
+        self.key = key
+        self._chunks = iter(chunks)
+        self._feeder = ListFeeder(key)
+
+    @property
+    def rest(self):
+        """Members of the document other than the list."""
+        return self._feeder.rest
+
+    @property
+    def found(self):
+        """The list was found in the document."""
+        return self._feeder.found
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            for item in self._feeder.feed(chunk):
+                yield item
+            if self._feeder.done:
+                return
+        for item in self._feeder.close():
+            yield item
@@ -0,0 +1,170 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Selection of nodes by their load.
+
+Nodes are ranked by a metric of the "get_stats" agent command, which is
+queried from all candidates in parallel and cached for a short time:
+
+    selector = MetricSelector(driver, ttl=5)
+    # kill mysqld on the busiest replica
+    selector.dispatch('kill_process', 'process.cpu', names=['mysqld'],
+                      node_groups='db', arguments={'names': ['mysqld']})
+    # suspend the node with the most connections of java processes
+    selector.top('process.connections', names=['java*'], node_groups='app')
+
+Metrics are "cpu", "memory", "load" (1 minute), "load5", "load15" of the
+node and "process.cpu", "process.rss", "process.connections",
+"process.count" summed over processes of the given name patterns. A
+callable(<stats>) returning a number is accepted as well.
+"""
+from threading import Lock
+from time import time
+
+from locustdriver.connection import is_error
+
+DEF_TTL = 2.0
+DEF_INTERVAL = 0.2
+LOAD_INDEXES = {'load': 0, 'load5': 1, 'load15': 2}
+PROCESS_FIELDS = ('cpu', 'rss', 'connections', 'count')
+
+
+def metric_getter(metric):
+    """Return callable(<stats>) of the metric name or the callable."""
+    if callable(metric):
+        return metric
+    if metric in ('cpu', 'memory'):
+        return lambda stats: stats[metric]
+    if metric in LOAD_INDEXES:
+        return lambda stats: stats['load'][LOAD_INDEXES[metric]]
+    field = metric[len('process.'):] if metric.startswith('process.') \
+        else None
+    if field in PROCESS_FIELDS:
+        return lambda stats: sum(each[field] for each in
+                                 stats['processes'].values())
+    raise ValueError('Unknown metric: %s' % metric)
+
+
+class MetricSelector(object):
+    """Ranking of nodes by metrics with cached stats.
+
+    Attributes:
+      driver (LocustDriver): Driver of the nodes.
+      ttl (float): Seconds stats of a node are reused.
+      interval (float): Seconds agents measure CPU usage.
+    """
+
+    def __init__(self, driver, ttl=DEF_TTL, interval=DEF_INTERVAL):
+        self.driver = driver
+        self.ttl = ttl
+        self.interval = interval
+        self._cache = {}
+        self._lock = Lock()
+
+    def stats(self, names=None, nodes=None, node_groups=None, labels=None):
+        """Return stats of the nodes, only expired ones are queried.
+
+        Args:
+          names (list): Process name patterns.
+          nodes, node_groups, labels: Target selectors, see
+            LocustDriver.send_command.
+
+        Returns:
+          dict: {<node name>: <get_stats result or error>}
+        """
+        #pylint: disable=W0212
+        names = tuple(sorted(names or []))
+        targets = self.driver._prepare_nodes(nodes, node_groups, labels)
+        now = time()
+        results, expired = {}, []
+        with self._lock:
+            for node in targets:
+                cached = self._cache.get((node.name, names))
+                if cached is not None and now - cached[0] < self.ttl:
+                    results[node.name] = cached[1]
+                else:
+                    expired.append(node)
+        if not expired:
+            return results
+        data = {'command': 'get_stats',
+                'arguments': {'names': list(names),
+                              'interval': self.interval}}
+        fresh = dict((name, result) for name, result, _ in
+                     self.driver._dispatch(data, expired))
+        with self._lock:
+            for name, result in fresh.items():
+                if not is_error(result):
+                    self._cache[(name, names)] = (now, result)
+        results.update(fresh)
+        return results
+
+    def invalidate(self, node=None):
+        """Drop cached stats of the node or of all nodes."""
+        with self._lock:
+            if node is None:
+                self._cache.clear()
+            else:
+                for key in [key for key in self._cache if key[0] == node]:
+                    del self._cache[key]
+
+    #pylint: disable=R0913
+    def rank(self, metric, names=None, nodes=None, node_groups=None,
+             labels=None, lowest=False):
+        """Return [(<node name>, <value>)] ordered by the metric.
+
+        Nodes that failed to report stats are skipped. The highest values
+        are first unless lowest is True, ties are ordered by node names.
+        """
+        getter = metric_getter(metric)
+        ranked = []
+        for name, stats in self.stats(names, nodes, node_groups,
+                                      labels).items():
+            if is_error(stats):
+                continue
+            try:
+                value = getter(stats)
+            except (KeyError, TypeError, IndexError):
+                continue
+            if value is not None:
+                ranked.append((name, value))
+        ranked.sort(key=lambda each: (each[1] if lowest else -each[1],
+                                      each[0]))
+        return ranked
+
+    def top(self, metric, count=1, names=None, nodes=None, node_groups=None,
+            labels=None, lowest=False):
+        """Return names of "count" nodes with the highest (lowest) metric."""
+        return [name for name, _ in self.rank(metric, names, nodes,
+                                              node_groups, labels,
+                                              lowest)[:count]]
+
+    def dispatch(self, command, metric, count=1, names=None, nodes=None,
+                 node_groups=None, labels=None, arguments=None,
+                 lowest=False):
+        """Send the command to the top nodes by the metric.
+
+        Stats of the targets are invalidated, the command changes them.
+
+        Returns:
+          dict: {<node name>: <result>}, empty if no node reported stats.
+        """
+        targets = self.top(metric, count, names, nodes, node_groups, labels,
+                           lowest)
+        if not targets:
+            return {}
+        results = self.driver.send_command(command, nodes=targets,
+                                           arguments=arguments)
+        for name in targets:
+            self.invalidate(name)
+        return results
@@ -0,0 +1,346 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Pytest plugin of Locust Driver.
+
+Enable it in conftest.py with pytest_plugins = ['locustdriver.pytest_plugin']
+or with "-p locustdriver.pytest_plugin" and give the inventory of nodes:
+
+    pytest -p locustdriver.pytest_plugin --locust-inventory=nodes.yaml
+
+Faults are applied to all targets in parallel and reverted in parallel
+when the test ends, even if it fails:
+
+    @pytest.mark.locust_fault('suspend_process', node_groups='db',
+                              names=['mysqld'])
+    def test_failover(locust_fault, locust_driver):
+        ...
+
+    def test_split(locust_faults):
+        locust_faults.disable_network_adapters(node_groups='web',
+                                               adapters=['eth1'])
+        ...
+
+Faults that agents revert by themselves after a "timeout" (disabled
+adapters, blocked peers) last the revert timeout by default. An unreachable
+node is retried until its fault times out, so a teardown never reports a
+fault as not reverted while it is still pending on the node.
+
+Seconds spent to apply faults, to run the test and to revert faults are
+added to user properties of the test (junit XML) and to its report.
+"""
+from multiprocessing.pool import ThreadPool
+from time import sleep, time
+
+import pytest
+
+from locustdriver import LocustDriver
+from locustdriver.connection import is_error
+from locustdriver.resilience import is_node_error
+
+DEF_REVERT_TIMEOUT = 60
+REVERT_PAUSE = 1.0
+SECTION = 'locust faults'
+
+# Faults with their revert commands and arguments passed to them
+FAULTS = {
+    'disable_network_adapters': ('enable_network_adapters', ('adapters', )),
+    'suspend_process': ('resume_process', ('pids', 'names')),
+    'block_peers': ('heal_partition', ()),
+}
+# Faults which agents revert by themselves after their "timeout" argument
+TIMED_FAULTS = ('disable_network_adapters', 'block_peers')
+
+
+class RevertError(Exception):
+    """Some faults were not reverted."""
+    pass
+
+
+class Fault(object):
+    """Applied fault and its revert.
+
+    Attributes:
+      command (str): Fault command.
+      nodes (list): Names of the nodes the fault was sent to.
+      results (dict): {<node name>: <result of the fault>}.
+      revert (str): Revert command.
+      revert_arguments (dict): Arguments of the revert command.
+      expires (float): Time the agents revert the fault by themselves or
+        None.
+    """
+
+    #pylint: disable=R0913
+    def __init__(self, command, nodes, results, revert, revert_arguments,
+                 expires=None):
+        self.command = command
+        self.nodes = nodes
+        self.results = results
+        self.revert = revert
+        self.revert_arguments = revert_arguments
+        self.expires = expires
+
+
+class FaultManager(object):
+    """Faults applied during a test.
+
+    Attributes:
+      driver (LocustDriver): Driver of the nodes.
+      faults (list): Applied Fault objects.
+      timings (dict): Seconds spent in "apply", "call" and "revert"
+        phases.
+      revert_timeout (float): Seconds to retry reverts of unreachable
+        nodes, they could be still off the network. It is the default
+        timeout of faults that agents revert by themselves.
+    """
+
+    def __init__(self, driver, revert_timeout=DEF_REVERT_TIMEOUT):
+        self.driver = driver
+        self.revert_timeout = revert_timeout
+        self.faults = []
+        self.timings = dict(apply=0.0, call=None, revert=None)
+
+    #pylint: disable=R0913
+    def apply(self, command, nodes=None, node_groups=None, labels=None,
+              arguments=None, revert=None, revert_arguments=None):
+        """Send the fault to all targets in parallel and register its
+        revert.
+
+        Args:
+          command (str): Fault command.
+          nodes, node_groups, labels: Target selectors, see
+            LocustDriver.send_command.
+          arguments (dict): Arguments of the fault.
+          revert (str): Revert command, known faults are reverted by
+            default (see FAULTS).
+          revert_arguments (dict): Arguments of the revert command.
+
+        Returns:
+          dict: {<node name>: <result of the fault>}
+        """
+        #pylint: disable=W0212
+        arguments = dict(arguments or {})
+        if command in TIMED_FAULTS and arguments.get('timeout') is None:
+            arguments['timeout'] = self.revert_timeout
+        if revert is None and command in FAULTS:
+            revert, passed = FAULTS[command]
+            revert_arguments = dict((name, arguments[name]) for name in passed
+                                    if arguments.get(name) is not None)
+        names = [node.name for node in self.driver._prepare_nodes(
+            nodes, node_groups, labels)]
+        start = time()
+        results = self.driver.send_command(command, nodes=names,
+                                           arguments=arguments)
+        self.timings['apply'] += time() - start
+        expires = start + float(arguments['timeout']) \
+            if command in TIMED_FAULTS else None
+        self.faults.append(Fault(command, names, results, revert,
+                                 revert_arguments or {}, expires))
+        return results
+
+    def disable_network_adapters(self, nodes=None, node_groups=None,
+                                 adapters=None, timeout=None):
+        """Disable adapters, agents enable them after "timeout" seconds
+        (revert_timeout by default) if the revert could not reach them."""
+        return self.apply('disable_network_adapters', nodes, node_groups,
+                          arguments={'adapters': adapters,
+                                     'timeout': timeout})
+
+    def suspend_process(self, nodes=None, node_groups=None, pids=None,
+                        names=None):
+        """Suspend processes, they are resumed on revert."""
+        return self.apply('suspend_process', nodes, node_groups,
+                          arguments={'pids': pids, 'names': names})
+
+    def block_peers(self, nodes=None, node_groups=None, peers=None,
+                    timeout=None):
+        """Block peers, the partition is healed on revert or by agents
+        after "timeout" seconds (revert_timeout by default)."""
+        return self.apply('block_peers', nodes, node_groups,
+                          arguments={'peers': peers or [],
+                                     'timeout': timeout})
+
+    def _revert_fault(self, fault):
+        """Revert the fault, retrying unreachable nodes for revert_timeout
+        seconds or till the fault times out on them.
+
+        Returns:
+          dict: {<node name>: <error>} of nodes that were not reverted.
+        """
+        pending = list(fault.nodes)
+        deadline = max(time() + self.revert_timeout,
+                       (fault.expires or 0) + REVERT_PAUSE)
+        failed = {}
+        while pending:
+            results = self.driver.send_command(
+                fault.revert, nodes=pending,
+                arguments=fault.revert_arguments)
+            pending = []
+            for name, result in results.items():
+                failed.pop(name, None)
+                if is_error(result):
+                    failed[name] = result
+                    if is_node_error(result):
+                        pending.append(name)
+            if not pending or time() + REVERT_PAUSE >= deadline:
+                break
+            sleep(REVERT_PAUSE)
+        return failed
+
+    def revert(self):
+        """Revert all faults in parallel.
+
+        Raises:
+          RevertError: If a fault was not reverted on some nodes.
+        """
+        faults = [fault for fault in reversed(self.faults) if fault.revert]
+        self.faults = []
+        start = time()
+        failures = []
+        if faults:
+            pool = ThreadPool(len(faults))
+            try:
+                for fault, failed in zip(faults,
+                                         pool.map(self._revert_fault,
+                                                  faults)):
+                    if failed:
+                        failures.append('%s of %s: %s' % (
+                            fault.revert, fault.command, failed))
+            finally:
+                pool.close()
+        self.timings['revert'] = time() - start
+        if failures:
+            raise RevertError('Faults were not reverted: ' +
+                              '; '.join(failures))
+
+    def summary(self):
+        """Return the timings as text of the report section."""
+        return '\n'.join('%-8s %s' % (phase, 'n/a' if value is None else
+                                      '%.3fs' % value)
+                         for phase, value in sorted(self.timings.items()))
+
+
+def pytest_addoption(parser):
+    """Add inventory options."""
+    group = parser.getgroup('locust', 'Locust Driver')
+    group.addoption('--locust-inventory', dest='locust_inventory',
+                    default=None, help='JSON or YAML inventory of nodes.')
+    group.addoption('--locust-read-timeout', dest='locust_read_timeout',
+                    type=float, default=None,
+                    help='Seconds to wait for node responses.')
+    group.addoption('--locust-revert-timeout', dest='locust_revert_timeout',
+                    type=float, default=DEF_REVERT_TIMEOUT,
+                    help='Seconds to retry reverts of unreachable nodes.')
+
+
+def pytest_configure(config):
+    """Register the marker."""
+    config.locust_timings = []
+    config.addinivalue_line(
+        'markers', 'locust_fault(command, nodes=None, node_groups=None, '
+        'labels=None, **arguments): fault applied by the locust_fault '
+        'fixture and reverted after the test.')
+
+
+@pytest.fixture(scope='session')
+def locust_driver(request):
+    """LocustDriver of the --locust-inventory nodes."""
+    path = request.config.getoption('locust_inventory')
+    if not path:
+        pytest.skip('No --locust-inventory given')
+    kwargs = {}
+    read_timeout = request.config.getoption('locust_read_timeout')
+    if read_timeout:
+        kwargs['read_timeout'] = read_timeout
+    #pylint: disable=W0142
+    driver = LocustDriver.from_inventory(path, **kwargs)
+    yield driver
+    driver.close()
+
+
+@pytest.fixture
+def locust_faults(request, locust_driver):
+    """FaultManager that reverts applied faults after the test."""
+    #pylint: disable=W0621
+    manager = FaultManager(locust_driver, request.config.getoption(
+        'locust_revert_timeout'))
+    request.node.locust_faults = manager
+    yield manager
+    manager.revert()
+
+
+@pytest.fixture
+def locust_fault(locust_faults, request):
+    """Apply faults of locust_fault markers of the test in parallel."""
+    #pylint: disable=W0621
+    marks = list(request.node.iter_markers('locust_fault'))
+    if marks:
+        pool = ThreadPool(len(marks))
+        try:
+            pool.map(lambda mark: _apply_mark(locust_faults, mark), marks)
+        finally:
+            pool.close()
+    return locust_faults
+
+
+def _apply_mark(manager, mark):
+    """Apply the fault of the marker."""
+    kwargs = dict(mark.kwargs)
+    selectors = dict((name, kwargs.pop(name, None))
+                     for name in ('nodes', 'node_groups', 'labels'))
+    revert = kwargs.pop('revert', None)
+    revert_arguments = kwargs.pop('revert_arguments', None)
+    #pylint: disable=W0142
+    return manager.apply(mark.args[0], arguments=kwargs, revert=revert,
+                         revert_arguments=revert_arguments, **selectors)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    """Measure the test body of tests with faults."""
+    start = time()
+    yield
+    manager = getattr(item, 'locust_faults', None)
+    if manager is not None:
+        manager.timings['call'] = time() - start
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """Add timings of faults to the report after the teardown."""
+    outcome = yield
+    manager = getattr(item, 'locust_faults', None)
+    if manager is None or call.when != 'teardown':
+        return
+    report = outcome.get_result()
+    properties = [('locust_%s' % phase, round(value, 6))
+                  for phase, value in sorted(manager.timings.items())
+                  if value is not None]
+    item.user_properties.extend(properties)
+    if report.user_properties is not item.user_properties:
+        report.user_properties.extend(properties)
+    report.sections.append((SECTION, manager.summary()))
+    item.config.locust_timings.append((item.nodeid, manager.timings))
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """Write timings of faults of all tests."""
+    timings = getattr(config, 'locust_timings', None)
+    if not timings:
+        return
+    terminalreporter.write_sep('=', SECTION)
+    for nodeid, phases in timings:
+        terminalreporter.write_line('%s %s' % (nodeid, ' '.join(
+            '%s=%s' % (phase, 'n/a' if value is None else '%.3fs' % value)
+            for phase, value in sorted(phases.items()))))
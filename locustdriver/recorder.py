@@ -0,0 +1,245 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Recording and replay of driver sessions.
+
+A driver with a recorder writes every command sent to a node to an
+append-only JSON lines file:
+
+    recorder = SessionRecorder('session.jsonl')
+    driver = LocustDriver(nodes, recorder=recorder)
+    ...
+    recorder.close()
+
+Records are {"type": "command", "seq", "at", "node", "command",
+"arguments", "start_at", "latency", "status", "digest"}: "at" is the
+monotonic time of the dispatch from the start of the session, "status" is
+"ok" or the error status and "digest" is sha1 of the result. Secrets are
+not recorded: "token" and "key" fields of the arguments, such as tokens of
+relay targets, are replaced by "<redacted>" and tokens of relay targets
+are taken from the inventory of the driver on replay.
+
+The session is replayed with the original timing, with the timing scaled
+by a factor or as fast as possible:
+
+    report = SessionReplayer(driver, 'session.jsonl', mode='scaled',
+                             scale=0.5).run()
+    print report.divergences
+"""
+from hashlib import sha1
+from json import dumps, loads
+from threading import Lock
+from time import time
+
+from locustdriver.clock import monotonic
+from locustdriver.connection import is_error
+from locustdriver.timeline import Timeline, DEF_MAX_WORKERS
+
+DEF_BUFFER_SIZE = 256
+MODES = ('original', 'scaled', 'fast')
+SECRET_FIELDS = ('token', 'key')
+REDACTED = '<redacted>'
+
+
+def digest(result):
+    """Return sha1 of the result with sorted keys."""
+    return sha1(dumps(result, sort_keys=True)).hexdigest()
+
+
+def redact(value):
+    """Return a copy of the value with secret fields of dicts redacted."""
+    if isinstance(value, dict):
+        return dict((name, REDACTED if name in SECRET_FIELDS else
+                     redact(item)) for name, item in value.items())
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def status(result):
+    """Return error status of the result or "ok"."""
+    return result['status'] if is_error(result) else 'ok'
+
+
+class SessionRecorder(object):
+    """Buffered writer of session records.
+
+    Records are written to the file every "buffer_size" records and on
+    flush() or close().
+    """
+
+    def __init__(self, path, buffer_size=DEF_BUFFER_SIZE):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.start = monotonic()
+        self._seq = 0
+        self._buffer = [dumps(dict(type='session', started_at=time()))]
+        self._lock = Lock()
+        self._file = open(path, 'a')
+
+    #pylint: disable=R0913
+    def record(self, name, data, started, latency, result):
+        """Add the record of a command sent to the node.
+
+        Args:
+          name (str): Node name.
+          data (dict): Request data.
+          started (float): Monotonic time of the dispatch.
+          latency (float): Seconds till the result.
+          result: Result of the node.
+        """
+        line = dict(type='command', at=round(started - self.start, 6),
+                    node=name, command=data['command'],
+                    arguments=redact(data.get('arguments') or {}),
+                    start_at=data.get('start_at'), latency=latency,
+                    status=status(result), digest=digest(result))
+        with self._lock:
+            line['seq'] = self._seq
+            self._seq += 1
+            self._buffer.append(dumps(line))
+            if len(self._buffer) >= self.buffer_size:
+                self._write()
+
+    def _write(self):
+        """Write buffered records, the lock should be held."""
+        if self._buffer and self._file is not None:
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self._file.flush()
+        self._buffer = []
+
+    def flush(self):
+        """Write buffered records to the file."""
+        with self._lock:
+            self._write()
+
+    def close(self):
+        """Write buffered records and close the file."""
+        with self._lock:
+            self._write()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def load_session(path):
+    """Return command records of the session file ordered by dispatch."""
+    with open(path) as source:
+        records = [loads(line) for line in source if line.strip()]
+    return sorted((record for record in records
+                   if record.get('type') == 'command'),
+                  key=lambda record: (record['at'], record['seq']))
+
+
+class ReplayReport(object):
+    """Results of a replay compared with the recorded ones.
+
+    Attributes:
+      timeline (TimelineReport): Dispatch records of the replay.
+      divergences (list): Dicts {"seq", "node", "command", "recorded",
+        "replayed", "kind"}. Kind is "status" if the status changed and
+        "result" if only the digest changed.
+    """
+
+    def __init__(self, records, timeline, compare):
+        self.timeline = timeline
+        self.divergences = []
+        for dispatch in timeline.records:
+            record = records[dispatch['step']]
+            result = dispatch['result']
+            replayed = dict(status=status(result), digest=digest(result))
+            kind = None
+            if replayed['status'] != record['status']:
+                kind = 'status'
+            elif compare == 'digest' and replayed['digest'] != \
+                    record['digest']:
+                kind = 'result'
+            if kind:
+                self.divergences.append(dict(
+                    seq=record['seq'], node=record['node'],
+                    command=record['command'], kind=kind,
+                    recorded=dict(status=record['status'],
+                                  digest=record['digest']),
+                    replayed=replayed))
+        self.divergences.sort(key=lambda each: each['seq'])
+
+    @property
+    def diverged(self):
+        """Check if any result diverged."""
+        return bool(self.divergences)
+
+
+class SessionReplayer(object):
+    """Dispatch of recorded commands again.
+
+    Attributes:
+      driver (LocustDriver): Driver of the nodes, node names of the session
+        should be in its inventory.
+      records (list): Recorded commands.
+      mode (str): "original" timing, "scaled" timing or "fast".
+      scale (float): Factor of recorded offsets in "scaled" mode.
+      compare (str): "status" to report changed error statuses only,
+        "digest" to report changed results as well.
+    """
+
+    #pylint: disable=R0913
+    def __init__(self, driver, path, mode='original', scale=1.0,
+                 compare='status', max_workers=DEF_MAX_WORKERS):
+        if mode not in MODES:
+            raise ValueError('Mode should be one of %s: %s' % (MODES, mode))
+        self.driver = driver
+        self.records = load_session(path)
+        self.mode = mode
+        self.scale = scale
+        self.compare = compare
+        self.max_workers = max_workers
+
+    def _offset(self, record):
+        """Return replay offset of the record."""
+        if self.mode == 'fast':
+            return 0
+        start = self.records[0]['at']
+        factor = self.scale if self.mode == 'scaled' else 1.0
+        return (record['at'] - start) * factor
+
+    def _target(self, target):
+        """Return the relay target with tokens from the inventory."""
+        node = self.driver.inventory.nodes.get(target.get('name'))
+        return dict(target, token=node.token if node else None,
+                    targets=[self._target(child)
+                             for child in target.get('targets') or []])
+
+    def _arguments(self, record):
+        """Return arguments of the record to send again."""
+        arguments = record['arguments']
+        if record['command'] == 'relay':
+            arguments = dict(arguments, targets=[
+                self._target(target)
+                for target in arguments.get('targets') or []])
+        return arguments
+
+    def run(self):
+        """Dispatch the recorded commands and compare the results.
+
+        Start times of coordinated commands ("start_at") are not replayed,
+        commands are started as soon as they are received.
+
+        Returns:
+          ReplayReport: Divergences of the replay.
+        """
+        timeline = Timeline(self.driver, max_workers=self.max_workers)
+        for record in self.records:
+            timeline.add(self._offset(record), record['command'],
+                         nodes=[record['node']],
+                         arguments=self._arguments(record))
+        return ReplayReport(self.records, timeline.run(), self.compare)
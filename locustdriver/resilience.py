@@ -0,0 +1,169 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Retries and circuit breakers of Locust Driver requests.
+
+Faults injected by a scenario (blink_networking, disable_network_adapters)
+make nodes unreachable on purpose. RetryPolicy repeats idempotent commands
+that failed because of the network, CircuitBreaker stops sending commands
+to a node that keeps failing and probes it in the background until it is
+reachable again.
+
+Example:
+    driver = LocustDriver(retry=RetryPolicy(attempts=3),
+                          breaker=CircuitBreaker(failure_threshold=2))
+"""
+import random
+from threading import Lock, Thread
+from time import sleep, time
+
+from locustdriver.connection import NodeError, connect
+
+NETWORK_ERRORS = ('timeout', 'connection_error')
+IDEMPOTENT_PREFIXES = ('get_', 'list_')
+
+
+def is_node_error(result):
+    """Check if the result is a network error entry of the driver."""
+    return isinstance(result, dict) and result.get('status') in NETWORK_ERRORS
+
+
+class RetryPolicy(object):
+    """Retry of idempotent commands with jittered exponential backoff.
+
+    Attempt N (from 0) waits a random time between 0 and
+    min(cap, base * 2 ** N) seconds ("full jitter"), so retries of many
+    nodes do not hit the network at the same moment.
+
+    Attributes:
+      attempts (int): Max amount of retries after the first request.
+      base (float): Backoff of the first retry, seconds.
+      cap (float): Max backoff, seconds.
+      commands (set): Commands to retry. By default commands which names
+        start with "get_" or "list_".
+    """
+
+    def __init__(self, attempts=3, base=0.2, cap=5.0, commands=None,
+                 rand=random.random):
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.commands = set(commands) if commands is not None else None
+        self._rand = rand
+
+    def is_idempotent(self, command):
+        """Check if the command could be sent again."""
+        if self.commands is not None:
+            return command in self.commands
+        return command.startswith(IDEMPOTENT_PREFIXES)
+
+    def should_retry(self, command, result, attempt):
+        """Check if the command should be sent again after the result."""
+        return (attempt < self.attempts and is_node_error(result) and
+                self.is_idempotent(command))
+
+    def delay(self, attempt):
+        """Return seconds to wait before the retry number attempt."""
+        return self._rand() * min(self.cap, self.base * 2 ** attempt)
+
+
+def probe_connect(address, timeout):
+    """Check that the node accepts TCP connections."""
+    try:
+        connect(address, connect_timeout=timeout).close()
+    except NodeError:
+        return False
+    return True
+
+
+class CircuitBreaker(object):
+    """Per node circuit breaker.
+
+    A node is "open" after failure_threshold network errors in a row.
+    Commands to an open node fail immediately with the "circuit_open"
+    status. A background thread probes open nodes every probe_interval
+    seconds and closes the circuit as soon as a node is reachable.
+
+    Attributes:
+      failure_threshold (int): Network errors in a row to open a circuit.
+      probe_interval (float): Seconds between probes of an open node.
+      probe_timeout (float): Seconds a probe waits for the node.
+    """
+
+    def __init__(self, failure_threshold=3, probe_interval=2.0,
+                 probe_timeout=1.0, probe=probe_connect):
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self._probe = probe
+        self._failures = {}
+        self._open = {}
+        self._lock = Lock()
+        self._prober = None
+
+    def is_open(self, name):
+        """Check if commands to the node should fail fast."""
+        return name in self._open
+
+    def open_nodes(self):
+        """Return names of nodes with open circuits."""
+        return self._open.keys()
+
+    def open_result(self, name):
+        """Return the result for a command to an open node."""
+        address, opened = self._open.get(name, (None, time()))
+        return {'status': 'circuit_open',
+                'value': 'Node %s (%s) is unreachable for %.1f seconds, '
+                         'probing it in background' % (name, address,
+                                                       time() - opened)}
+
+    def record(self, name, address, result):
+        """Register the result of a command sent to the node."""
+        with self._lock:
+            if not is_node_error(result):
+                self._failures.pop(name, None)
+                self._open.pop(name, None)
+                return
+            failures = self._failures.get(name, 0) + 1
+            self._failures[name] = failures
+            if failures < self.failure_threshold or name in self._open:
+                return
+            self._open[name] = (address, time())
+            if self._prober is None:
+                self._prober = Thread(target=self._probe_open)
+                self._prober.daemon = True
+                self._prober.start()
+
+    def reset(self, name=None):
+        """Close the circuit of the node or of all nodes."""
+        with self._lock:
+            if name is None:
+                self._failures.clear()
+                self._open.clear()
+            else:
+                self._failures.pop(name, None)
+                self._open.pop(name, None)
+
+    def _probe_open(self):
+        """Probe open nodes until all of them are closed."""
+        while True:
+            sleep(self.probe_interval)
+            with self._lock:
+                nodes = self._open.items()
+                if not nodes:
+                    self._prober = None
+                    return
+            for name, (address, _) in nodes:
+                if self._probe(address, self.probe_timeout):
+                    self.reset(name)
@@ -0,0 +1,269 @@
+#  Copyright (c) 2014 Artem Rozumenko (artyom.rozumenko@gmail.com)
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Timeline of chaos steps.
+
+A plan is a list of steps with offsets from the start of the timeline:
+
+    plan = [
+        {"at": 0, "command": "kill_process", "node_groups": "A",
+         "arguments": {"names": ["mysqld"]}},
+        {"at": 5, "command": "blink_networking", "node_groups": "B",
+         "arguments": {"enable_network_timeout": 5,
+                       "disable_network_timeout": 5}},
+        {"at": 20, "command": "burn_cpu", "node_groups": "C",
+         "arguments": {"timeout": 30}}]
+    report = Timeline(driver, plan).run()
+    print report.stats()
+
+Targets of all steps are resolved and requests are prepared before the
+start. Every step is dispatched to all its nodes at the planned time on
+the monotonic clock, without waiting for results of previous steps. The
+planned and the actual dispatch time is recorded for every node.
+
+Network latency still spreads the start of a step on different nodes.
+With "lead" every step is dispatched "lead" seconds earlier with the
+planned time as "start_at", and agents start the command at that time of
+their clocks corrected by the estimated offset:
+
+    report = Timeline(driver, plan, lead=0.5).run()
+    print report.start_stats()
+"""
+from math import ceil
+from operator import itemgetter
+from Queue import Queue, Empty
+from threading import Event, Lock, Thread
+from time import time
+
+from locustdriver.clock import monotonic, sleep_until
+
+DEF_MAX_WORKERS = 256
+
+
+def distribution(values):
+    """Return min, median, 95th percentile, max and mean of the values.
+
+    Returns:
+      dict: {"count", "min", "median", "p95", "max", "mean"}, values are
+        None if there are no values.
+    """
+    values = sorted(values)
+    count = len(values)
+    if not count:
+        return dict(count=0, min=None, median=None, p95=None, max=None,
+                    mean=None)
+    middle = count // 2
+    median = values[middle] if count % 2 else \
+        (values[middle - 1] + values[middle]) / 2.0
+    return dict(count=count, min=values[0], median=median,
+                p95=values[int(ceil(0.95 * count)) - 1], max=values[-1],
+                mean=sum(values) / float(count))
+
+
+class TimelineReport(object):
+    """Dispatch records of a timeline run.
+
+    Attributes:
+      records (list): Dicts {"step", "command", "node", "planned",
+        "dispatched", "error", "latency", "result"}. Times are seconds from
+        the start of the timeline, error is the dispatch delay (steps with
+        lead are planned to be dispatched lead seconds earlier). Records
+        of coordinated steps have "start_error" reported by the agent.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._lock = Lock()
+
+    def add(self, record):
+        """Add dispatch record of a node."""
+        with self._lock:
+            self.records.append(record)
+
+    def errors(self):
+        """Return schedule errors of all dispatches."""
+        return [record['error'] for record in self.records]
+
+    def stats(self):
+        """Return distribution of schedule errors, see distribution()."""
+        return distribution(self.errors())
+
+    def start_stats(self):
+        """Return distribution of start errors reported by agents."""
+        return distribution([record['start_error'] for record in self.records
+                             if record.get('start_error') is not None])
+
+    def results(self, step):
+        """Return {<node name>: <result>} of the step."""
+        return dict((record['node'], record['result'])
+                    for record in self.records if record['step'] == step)
+
+    def sorted(self):
+        """Return records ordered by planned time, step and node."""
+        return sorted(self.records, key=itemgetter('planned', 'step',
+                                                   'node'))
+
+
+class _StepWorkers(object):
+    """Threads that dispatch the tasks of one step.
+
+    Threads are started ahead of the step and wait for its time, so the
+    dispatch is delayed neither by thread creation nor by commands of
+    previous steps that are still in progress.
+    """
+
+    def __init__(self, call, tasks, size):
+        self._call = call
+        self._tasks = Queue()
+        for task in tasks:
+            self._tasks.put(task)
+        self._go = Event()
+        self.threads = [Thread(target=self._work) for _ in range(size)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def _work(self):
+        """Dispatch tasks of the step until there are no more of them."""
+        self._go.wait()
+        while True:
+            try:
+                task = self._tasks.get_nowait()
+            except Empty:
+                return
+            self._call(task)
+
+    def start(self):
+        """Start dispatching."""
+        self._go.set()
+
+    def join(self):
+        """Wait until all tasks of the step are completed."""
+        for thread in self.threads:
+            thread.join()
+
+
+class Timeline(object):
+    """Plan of commands dispatched at given offsets.
+
+    Attributes:
+      driver (LocustDriver): Driver of the nodes.
+      steps (list): Step dicts with fields "at", "command", "nodes",
+        "node_groups", "labels" and "arguments".
+    """
+
+    def __init__(self, driver, plan=None, max_workers=DEF_MAX_WORKERS,
+                 lead=None):
+        """
+        Arguments:
+            driver - LocustDriver of the nodes;
+            plan - list of step dicts, see add();
+            max_workers - max amount of threads dispatching one step, nodes
+                          of larger steps wait for a free thread;
+            lead - dispatch steps "lead" seconds earlier and let agents
+                   start them at the planned time.
+        """
+        self.driver = driver
+        self.max_workers = max_workers
+        self.lead = lead
+        self.steps = []
+        for step in plan or []:
+            #pylint: disable=W0142
+            self.add(**step)
+
+    #pylint: disable=R0913
+    def add(self, at, command, nodes=None, node_groups=None, labels=None,
+            arguments=None):
+        """Add the step to the plan.
+
+        Args:
+          at (float): Seconds from the start of the timeline.
+          command (str): Agent command.
+          nodes, node_groups, labels: Target selectors, see
+            LocustDriver.send_command.
+          arguments (dict): Command arguments.
+        """
+        if at < 0:
+            raise ValueError('Step offset should not be negative: %s' % at)
+        self.steps.append(dict(at=at, command=command, nodes=nodes,
+                               node_groups=node_groups, labels=labels,
+                               arguments=arguments))
+        return self
+
+    def _prepare(self):
+        """Return [(<step index>, <step>, <tasks>)] ordered by offsets."""
+        prepared = []
+        for index, step in enumerate(self.steps):
+            data = dict(command=step['command'])
+            if step['arguments']:
+                data['arguments'] = step['arguments']
+            nodes = self.driver._prepare_nodes(step['nodes'],
+                                               step['node_groups'],
+                                               step['labels'])
+            prepared.append((index, step, self.driver._tasks(data, nodes)))
+        prepared.sort(key=lambda each: (each[1]['at'], each[0]))
+        return prepared
+
+    def run(self, wait=True):
+        """Dispatch all steps at their offsets.
+
+        Args:
+          wait (bool): Wait for results of all commands.
+
+        Returns:
+          TimelineReport: Dispatch records. Records of commands that are
+            still running are added when they complete if wait is False.
+        """
+        #pylint: disable=W0212
+        prepared = self._prepare()
+        report = TimelineReport()
+        lead = self.lead or 0
+        clock = {}
+
+        def call(args):
+            """Dispatch the command to one node and record it."""
+            index, step, task = args
+            dispatched = monotonic() - clock['start']
+            if self.lead is not None:
+                name, address, data = task
+                task = (name, address, dict(
+                    data, start_at=clock['wall_start'] + step['at']))
+            name, result, latency = self.driver._call_node(task)
+            record = dict(step=index, command=step['command'], node=name,
+                          planned=step['at'], dispatched=dispatched,
+                          error=dispatched - max(0, step['at'] - lead),
+                          latency=latency, result=result)
+            if self.lead is not None and isinstance(result, dict):
+                record['start_error'] = result.get('start_error')
+            report.add(record)
+
+        def workers(position):
+            """Start threads of the step, they are sized by its nodes."""
+            index, step, tasks = prepared[position]
+            return _StepWorkers(call, [(index, step, task) for task in tasks],
+                                max(1, min(self.max_workers, len(tasks))))
+
+        started = []
+        upcoming = workers(0) if prepared else None
+        clock.update(start=monotonic(), wall_start=time())
+        for position, (_, step, _) in enumerate(prepared):
+            sleep_until(clock['start'] + max(0, step['at'] - lead))
+            upcoming.start()
+            started.append(upcoming)
+            if position + 1 < len(prepared):
+                upcoming = workers(position + 1)
+        if wait:
+            for each in started:
+                each.join()
+        return report
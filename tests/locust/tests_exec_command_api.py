@@ -0,0 +1,139 @@
+"""
+Tests for exec_command method of locust api module
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import unittest
+from time import sleep, time
+
+import psutil
+
+from locust.api import Agent
+from locust.exec_tools import OutputBuffer, StreamMatcher, MAX_EXEC_WORKERS
+
+
+class ExecCommandApi(unittest.TestCase):
+    """Implements unit tests for exec_command method of locust.api."""
+
+    def test_exec_cmd_ret_output(self):
+        """Exec command returns stdout, stderr and exit code."""
+        result = Agent.exec_command('echo out; echo err >&2; exit 3')
+        self.assertEqual(result['result'], 'out')
+        self.assertEqual(result['error'], 'err\n')
+        self.assertEqual(result['exit_code'], 3)
+        self.assertFalse(result['timed_out'])
+
+    def test_exec_cmd_timeout_kills(self):
+        """Exec command kills a command that exceeds timeout."""
+        start = time()
+        result = Agent.exec_command('sleep 30', timeout=1)
+        self.assertTrue(result['timed_out'], 'Command should be timed out')
+        self.assertTrue(time() - start < 10, 'Command should be killed')
+
+    def test_exec_cmd_bounded_output(self):
+        """Exec command keeps only head and tail of a huge output."""
+        result = Agent.exec_command(
+            'echo first; head -c 1000000 /dev/zero | tr "\\0" x; echo; '
+            'echo last', output_limit=1024)
+        self.assertTrue(result['result'].startswith('first'))
+        self.assertTrue(result['result'].endswith('last'))
+        self.assertTrue(result['truncated'] > 990000)
+        self.assertTrue(len(result['result']) < 2048)
+
+    def test_exec_cmd_result_checks(self):
+        """Exec command checks result in stdout and stderr."""
+        result = Agent.exec_command('echo hello; echo world >&2',
+                                    result_should_contain='world',
+                                    result_should_not_contain='locust')
+        self.assertTrue(result['result_should_contain'])
+        self.assertTrue(result['result_should_not_contain'])
+
+    def test_exec_cmd_stream(self):
+        """Exec command in stream mode yields chunks and final state."""
+        chunks = list(Agent.exec_command('echo hello', stream=True,
+                                         result_should_contain='hello'))
+        data = ''.join(each['data'] for each in chunks if 'data' in each)
+        self.assertEqual(data, 'hello\n')
+        self.assertTrue({'result_should_contain': True} in chunks)
+        self.assertEqual(chunks[-1]['exit_code'], 0)
+
+
+class ExecCommandsApi(unittest.TestCase):
+    """Implements unit tests for exec_commands method of locust.api."""
+
+    def test_exec_cmds_ret_ordered(self):
+        """Exec commands returns results in order of given commands."""
+        result = Agent.exec_commands(['echo 1', 'exit 2', 'echo 3'])
+        self.assertEqual([each['exit_code'] for each in result['list']],
+                         [0, 2, 0])
+        self.assertEqual(result['list'][2]['result'], '3')
+        for each in result['list']:
+            self.assertTrue('duration' in each)
+
+    def test_exec_cmds_concurrent(self):
+        """Exec commands runs commands concurrently."""
+        result = Agent.exec_commands(['sleep 1'] * 4, workers=4)
+        self.assertTrue(result['duration'] < 3,
+                        'Commands should be executed concurrently')
+
+    def test_exec_cmds_workers_capped(self):
+        """Exec commands runs at most MAX_EXEC_WORKERS commands at once."""
+        result = Agent.exec_commands(
+            ['sleep 0.5'] * (MAX_EXEC_WORKERS + 1), workers=10000)
+        self.assertTrue(result['duration'] >= 1,
+                        'Commands should be executed by capped workers')
+
+    def test_exec_cmd_timeout_kills_group(self):
+        """Exec command kills children of a timed out command."""
+        result = Agent.exec_command('sleep 30 & echo $!; wait', timeout=1)
+        self.assertTrue(result['timed_out'])
+        # the orphaned child is reaped by init, it may be a zombie till then
+        try:
+            child = psutil.Process(int(result['result']))
+            deadline = time() + 1
+            while child.status() != psutil.STATUS_ZOMBIE and \
+                    time() < deadline:
+                sleep(0.01)
+            self.assertEqual(child.status(), psutil.STATUS_ZOMBIE)
+        except psutil.NoSuchProcess:
+            pass
+
+    def test_exec_cmds_per_cmd_timeout(self):
+        """Exec commands applies per-command timeout."""
+        result = Agent.exec_commands([{'cmd': 'sleep 30', 'timeout': 1},
+                                      'echo done'])
+        self.assertTrue(result['list'][0]['timed_out'])
+        self.assertFalse(result['list'][1]['timed_out'])
+
+    def test_exec_cmds_wrong_option(self):
+        """Exec commands rejects unknown per-command options."""
+        self.assertRaises(TypeError, Agent.exec_commands,
+                          [{'cmd': 'pwd', 'foo': 1}])
+
+
+class ExecToolsHelpers(unittest.TestCase):
+    """Implements unit tests for exec_tools helpers."""
+
+    def test_output_buffer_keeps_head_and_tail(self):
+        """Output buffer drops the middle of a stream."""
+        buf = OutputBuffer(limit=8)
+        for chunk in ('abc', 'defgh', 'ijkl'):
+            buf.write(chunk)
+        self.assertEqual(buf.truncated, 4)
+        self.assertTrue(buf.getvalue().startswith('abcd'))
+        self.assertTrue(buf.getvalue().endswith('ijkl'))
+
+    def test_stream_matcher_split_pattern(self):
+        """Stream matcher finds a pattern split between chunks."""
+        matcher = StreamMatcher('locust')
+        self.assertFalse(matcher.feed('xxloc'))
+        self.assertTrue(matcher.feed('ustxx'))
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Tests for get_stats of locust agent
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import sys
+import unittest
+from subprocess import Popen
+from time import sleep, time
+
+from locust.api import Agent
+from locust.process_tools import MAX_STATS_INTERVAL
+
+
+class GetStats(unittest.TestCase):
+    """Implements unit tests for get_stats."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start a process to get stats of."""
+        cls.proc = Popen(['sleep', '30'])
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the process."""
+        cls.proc.kill()
+        cls.proc.wait()
+
+    def test_node_stats(self):
+        """Node stats are returned."""
+        stats = Agent.get_stats(interval=0)
+        for field in ('cpu', 'memory', 'load', 'cpu_count'):
+            self.assertTrue(field in stats, field)
+        self.assertEqual(stats['processes'], {})
+
+    def test_process_stats(self):
+        """Processes are summed by patterns."""
+        stats = Agent.get_stats(names=['sleep', 'no_such_process'],
+                                interval=0.1)
+        self.assertTrue(stats['processes']['sleep']['count'] >= 1)
+        self.assertTrue(stats['processes']['sleep']['rss'] > 0)
+        self.assertEqual(stats['processes']['no_such_process'],
+                         dict(count=0, cpu=0.0, rss=0, connections=0))
+
+    def test_patterns_share_samples(self):
+        """Process matched by several patterns is measured once."""
+        busy = Popen([sys.executable, '-c', 'while True: pass'])
+        self.addCleanup(busy.wait)
+        self.addCleanup(busy.kill)
+        # let the child exec before it is matched by the command line
+        sleep(0.2)
+        stats = Agent.get_stats(names=['*while True*', '*True: pass'],
+                                interval=0.2)
+        first, second = [stats['processes'][name] for name in
+                         ('*while True*', '*True: pass')]
+        self.assertTrue(first['cpu'] > 0)
+        self.assertEqual(first, second)
+
+    def test_interval_capped(self):
+        """Interval is capped."""
+        start = time()
+        Agent.get_stats(interval=60)
+        self.assertTrue(time() - start < MAX_STATS_INTERVAL + 1)
+
+    def test_names_string(self):
+        """Comma separated names are accepted."""
+        stats = Agent.get_stats(names='sleep,no_such_process', interval=0)
+        self.assertEqual(sorted(stats['processes']),
+                         ['no_such_process', 'sleep'])
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
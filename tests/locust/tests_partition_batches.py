@@ -0,0 +1,67 @@
+"""
+Tests for rule batches and peers of locust partition commands
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,W0212,too-many-public-methods
+import unittest
+
+from locust.partition_tools import (nft_script, iptables_batch,
+                                    local_addresses, _resolve)
+
+
+class PartitionBatches(unittest.TestCase):
+    """Implements unit tests for nftables and iptables batches."""
+
+    def test_nft_block(self):
+        """Peers are dropped in both directions by one table."""
+        script = nft_script(['10.0.0.2', '10.0.0.3'])
+        lines = script.splitlines()
+        self.assertEqual(lines[:2], ['add table inet locust_partition',
+                                     'delete table inet locust_partition'])
+        self.assertTrue('    ip saddr { 10.0.0.2, 10.0.0.3 } drop' in lines)
+        self.assertTrue('    ip daddr { 10.0.0.2, 10.0.0.3 } drop' in lines)
+
+    def test_nft_heal(self):
+        """Heal removes the table only."""
+        self.assertEqual(len(nft_script([]).splitlines()), 2)
+
+    def test_iptables_block(self):
+        """Chain is flushed and filled by one commit."""
+        lines = iptables_batch(['10.0.0.2'], add_jumps=True).splitlines()
+        self.assertEqual(lines, ['*filter', ':LOCUST_PARTITION - [0:0]',
+                                 '-I INPUT 1 -j LOCUST_PARTITION',
+                                 '-I OUTPUT 1 -j LOCUST_PARTITION',
+                                 '-A LOCUST_PARTITION -s 10.0.0.2 -j DROP',
+                                 '-A LOCUST_PARTITION -d 10.0.0.2 -j DROP',
+                                 'COMMIT'])
+
+    def test_iptables_heal(self):
+        """Heal flushes the chain and keeps existing jumps."""
+        self.assertEqual(iptables_batch([], add_jumps=False).splitlines(),
+                         ['*filter', ':LOCUST_PARTITION - [0:0]', 'COMMIT'])
+
+
+class PartitionPeers(unittest.TestCase):
+    """Implements unit tests for peers of partitions."""
+
+    def test_own_addresses_skipped(self):
+        """Loopback and local addresses are never blocked."""
+        peers, skipped = _resolve(['10.0.0.2', 'localhost', '127.0.1.1',
+                                   '10.0.0.5'], set(['10.0.0.5']))
+        self.assertEqual(peers, ['10.0.0.2'])
+        self.assertEqual(skipped, ['10.0.0.5', '127.0.0.1', '127.0.1.1'])
+
+    def test_local_addresses(self):
+        """Addresses of interfaces are found."""
+        self.assertTrue('127.0.0.1' in local_addresses())
+        peers, _ = _resolve(sorted(local_addresses()), local_addresses())
+        self.assertEqual(peers, [])
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
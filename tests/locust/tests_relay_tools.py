@@ -0,0 +1,75 @@
+"""
+Tests for relay of commands by locust agent
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import socket
+import unittest
+from time import sleep, time
+
+import gevent
+
+import locust.relay_tools as relay_tools
+from locust.common.clock import monotonic
+from locust.relay_tools import forward, relay
+
+
+class Relay(unittest.TestCase):
+    """Implements unit tests for relay_tools."""
+
+    def test_dead_child_reported_fast(self):
+        """Child which does not accept connections is reported before the
+        hop timeout."""
+        server = socket.socket()
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.listen(0)
+        # fill the backlog, following connections hang in SYN_SENT
+        clients = []
+        for _ in range(8):
+            client = socket.socket()
+            client.setblocking(0)
+            client.connect_ex(server.getsockname())
+            clients.append(client)
+        self.addCleanup(lambda: [client.close() for client in clients])
+        relay_tools.CONNECT_TIMEOUT = 0.5
+        self.addCleanup(setattr, relay_tools, 'CONNECT_TIMEOUT', 5)
+        target = {'name': 'dead',
+                  'address': '127.0.0.1:%d' % server.getsockname()[1],
+                  'targets': [{'name': 'child'}]}
+        start = time()
+        result = forward('relay', target, 'list_process', {}, 30)
+        self.assertTrue(time() - start < 3)
+        self.assertEqual(result['dead']['status'], 'connection_error')
+        self.assertEqual(result['child']['status'], 'connection_error')
+
+    def test_join_is_cooperative(self):
+        """Other greenlets run while the relay waits for its subtrees."""
+        ticks = []
+
+        def tick():
+            """Count ticks while the relay lasts."""
+            for _ in range(5):
+                gevent.sleep(0.02)
+                ticks.append(monotonic())
+        self.addCleanup(setattr, relay_tools, 'forward',
+                        relay_tools.forward)
+        relay_tools.forward = lambda name, target, *args: \
+            sleep(0.2) or {target['name']: 'ok'}
+        ticker = gevent.spawn(tick)
+        start = monotonic()
+        result = relay('root', lambda: 'local', 'list_process', {},
+                       [{'name': 'child'}], 1)
+        ticker.join()
+        self.assertEqual(result, {'root': 'local', 'child': 'ok'})
+        self.assertEqual(len(ticks), 5)
+        self.assertTrue(ticks[-1] - start < 0.19, ticks[-1] - start)
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
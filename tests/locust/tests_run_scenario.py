@@ -0,0 +1,253 @@
+"""
+Tests for scenarios executed by locust agent
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import unittest
+from json import dumps
+from subprocess import Popen
+from time import sleep
+
+import gevent
+
+from locust.api import Agent
+from locust.common.clock import monotonic
+from locust.scenario_tools import run_scenario, is_failed, ScenarioRuns
+
+
+class Commands(object):
+    """Fake agent commands that remember calls."""
+
+    def __init__(self, ready_after=0):
+        self.calls = []
+        self.ready_after = ready_after
+
+    def __call__(self, command, arguments):
+        self.calls.append((command, arguments))
+        if command == 'slow':
+            sleep(arguments.get('seconds', 0.1))
+        if command == 'fail':
+            return {'status': 'error', 'value': 'failed'}
+        if command == 'ready':
+            self.ready_after -= 1
+            return {'list': [1] if self.ready_after < 0 else []}
+        if command == 'broken':
+            raise RuntimeError('broken')
+        return {'command': command}
+
+
+class RunScenario(unittest.TestCase):
+    """Implements unit tests for run_scenario."""
+
+    def test_commands_and_delays(self):
+        """Delays are counted from the end of the previous step."""
+        commands = Commands()
+        result = run_scenario([{'command': 'slow',
+                                'arguments': {'seconds': 0.1}},
+                               {'delay': 0.2},
+                               {'command': 'fast'}], commands)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual([each[0] for each in commands.calls],
+                         ['slow', 'fast'])
+        slow, delay, fast = result['trace']
+        self.assertEqual([slow['type'], delay['type'], fast['type']],
+                         ['command', 'delay', 'command'])
+        self.assertEqual(delay['step'], '1')
+        self.assertAlmostEqual(delay['planned'], slow['finished'] + 0.2,
+                               places=3)
+        self.assertTrue(fast['started'] >= 0.3)
+        self.assertTrue(result['max_jitter'] < 0.01)
+        self.assertEqual(fast['result'], {'command': 'fast'})
+
+    def test_at_is_fixed(self):
+        """Durations of commands do not shift "at" steps."""
+        result = run_scenario([{'command': 'slow',
+                                'arguments': {'seconds': 0.15}},
+                               {'at': 0.3},
+                               {'command': 'fast'}], Commands())
+        self.assertAlmostEqual(result['trace'][1]['planned'], 0.3)
+        self.assertTrue(abs(result['trace'][2]['started'] - 0.3) < 0.01)
+
+    def test_late_at(self):
+        """Late fixed points are reported as jitter."""
+        result = run_scenario([{'command': 'slow',
+                                'arguments': {'seconds': 0.2}},
+                               {'at': 0.1}], Commands())
+        self.assertTrue(result['trace'][1]['jitter'] >= 0.1)
+
+    def test_wait_for(self):
+        """Commands are repeated until the condition is met."""
+        result = run_scenario([{'wait_for': {'command': 'ready'},
+                                'interval': 0.05, 'timeout': 1}],
+                              Commands(ready_after=3))
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['trace'][0]['attempts'], 4)
+        self.assertEqual(result['trace'][0]['result'], {'list': [1]})
+
+    def test_wait_for_timeout(self):
+        """Wait fails after its timeout and stops the scenario."""
+        commands = Commands(ready_after=100)
+        result = run_scenario([{'wait_for': {'command': 'ready'},
+                                'interval': 0.05, 'timeout': 0.2},
+                               {'command': 'never'}], commands)
+        self.assertEqual(result['status'], 'failed')
+        self.assertEqual(result['trace'][0]['status'], 'timeout')
+        self.assertEqual(len(result['trace']), 1)
+        self.assertTrue(result['duration'] < 0.3)
+
+    def test_loop_every(self):
+        """Iterations of loops start on a fixed period."""
+        commands = Commands()
+        result = run_scenario([{'loop': [{'command': 'slow',
+                                          'arguments': {'seconds': 0.05}}],
+                                'count': 3, 'every': 0.1}], commands)
+        self.assertEqual(len(commands.calls), 3)
+        steps = [record for record in result['trace']
+                 if record['type'] == 'command']
+        self.assertEqual([record['step'] for record in steps],
+                         ['0.0.0', '0.1.0', '0.2.0'])
+        for index, record in enumerate(steps):
+            self.assertTrue(abs(record['started'] - index * 0.1) < 0.01)
+        self.assertEqual(result['trace'][-1]['type'], 'loop')
+
+    def test_errors(self):
+        """Failed commands stop the scenario unless ignored."""
+        commands = Commands()
+        result = run_scenario([{'command': 'fail', 'ignore_errors': True},
+                               {'command': 'broken'},
+                               {'command': 'never'}], commands)
+        self.assertEqual(result['status'], 'failed')
+        self.assertEqual([record['status'] for record in result['trace']],
+                         ['error', 'error'])
+        self.assertEqual(result['trace'][1]['result']['status'],
+                         'unexpected_error')
+
+    def test_timeout(self):
+        """Scenario is stopped by its timeout."""
+        result = run_scenario([{'command': 'fast'}, {'delay': 5}],
+                              Commands(), timeout=0.1)
+        self.assertEqual(result['status'], 'timeout')
+        self.assertTrue(0.09 < result['duration'] < 0.2)
+
+    def test_malformed(self):
+        """Malformed steps are rejected before the start."""
+        for steps in ({'command': 'fast'}, [{'delay': 1, 'at': 2}],
+                      [{'delay': -1}], [{'loop': [{'nothing': 1}]}],
+                      [{'wait_for': {'command': 'ready'},
+                        'until': 'someday'}]):
+            self.assertRaises(TypeError, run_scenario, steps, Commands())
+
+    def test_is_failed(self):
+        """Errors of commands are recognized."""
+        self.assertTrue(is_failed({'status': 'timeout', 'value': ''}))
+        self.assertTrue(is_failed({'list': [{'status': 'error',
+                                             'message': ''}]}))
+        self.assertFalse(is_failed({'list': [{'status': 'success',
+                                              'message': ''}]}))
+        self.assertFalse(is_failed([]))
+
+
+class BackgroundScenarios(unittest.TestCase):
+    """Implements unit tests for ScenarioRuns."""
+
+    def test_background(self):
+        """Scenarios run in background and are fetched by the id."""
+        runs = ScenarioRuns()
+        scenario_id = runs.start([{'command': 'slow',
+                                   'arguments': {'seconds': 0.2}}],
+                                 Commands(), scenario_id='slow')
+        self.assertEqual(scenario_id, 'slow')
+        result = runs.get('slow')
+        self.assertEqual(result['status'], 'running')
+        self.assertEqual(result['scenario_id'], 'slow')
+        self.assertRaises(TypeError, runs.start, [], Commands(),
+                          scenario_id='slow')
+        result = runs.get('slow', wait=1)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(len(result['trace']), 1)
+        self.assertRaises(KeyError, runs.get, 'no_such_scenario')
+        self.assertRaises(TypeError, runs.start, [{'delay': -1}],
+                          Commands())
+
+    def test_finished_are_trimmed(self):
+        """Only the last finished scenarios are kept."""
+        runs = ScenarioRuns(max_finished=2)
+        for index in range(4):
+            runs.get(runs.start([], Commands(), scenario_id=str(index)),
+                     wait=1)
+        runs.start([], Commands(), scenario_id='last')
+        runs.get('last', wait=1)
+        self.assertRaises(KeyError, runs.get, '0')
+        self.assertEqual(runs.get('3')['status'], 'success')
+
+    def test_wait_is_cooperative(self):
+        """Other greenlets run while a scenario is waited for."""
+        runs = ScenarioRuns()
+        ticks = []
+
+        def tick():
+            """Count ticks while the wait lasts."""
+            for _ in range(5):
+                gevent.sleep(0.02)
+                ticks.append(monotonic())
+        runs.start([{'delay': 0.2}], Commands(), scenario_id='delay')
+        ticker = gevent.spawn(tick)
+        start = monotonic()
+        self.assertEqual(runs.get('delay', wait=1)['status'], 'success')
+        ticker.join()
+        self.assertEqual(len(ticks), 5)
+        self.assertTrue(ticks[-1] - start < 0.19, ticks[-1] - start)
+
+
+class AgentScenario(unittest.TestCase):
+    """Implements unit tests for Agent.run_scenario."""
+
+    def setUp(self):
+        """Start a process to look for."""
+        self.proc = Popen(['sleep', '30'])
+
+    def tearDown(self):
+        """Stop the process."""
+        self.proc.kill()
+        self.proc.wait()
+
+    def test_agent_commands(self):
+        """Steps execute agent commands."""
+        result = Agent.run_scenario(dumps([
+            {'wait_for': {'command': 'get_process',
+                          'arguments': {'pids': [self.proc.pid]}},
+             'timeout': 5},
+            {'delay': 0.05},
+            {'command': 'get_stats', 'arguments': {'interval': 0}}]),
+            wait=5)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['trace'][0]['result']['list'][0]['pid'],
+                         self.proc.pid)
+        self.assertTrue('cpu' in result['trace'][2]['result'])
+
+    def test_forbidden_commands(self):
+        """Scenarios could not run scenarios or unknown commands."""
+        for command in ('run_scenario', 'no_such_command'):
+            result = Agent.run_scenario([{'command': command}], wait=5)
+            self.assertEqual(result['status'], 'failed')
+            self.assertEqual(result['trace'][0]['result']['status'],
+                             'wrong_parameters')
+        self.assertRaises(TypeError, Agent.run_scenario, '[')
+
+    def test_get_scenario(self):
+        """Running scenarios are fetched by the id."""
+        result = Agent.run_scenario([{'delay': 0.2}])
+        self.assertEqual(result['status'], 'running')
+        result = Agent.get_scenario(result['scenario_id'], wait=5)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(Agent.get_scenario('no_such_scenario')['list'][0]
+                         ['status'], 'error')
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
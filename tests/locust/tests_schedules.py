@@ -0,0 +1,181 @@
+"""
+Tests for recurring commands of locust agent
+
+These tests requires locust and apscheduler installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import os
+import shutil
+import unittest
+from json import load, dump
+from tempfile import mkdtemp
+from threading import Lock
+from time import sleep, time
+
+from locust.api import Agent
+from locust.scenario_tools import is_failed
+from locust.schedule_tools import (ScheduleManager, build_trigger,
+                                   count_missed, STORE_NAME)
+
+
+class Commands(object):
+    """Fake agent commands that count calls."""
+
+    def __init__(self, duration=0):
+        self.calls = []
+        self.duration = duration
+        self.lock = Lock()
+
+    def __call__(self, command, arguments):
+        with self.lock:
+            self.calls.append((command, arguments))
+        if self.duration:
+            sleep(self.duration)
+        if command == 'fail':
+            return {'status': 'error', 'value': 'failed'}
+        return {'command': command}
+
+
+def wait_until(check, timeout=5):
+    """Wait until the check is true."""
+    deadline = time() + timeout
+    while not check() and time() < deadline:
+        sleep(0.02)
+    return check()
+
+
+class Schedules(unittest.TestCase):
+    """Implements unit tests for ScheduleManager."""
+
+    def setUp(self):
+        self.path = mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.store = os.path.join(self.path, STORE_NAME)
+
+    def start(self, commands, **kwargs):
+        """Start the manager of the temporary store."""
+        manager = ScheduleManager(self.store, commands, is_failed,
+                                  **kwargs).start()
+        self.addCleanup(manager.shutdown)
+        return manager
+
+    def stored(self, schedule_id):
+        """Return the stored counters of the schedule."""
+        with open(self.store) as store:
+            return load(store)['schedules'][schedule_id]['stats']
+
+    def test_interval(self):
+        """Commands are fired by the interval and counted."""
+        commands = Commands()
+        manager = self.start(commands)
+        view = manager.create('burn_cpu', {'timeout': 1}, interval_seconds=0.1,
+                              schedule_id='burn')
+        self.assertEqual(view['id'], 'burn')
+        self.assertEqual(view['interval'], 0.1)
+        self.assertTrue(view['next_run_time'] > time() - 1)
+        self.assertTrue(wait_until(lambda: manager.view('burn')['runs'] >= 3))
+        self.assertEqual(commands.calls[0], ('burn_cpu', {'timeout': 1}))
+        view = manager.view('burn')
+        self.assertEqual(view['errors'], 0)
+        self.assertEqual(view['last_status'], 'success')
+        self.assertTrue(view['max_lateness'] < 1)
+
+    def test_errors_and_late_runs(self):
+        """Failed and late runs are counted."""
+        manager = self.start(Commands())
+        manager.create('fail', interval_seconds=0.1, schedule_id='fail',
+                       late_after=0)
+        self.assertTrue(wait_until(lambda: manager.view('fail')['runs'] >= 2))
+        view = manager.view('fail')
+        self.assertTrue(view['errors'] >= 2)
+        self.assertEqual(view['last_status'], 'error')
+        self.assertTrue(view['late'] >= 1)
+
+    def test_overlapping_runs_are_missed(self):
+        """Runs are missed while the previous run is still going."""
+        manager = self.start(Commands(duration=0.35))
+        manager.create('slow', interval_seconds=0.1, schedule_id='slow')
+        self.assertTrue(wait_until(
+            lambda: manager.view('slow')['missed'] >= 2))
+        self.assertTrue(manager.view('slow')['last_missed'] is not None)
+
+    def test_list_and_delete(self):
+        """Schedules are listed and deleted."""
+        manager = self.start(Commands())
+        manager.create('burn_cpu', crontab='0 3 * * *', schedule_id='b')
+        manager.create('burn_ram', interval_seconds=3600, schedule_id='a')
+        self.assertEqual([view['id'] for view in manager.list()], ['a', 'b'])
+        self.assertEqual(manager.view('b')['cron'], '0 3 * * *')
+        manager.delete('a')
+        self.assertEqual([view['id'] for view in manager.list()], ['b'])
+        self.assertRaises(KeyError, manager.delete, 'a')
+
+    def test_wrong_triggers(self):
+        """Schedules need one valid trigger."""
+        manager = self.start(Commands())
+        self.assertRaises(TypeError, manager.create, 'burn_cpu')
+        self.assertRaises(TypeError, manager.create, 'burn_cpu',
+                          interval_seconds=1, crontab='* * * * *')
+        self.assertRaises(TypeError, manager.create, 'burn_cpu',
+                          interval_seconds=-1)
+        self.assertRaises(TypeError, manager.create, 'burn_cpu',
+                          crontab='every minute')
+        self.assertEqual(manager.list(), [])
+
+    def test_persisted(self):
+        """Schedules are resumed, runs due while down are missed."""
+        manager = self.start(Commands())
+        manager.create('burn_cpu', interval_seconds=10, schedule_id='burn')
+        manager.shutdown()
+        with open(self.store) as store:
+            data = load(store)
+        # runs 25, 15 and 5 seconds ago were due while the agent was down
+        data['schedules']['burn']['created_at'] -= 35
+        data['schedules']['burn']['next_run_time'] = \
+            data['schedules']['burn']['created_at'] + 10
+        with open(self.store, 'w') as store:
+            dump(data, store)
+        manager = self.start(Commands())
+        view = manager.view('burn')
+        self.assertEqual(view['missed_while_down'], 3)
+        self.assertEqual(view['missed'], 3)
+        self.assertTrue(time() < view['next_run_time'] <= time() + 10)
+
+    def test_saves_are_throttled(self):
+        """Counters are written once per save interval and on shutdown."""
+        manager = self.start(Commands(), save_interval=0.5)
+        manager.create('burn_cpu', interval_seconds=0.05, schedule_id='burn')
+        self.assertTrue(wait_until(lambda: manager.view('burn')['runs'] >= 3))
+        self.assertTrue(self.stored('burn')['runs'] <
+                        manager.view('burn')['runs'])
+        self.assertTrue(wait_until(lambda: self.stored('burn')['runs'] > 0))
+        manager.shutdown()
+        self.assertEqual(self.stored('burn')['runs'],
+                         manager.schedules['burn']['stats']['runs'])
+
+    def test_count_missed(self):
+        """Fire times between two moments are counted."""
+        trigger = build_trigger({'interval': 60, 'created_at': 0})
+        self.assertEqual(count_missed(trigger, 60, 60 * 5), 4)
+        self.assertEqual(count_missed(trigger, 60, 60), 0)
+        trigger = build_trigger({'cron': '0 * * * *'})
+        self.assertEqual(count_missed(trigger, 3600, 3600 * 25), 24)
+
+
+class AgentSchedules(unittest.TestCase):
+    """Implements unit tests for schedule commands of Agent."""
+
+    def test_forbidden_commands(self):
+        """Schedules could not manage schedules or run unknown commands."""
+        for command in ('create_schedule', 'delete_schedule',
+                        'no_such_command'):
+            self.assertRaises(TypeError, Agent.create_schedule, command,
+                              interval=1)
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
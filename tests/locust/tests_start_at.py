@@ -0,0 +1,124 @@
+"""
+Tests for coordinated start of locust agent commands
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import unittest
+from json import dumps
+from time import time
+
+import gevent
+
+from locust.common.clock import ClockSync, monotonic
+from locust.validator_runner import ValidatorRunner
+
+KEY = 'test_token'
+
+
+class ClockOffset(unittest.TestCase):
+    """Implements unit tests for ClockSync."""
+
+    def test_no_samples(self):
+        """Offset is 0 without samples."""
+        self.assertEqual(ClockSync().offset(), 0.0)
+
+    def test_min_filter(self):
+        """The least delayed sample gives the offset."""
+        clock = ClockSync()
+        now = time()
+        # agent clock is 10 seconds ahead, delays are 0.3, 0.05 and 0.2
+        for delay in (0.3, 0.05, 0.2):
+            clock.add_sample(now, now - 10 - delay, rtt=0.04)
+        self.assertAlmostEqual(clock.offset(), 10.03)
+
+    def test_old_samples_expire(self):
+        """Samples older than max age are not used."""
+        clock = ClockSync(max_age=60)
+        clock.add_sample(time() - 120, time() - 130)
+        self.assertEqual(clock.offset(), 0.0)
+
+    def test_wait(self):
+        """Wait ends at the driver time corrected by the offset."""
+        clock = ClockSync()
+        now = time()
+        clock.add_sample(now, now + 5)
+        start = monotonic()
+        started = clock.wait(now + 5.1)
+        self.assertTrue(0.05 < monotonic() - start < 0.2)
+        self.assertTrue(abs(started['start_error']) < 0.01)
+        self.assertAlmostEqual(started['clock_offset'], -5, places=3)
+
+    def test_wait_is_cooperative(self):
+        """Other greenlets run while the agent waits for the start."""
+        clock = ClockSync()
+        ticks = []
+
+        def tick():
+            """Count ticks while the wait lasts."""
+            for _ in range(5):
+                gevent.sleep(0.02)
+                ticks.append(monotonic())
+        ticker = gevent.spawn(tick)
+        start = monotonic()
+        clock.wait(time() + 0.2)
+        ticker.join()
+        self.assertEqual(len(ticks), 5)
+        self.assertTrue(ticks[-1] - start < 0.19, ticks[-1] - start)
+
+
+class StartAtRunner(unittest.TestCase):
+    """Implements unit tests for start_at of ValidatorRunner."""
+
+    def setUp(self):
+        """Create the runner."""
+        self.runner = ValidatorRunner()
+        self.runner.key = KEY
+
+    def run_command(self, **data):
+        """Run list_network_adapters with extra request fields."""
+        data.update(command='list_network_adapters', key=KEY)
+        return self.runner.validate_and_run(dumps(data))
+
+    def test_result_wrapped(self):
+        """Command with start_at reports the start."""
+        start_at = time() + 0.1
+        err, value = self.run_command(sent_at=time(), start_at=start_at)
+        self.assertEqual(err, '')
+        self.assertTrue(isinstance(value['result'], list))
+        self.assertTrue(abs(value['start_error']) < 0.01)
+        self.assertTrue(value['started_at'] >= start_at)
+
+    def test_without_start_at(self):
+        """Result is not wrapped without start_at."""
+        err, value = self.run_command(sent_at=time(), rtt=0.001)
+        self.assertEqual(err, '')
+        self.assertTrue(isinstance(value, list))
+
+    def test_wrong_start_at(self):
+        """Wrong start_at is a bad request."""
+        err, _ = self.run_command(start_at='soon')
+        self.assertEqual(err, 'bad_request')
+
+    def test_start_at_too_far(self):
+        """Start beyond the max lead is a bad request."""
+        err, value = self.run_command(start_at=time() + 3600)
+        self.assertEqual(err, 'bad_request')
+        self.assertTrue('max lead' in value, value)
+
+    def test_streamed_result(self):
+        """Start of a streamed command is the first chunk."""
+        data = dict(command='exec_command', key=KEY, start_at=time(),
+                    arguments={'cmd': 'echo hi', 'stream': True})
+        _, value = self.runner.validate_and_run(dumps(data))
+        chunks = list(value)
+        self.assertTrue('start_error' in chunks[0])
+        self.assertEqual(chunks[-1]['exit_code'], 0)
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
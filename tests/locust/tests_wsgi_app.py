@@ -0,0 +1,112 @@
+"""
+Tests for the lightweight WSGI application of locust webservice
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import unittest
+import zlib
+from json import dumps, loads
+from StringIO import StringIO
+
+import locust.wsgiapp as wsgiapp
+from locust.wsgiapp import LocustApp, get_runner
+
+
+KEY = 'test_token'
+
+
+def call_app(method='POST', data=None, **headers):
+    """Call the WSGI application and return status, headers and body."""
+    body = dumps(data) if data is not None else ''
+    environ = {'REQUEST_METHOD': method, 'PATH_INFO': '/',
+               'CONTENT_LENGTH': str(len(body)),
+               'wsgi.input': StringIO(body)}
+    environ.update(headers)
+    response = {}
+
+    def start_response(status, response_headers):
+        """WSGI start_response callable."""
+        response['status'] = status
+        response['headers'] = dict(response_headers)
+
+    result = ''.join(LocustApp()(environ, start_response))
+    return response['status'], response['headers'], result
+
+
+class LiteWsgiApp(unittest.TestCase):
+    """Implements unit tests for locust.wsgiapp."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Set known key for the shared validator runner."""
+        get_runner().key = KEY
+
+    @classmethod
+    def tearDownClass(cls):
+        """Reset the shared validator runner."""
+        wsgiapp.RUNNER = None
+
+    def test_get_help(self):
+        """GET returns usage message with list of commands."""
+        status, _, body = call_app('GET')
+        self.assertEqual(status, '200 OK')
+        self.assertTrue('exec_command' in loads(body))
+
+    def test_post_command(self):
+        """POST executes a command and returns JSON result."""
+        status, headers, body = call_app(
+            data={'command': 'exec_command', 'key': KEY,
+                  'arguments': {'cmd': 'echo lite'}})
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Length'], str(len(body)))
+        self.assertEqual(loads(body)['result'], 'lite')
+
+    def test_post_wrong_key(self):
+        """POST with wrong key is forbidden."""
+        status, _, body = call_app(data={'command': 'list_process',
+                                         'key': 'wrong'})
+        self.assertEqual(status, '403 Forbidden')
+        self.assertEqual(loads(body)['status'], 'authorization_failed')
+
+    def test_post_without_key_file(self):
+        """Every request is forbidden while the agent has no key."""
+        get_runner().key = None
+        self.addCleanup(setattr, get_runner(), 'key', KEY)
+        status, _, body = call_app(data={'command': 'list_process',
+                                         'key': None})
+        self.assertEqual(status, '403 Forbidden')
+        self.assertEqual(loads(body)['status'], 'authorization_failed')
+
+    def test_post_gzip(self):
+        """POST result is gzipped if client accepts it."""
+        _, headers, body = call_app(
+            data={'command': 'list_process', 'key': KEY},
+            HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        result = loads(zlib.decompress(body, 16 + zlib.MAX_WBITS))
+        self.assertTrue(result['list'])
+
+    def test_post_stream(self):
+        """POST of streaming command returns JSON lines."""
+        _, headers, body = call_app(
+            data={'command': 'exec_command', 'key': KEY,
+                  'arguments': {'cmd': 'echo lite', 'stream': True}})
+        self.assertEqual(headers['Content-Type'], 'application/x-ndjson')
+        lines = [loads(line) for line in body.splitlines()]
+        self.assertEqual(lines[-1]['exit_code'], 0)
+
+    def test_unknown_path(self):
+        """Unknown path returns 404."""
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/foo'}
+        statuses = []
+        LocustApp()(environ, lambda status, _: statuses.append(status))
+        self.assertEqual(statuses, ['404 Not Found'])
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Module for locust driver tests"""
@@ -0,0 +1,98 @@
+"""Module for common methods for locust driver tests"""
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from hashlib import sha256
+from SocketServer import ThreadingMixIn
+from StringIO import StringIO
+from threading import Thread
+
+from locust.wsgiapp import LocustApp, get_runner
+
+KEY = 'test_key'
+
+
+class AgentServer(ThreadingMixIn, HTTPServer):
+    """HTTP/1.1 server of the locust agent WSGI application.
+
+    Every connection is handled in a separate thread. The server counts
+    accepted connections to check their reuse by the driver.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, idle_timeout=None):
+        HTTPServer.__init__(self, address, AgentHandler)
+        self.app = LocustApp()
+        self.idle_timeout = idle_timeout
+        self.connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        ThreadingMixIn.process_request(self, request, client_address)
+
+
+class AgentHandler(BaseHTTPRequestHandler):
+    """Runs the WSGI application for every request of a connection."""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        self.timeout = self.server.idle_timeout
+        BaseHTTPRequestHandler.setup(self)
+
+    def log_message(self, *args):
+        """Skip logging."""
+        pass
+
+    def _run_app(self):
+        """Call the application and send its response."""
+        length = int(self.headers.get('Content-Length') or 0)
+        environ = {'REQUEST_METHOD': self.command, 'PATH_INFO': self.path,
+                   'CONTENT_LENGTH': str(length),
+                   'wsgi.input': StringIO(self.rfile.read(length))}
+        for name, value in self.headers.items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+        response = {}
+
+        def start_response(status, headers):
+            """WSGI start_response."""
+            response['status'], response['headers'] = status, headers
+
+        body = ''.join(self.server.app(environ, start_response))
+        code, message = response['status'].split(' ', 1)
+        self.send_response(int(code), message)
+        for name, value in response['headers']:
+            if name.lower() != 'content-length':
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = _run_app
+
+
+def start_agents(count, idle_timeout=None):
+    """Start locust agents on free localhost ports.
+
+    Args:
+      count (int): Amount of agents.
+      idle_timeout (float): Seconds after which agents close idle
+        connections.
+
+    Returns:
+      list: Tuples (<address>, <server>) of started agents.
+    """
+    get_runner().key = sha256(KEY).hexdigest()
+    agents = []
+    for _ in range(count):
+        server = AgentServer(('127.0.0.1', 0), idle_timeout)
+        thread = Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        agents.append(('127.0.0.1:%d' % server.server_port, server))
+    return agents
+
+
+def stop_agents(agents):
+    """Stop agents started by start_agents."""
+    for _, server in agents:
+        server.shutdown()
+        server.server_close()
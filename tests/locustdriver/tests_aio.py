@@ -0,0 +1,358 @@
+"""
+Tests for non-blocking locust driver
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import socket
+import unittest
+from time import time
+
+from locustdriver.aio import (AsyncLocustDriver, Future, ResponseParser,
+                              Return, coroutine, gather)
+from locustdriver.fakefleet import FakeFleet
+from common import KEY, start_agents, stop_agents
+
+
+class Coroutines(unittest.TestCase):
+    """Implements unit tests for futures and coroutines."""
+
+    def test_coroutine_receives_results(self):
+        """Coroutine receives results of yielded futures."""
+        first, second = Future(), Future()
+
+        @coroutine
+        def add():
+            """Add results of futures."""
+            values = yield [first, second]
+            raise Return(sum(values))
+        result = add()
+        first.set_result(1)
+        self.assertFalse(result.done())
+        second.set_result(2)
+        self.assertEqual(result.result(), 3)
+
+    def test_coroutine_exception(self):
+        """Exception of a future is raised in the coroutine."""
+        failed = Future()
+
+        @coroutine
+        def catch():
+            """Catch exception."""
+            try:
+                yield failed
+            except KeyError:
+                raise Return('caught')
+        result = catch()
+        failed.set_exception(KeyError())
+        self.assertEqual(result.result(), 'caught')
+
+    def test_gather_empty(self):
+        """Gather of nothing is done immediately."""
+        self.assertEqual(gather([]).result(), [])
+
+
+class ResponseParsing(unittest.TestCase):
+    """Implements unit tests for ResponseParser."""
+
+    def feed(self, data, size):
+        """Feed the data by chunks, return the parser and completion."""
+        parser = ResponseParser()
+        done = False
+        for index in range(0, len(data), size):
+            self.assertFalse(done, 'Response completed too early')
+            done = parser.feed(data[index:index + size])
+        return parser, done
+
+    def test_content_length(self):
+        """Response with Content-Length."""
+        parser, done = self.feed('HTTP/1.1 200 OK\r\nContent-Length: 5\r\n'
+                                 '\r\nhello', 3)
+        self.assertTrue(done)
+        self.assertEqual(parser.body, 'hello')
+        self.assertTrue(parser.keep_alive)
+
+    def test_chunked(self):
+        """Response with chunked transfer encoding."""
+        parser, done = self.feed('HTTP/1.1 200 OK\r\nTransfer-Encoding: '
+                                 'chunked\r\n\r\n5\r\nhello\r\n1;x=y\r\n!'
+                                 '\r\n0\r\n\r\n', 4)
+        self.assertTrue(done)
+        self.assertEqual(parser.body, 'hello!')
+
+    def test_until_close(self):
+        """Response without length ends with the connection."""
+        parser, done = self.feed('HTTP/1.0 200 OK\r\n\r\nhello', 4)
+        self.assertFalse(done)
+        self.assertTrue(parser.feed_eof())
+        self.assertEqual(parser.body, 'hello')
+        self.assertFalse(parser.keep_alive)
+
+    def test_body_by_pieces(self):
+        """Body is passed to on_body as it arrives."""
+        pieces = []
+        parser = ResponseParser(lambda headers, data: pieces.append(data))
+        self.assertFalse(parser.feed('HTTP/1.1 200 OK\r\nContent-Length: '
+                                     '5\r\n\r\nhel'))
+        self.assertEqual(pieces, ['hel'])
+        self.assertTrue(parser.feed('lo'))
+        self.assertEqual(pieces, ['hel', 'lo'])
+        self.assertEqual(parser.body, '')
+
+
+class AsyncDriver(unittest.TestCase):
+    """Implements unit tests for AsyncLocustDriver."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start local agents."""
+        cls.agents = start_agents(4)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop local agents."""
+        stop_agents(cls.agents)
+
+    def setUp(self):
+        """Create driver for local agents."""
+        self.driver = AsyncLocustDriver(read_timeout=5)
+        for index, (address, _) in enumerate(self.agents):
+            self.driver.add_node(node_name='node%d' % index,
+                                 node_ip=address, node_group='main', key=KEY)
+
+    def tearDown(self):
+        """Close connections."""
+        self.driver.close()
+
+    def test_command_returns_future(self):
+        """Commands return futures of the results."""
+        future = self.driver.exec_command(node_groups='main', cmd='echo hi')
+        self.assertTrue(isinstance(future, Future))
+        result = self.driver.run(future)
+        self.assertEqual(sorted(result), ['node0', 'node1', 'node2', 'node3'])
+        for each in result.values():
+            self.assertEqual(each['result'], 'hi')
+
+    def test_nodes_are_concurrent(self):
+        """Nodes are called concurrently from one thread."""
+        start = time()
+        self.driver.run(self.driver.exec_command(node_groups='main',
+                                                 cmd='sleep 1'))
+        self.assertTrue(time() - start < 2.5)
+
+    def test_many_requests(self):
+        """Requests over max_connections wait in a queue."""
+        self.driver.client.max_connections = 8
+        futures = [self.driver.list_network_adapters(node_groups='main')
+                   for _ in range(50)]
+        results = self.driver.run(gather(futures))
+        self.assertEqual(len(results), 50)
+        for result in results:
+            for each in result.values():
+                self.assertFalse('status' in each, each)
+
+    def test_connection_reused(self):
+        """Sequential commands reuse the connection."""
+        for _ in range(3):
+            self.driver.run(self.driver.list_network_adapters(nodes='node1'))
+        self.assertEqual(self.driver.client.reused, 2)
+
+    def test_read_timeout(self):
+        """Slow node is reported as timeout."""
+        self.driver.read_timeout = 1
+        result = self.driver.run(self.driver.exec_command(
+            nodes='node0', cmd='exec sleep 3', timeout=3))
+        self.assertEqual(result['node0']['status'], 'timeout')
+
+    def test_dead_node(self):
+        """Unreachable node is reported as connection error."""
+        self.driver.add_node(node_name='dead', node_ip='127.0.0.1:1',
+                             node_group='dead', key=KEY)
+        result = self.driver.run(self.driver.list_network_adapters(
+            node_groups='dead'))
+        self.assertEqual(result['dead']['status'], 'connection_error')
+
+    def test_callback(self):
+        """Callback is called for every node as soon as it answers."""
+        answers = []
+        result = self.driver.run(self.driver.send_command(
+            'list_network_adapters', node_groups='main',
+            callback=lambda name, result, latency: answers.append(name)))
+        self.assertEqual(sorted(answers), sorted(result))
+
+    def test_scenario_coroutine(self):
+        """Commands are combined in a coroutine."""
+        driver = self.driver
+
+        @coroutine
+        def scenario():
+            """Run commands one after another."""
+            first = yield driver.exec_command(nodes='node0', cmd='echo 1')
+            yield driver.loop.sleep(0.1)
+            second = yield driver.exec_command(nodes='node1', cmd='echo 2')
+            raise Return(first['node0']['result'] +
+                         second['node1']['result'])
+        self.assertEqual(driver.run(scenario()), '12')
+
+    def test_broadcast(self):
+        """Broadcast returns a future of results of the whole tree."""
+        future = self.driver.broadcast('exec_command', node_groups='main',
+                                       arguments={'cmd': 'echo hi'},
+                                       fanout=2)
+        self.assertTrue(isinstance(future, Future))
+        result = self.driver.run(future)
+        self.assertEqual(sorted(result), ['node0', 'node1', 'node2', 'node3'])
+        for each in result.values():
+            self.assertEqual(each['result'], 'hi')
+
+    def test_iter_records(self):
+        """Records of all nodes are passed to the callback."""
+        records = []
+        counts = self.driver.run(self.driver.iter_records(
+            'list_process', node_groups='main',
+            callback=lambda name, record: records.append((name, record))))
+        self.assertEqual(sorted(counts), ['node0', 'node1', 'node2', 'node3'])
+        self.assertEqual(sum(counts.values()), len(records))
+        for _, record in records:
+            self.assertTrue('pid' in record)
+
+    def test_iter_records_error(self):
+        """Error of a node is passed as a single record."""
+        records = []
+        self.driver.run(self.driver.iter_records(
+            'get_process', nodes='node0',
+            callback=lambda name, record: records.append(record)))
+        self.assertEqual(len(records), 1)
+        self.assertTrue('status' in records[0])
+        self.assertRaises(TypeError, self.driver.iter_records,
+                          'list_process')
+
+
+class AsyncCompleted(unittest.TestCase):
+    """Implements unit tests for results of AsyncLocustDriver in the order
+    of answers."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start local agents and a node that never answers."""
+        cls.agents = start_agents(3)
+        cls.silent = socket.socket()
+        cls.silent.bind(('127.0.0.1', 0))
+        cls.silent.listen(16)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop local agents."""
+        stop_agents(cls.agents)
+        cls.silent.close()
+
+    def setUp(self):
+        """Create driver for local agents and the silent node."""
+        self.driver = AsyncLocustDriver(read_timeout=3)
+        for index, (address, _) in enumerate(self.agents):
+            self.driver.add_node(node_name='node%d' % index,
+                                 node_ip=address, node_group='main', key=KEY)
+        self.driver.add_node(node_name='silent', node_group='main', key=KEY,
+                             node_ip='127.0.0.1:%d' %
+                             self.silent.getsockname()[1])
+        self.driver.add_node(node_name='dead', node_ip='127.0.0.1:1',
+                             node_group='broken', key=KEY)
+
+    def tearDown(self):
+        """Close connections."""
+        self.driver.close()
+
+    def test_as_completed(self):
+        """Futures are completed in the order of answers."""
+        driver = self.driver
+        start = time()
+
+        @coroutine
+        def collect():
+            """Collect answers until the silent node."""
+            names = []
+            for future in driver.as_completed('list_network_adapters',
+                                              node_groups='main'):
+                name, _, _ = yield future
+                if name == 'silent':
+                    break
+                names.append(name)
+                self.assertTrue(time() - start < 2)
+            raise Return(names)
+        self.assertEqual(sorted(driver.run(collect())),
+                         ['node0', 'node1', 'node2'])
+
+    def test_first_successes(self):
+        """Future is completed by the first successes."""
+        start = time()
+        result = self.driver.run(self.driver.first_successes(
+            2, 'list_network_adapters', node_groups=['main', 'broken']))
+        self.assertTrue(time() - start < 2)
+        self.assertEqual(len(result), 2)
+        for name in result:
+            self.assertTrue(name.startswith('node'))
+
+    def test_first_successes_failed(self):
+        """Failed results are not counted."""
+        result = self.driver.run(self.driver.first_successes(
+            3, 'list_network_adapters', nodes=['node0', 'dead']))
+        self.assertEqual(result.keys(), ['node0'])
+
+    def test_quorum(self):
+        """Quorum is decided as soon as it is reached or impossible."""
+        start = time()
+        reached, result = self.driver.run(self.driver.quorum(
+            3, 'list_network_adapters', node_groups='main'))
+        self.assertTrue(reached)
+        self.assertFalse('silent' in result)
+        reached, result = self.driver.run(self.driver.quorum(
+            3, 'list_network_adapters', nodes=['dead', 'silent', 'node0']))
+        self.assertFalse(reached)
+        self.assertEqual(result['dead']['status'], 'connection_error')
+        self.assertTrue(time() - start < 2)
+
+
+class AsyncPartition(unittest.TestCase):
+    """Implements unit tests for AsyncLocustDriver.partition."""
+
+    def setUp(self):
+        """Start a fake fleet."""
+        self.fleet = FakeFleet(4, ports=1, seed=1).start()
+        self.driver = AsyncLocustDriver(self.fleet.inventory())
+
+    def tearDown(self):
+        """Stop the fleet."""
+        self.driver.close()
+        self.fleet.stop()
+
+    def test_loop_runs_while_partitioned(self):
+        """Partition does not block the loop until it is healed."""
+        ticks = []
+
+        @coroutine
+        def tick():
+            """Count loop iterations while the partition lasts."""
+            for _ in range(5):
+                yield self.driver.loop.sleep(0.05)
+                ticks.append(time())
+        start = time()
+        future = self.driver.partition([['node0', 'node1'],
+                                        ['node2', 'node3']], duration=0.3)
+        self.assertTrue(isinstance(future, Future))
+        report, _ = self.driver.run(gather([future, tick()]))
+        self.assertTrue(time() - start >= 0.3)
+        self.assertEqual(len(ticks), 5)
+        self.assertTrue(ticks[-1] - start < 0.3)
+        self.assertEqual(report['node3']['side'], 1)
+        self.assertEqual(report['node3']['blocked']['command'],
+                         'block_peers')
+        self.assertEqual(report['node3']['healed']['command'],
+                         'heal_partition')
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
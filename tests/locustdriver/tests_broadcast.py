@@ -0,0 +1,149 @@
+"""
+Tests for tree broadcast of locust driver
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import os
+import sys
+import unittest
+from subprocess import check_output
+
+from locustdriver import LocustDriver
+from locustdriver.broadcast import build_tree, tree_depth, subtree_names
+from locustdriver.inventory import Node
+from common import KEY, start_agents, stop_agents
+
+
+class BroadcastTree(unittest.TestCase):
+    """Implements unit tests for broadcast trees."""
+
+    @staticmethod
+    def _nodes(count):
+        """Return inventory nodes."""
+        return [Node('node%d' % index, '127.0.0.1:%d' % (8000 + index),
+                     key=KEY) for index in range(count)]
+
+    def test_shape(self):
+        """Nodes are arranged to a complete forest."""
+        roots = build_tree(self._nodes(13), fanout=3)
+        self.assertEqual([root['name'] for root in roots],
+                         ['node0', 'node1', 'node2'])
+        self.assertEqual([child['name'] for child in roots[0]['targets']],
+                         ['node3', 'node4', 'node5'])
+        self.assertEqual(tree_depth(roots), 3)
+        names = []
+        for root in roots:
+            names.extend(subtree_names(root))
+        self.assertEqual(sorted(names),
+                         sorted('node%d' % index for index in range(13)))
+
+    def test_small_fleet(self):
+        """Fleet not larger than fanout is a single level."""
+        roots = build_tree(self._nodes(3), fanout=8)
+        self.assertEqual(len(roots), 3)
+        self.assertEqual(tree_depth(roots), 1)
+
+    def test_wrong_fanout(self):
+        """Fanout should be positive."""
+        self.assertRaises(ValueError, build_tree, self._nodes(3), 0)
+
+    def test_driver_is_standalone(self):
+        """Driver modules do not import the agent package."""
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        output = check_output([
+            sys.executable, '-c',
+            'import sys, locustdriver, locustdriver.aio, '
+            'locustdriver.recorder, locustdriver.chaos; '
+            'print sorted(name for name in sys.modules '
+            'if name.split(".")[0] == "locust")'], cwd=root)
+        self.assertEqual(output.strip(), '[]')
+
+
+class DriverBroadcast(unittest.TestCase):
+    """Implements unit tests for LocustDriver.broadcast."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start local agents."""
+        cls.agents = start_agents(13)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop local agents."""
+        stop_agents(cls.agents)
+
+    def setUp(self):
+        """Create driver for local agents."""
+        self.driver = LocustDriver(read_timeout=10)
+        for index, (address, _) in enumerate(self.agents):
+            self.driver.add_node(node_name='node%d' % index,
+                                 node_ip=address, node_group='main', key=KEY)
+
+    def tearDown(self):
+        """Close driver connections."""
+        self.driver.close()
+
+    def test_result_for_every_node(self):
+        """Every node of the tree returns its result."""
+        result = self.driver.broadcast('exec_command', node_groups='main',
+                                       arguments={'cmd': 'echo hi'},
+                                       fanout=3)
+        self.assertEqual(sorted(result),
+                         sorted('node%d' % index for index in range(13)))
+        for each in result.values():
+            self.assertEqual(each['result'], 'hi')
+
+    def test_driver_calls_roots_only(self):
+        """Driver connects to the roots of the tree only."""
+        before = [server.connections for _, server in self.agents]
+        self.driver.broadcast('list_network_adapters', node_groups='main',
+                              fanout=3)
+        after = [server.connections for _, server in self.agents]
+        # Every node is reached once: by the driver or by its relay
+        self.assertEqual([b - a for a, b in zip(before, after)], [1] * 13)
+
+    def test_dead_relay(self):
+        """Unreachable relay gives its error to the whole subtree."""
+        self.driver.add_node(node_name='dead', node_ip='127.0.0.1:1',
+                             node_group='main', key=KEY)
+        nodes = ['dead'] + ['node%d' % index for index in range(13)]
+        result = self.driver.broadcast('list_network_adapters', nodes=nodes,
+                                       fanout=3)
+        self.assertEqual(len(result), 14)
+        # dead is a root, node2, node3 and node4 are its children and
+        # node11, node12 are children of node2
+        for name in ('dead', 'node2', 'node3', 'node4', 'node11', 'node12'):
+            self.assertEqual(result[name]['status'], 'connection_error')
+        for name in ('node0', 'node1', 'node5', 'node10'):
+            self.assertTrue(isinstance(result[name], list))
+
+    def test_dead_inner_node(self):
+        """Unreachable inner node gives its error to its subtree."""
+        self.driver.add_node(node_name='dead', node_ip='127.0.0.1:1',
+                             node_group='main', key=KEY)
+        nodes = ['node0', 'dead'] + ['node%d' % index for index in range(1, 6)]
+        result = self.driver.broadcast('list_network_adapters', nodes=nodes,
+                                       fanout=2)
+        # node0 and dead are roots, node3, node4 are children of dead
+        for name in ('dead', 'node3', 'node4'):
+            self.assertEqual(result[name]['status'], 'connection_error')
+        for name in ('node0', 'node1', 'node2', 'node5'):
+            self.assertTrue(isinstance(result[name], list))
+
+    def test_wrong_command(self):
+        """Unknown command is refused by the relays."""
+        result = self.driver.broadcast('no_such_command', node_groups='main',
+                                       fanout=3)
+        self.assertEqual(len(result), 13)
+        for each in result.values():
+            self.assertTrue(each['status'])
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
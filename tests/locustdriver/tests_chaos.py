@@ -0,0 +1,119 @@
+"""
+Tests for the chaos monkey of locust driver
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import os
+import unittest
+from json import loads
+from tempfile import mkstemp
+
+from locustdriver import LocustDriver
+from locustdriver.chaos import ChaosMonkey
+from locustdriver.fakefleet import FakeFleet
+
+MENU = [{'command': 'kill_process', 'weight': 1,
+         'arguments': {'names': ['app']}},
+        {'command': 'burn_cpu', 'weight': 3, 'arguments': {'timeout': 2},
+         'duration': 2}]
+
+
+class ChaosPlan(unittest.TestCase):
+    """Implements unit tests for planning of faults."""
+
+    def setUp(self):
+        """Create driver of nodes that are never called."""
+        self.driver = LocustDriver()
+        for index in range(20):
+            self.driver.add_node(node_name='node%02d' % index,
+                                 node_ip='127.0.0.1:1', node_group='web',
+                                 key='key')
+
+    def monkey(self, **kwargs):
+        """Return monkey of the web group."""
+        options = dict(seed=7, interval=0.5, duration=60, max_active=3)
+        options.update(kwargs)
+        #pylint: disable=W0142
+        return ChaosMonkey(self.driver, MENU, node_groups='web', **options)
+
+    def test_seed_reproducible(self):
+        """Same seed gives the same plan."""
+        self.assertEqual(self.monkey().plan(), self.monkey().plan())
+        self.assertNotEqual(self.monkey().plan(), self.monkey(seed=8).plan())
+
+    def test_budget(self):
+        """Amount of faults is limited by the budget."""
+        self.assertEqual(len(self.monkey(budget=5).plan()), 5)
+
+    def test_weights(self):
+        """Commands are picked by weights."""
+        plan = self.monkey(max_active=100).plan()
+        burns = sum(1 for event in plan if event['command'] == 'burn_cpu')
+        self.assertTrue(0.6 < burns / float(len(plan)) < 0.9)
+
+    def test_max_active(self):
+        """Active faults never exceed max_active."""
+        plan = self.monkey(max_active=2).plan()
+        self.assertTrue(plan)
+        for event in plan:
+            active = sum(1 for other in plan
+                         if other['at'] <= event['at'] <
+                         other['at'] + other['duration'])
+            self.assertTrue(active <= 2, event)
+
+    def test_min_spacing(self):
+        """Faults of a node are spaced."""
+        plan = self.monkey(max_active=20, min_spacing=10).plan()
+        last = {}
+        for event in plan:
+            if event['node'] in last:
+                self.assertTrue(event['at'] >= last[event['node']] + 10)
+            last[event['node']] = event['at'] + event['duration']
+
+    def test_empty_menu(self):
+        """Menu is required."""
+        self.assertRaises(ValueError, ChaosMonkey, self.driver, [])
+
+
+class ChaosRun(unittest.TestCase):
+    """Implements unit tests for dispatch and replay of faults."""
+
+    def setUp(self):
+        """Start a fake fleet."""
+        self.fleet = FakeFleet(10, ports=2, seed=1).start()
+        self.driver = LocustDriver(self.fleet.inventory())
+        handle, self.log = mkstemp(suffix='.jsonl')
+        os.close(handle)
+
+    def tearDown(self):
+        """Stop the fleet."""
+        self.driver.close()
+        self.fleet.stop()
+        os.remove(self.log)
+
+    def test_run_and_replay(self):
+        """Faults are dispatched and replayed from the log."""
+        monkey = ChaosMonkey(self.driver, MENU, node_groups='fleet', seed=3,
+                             interval=0.05, duration=1, max_active=10)
+        plan = monkey.plan()
+        report = monkey.run(log=self.log)
+        self.assertEqual(len(report.records), len(plan))
+        self.assertEqual(self.fleet.requests, len(plan))
+        with open(self.log) as source:
+            records = [loads(line) for line in source]
+        self.assertEqual(records[0]['seed'], 3)
+        self.assertEqual(sum(1 for each in records
+                             if each['type'] == 'result'), len(plan))
+        self.assertEqual(ChaosMonkey.load(self.log), plan)
+        replayed = ChaosMonkey.replay(self.driver, self.log)
+        self.assertEqual(sorted((each['planned'], each['node'])
+                                for each in replayed.records),
+                         sorted((event['at'], event['node'])
+                                for event in plan))
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
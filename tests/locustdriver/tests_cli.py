@@ -0,0 +1,111 @@
+"""
+Tests for the remote CLI of locust driver
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import os
+import sys
+import unittest
+from json import dump, loads
+from StringIO import StringIO
+from tempfile import mkstemp
+from time import sleep
+
+from locustdriver import cli
+from locustdriver.fakefleet import FakeFleet
+
+
+def echo(name, arguments):
+    """Answer with the arguments, node0 answers late."""
+    if name == 'node0':
+        sleep(0.5)
+    return {'node': name, 'arguments': arguments}
+
+
+class CliTest(unittest.TestCase):
+    """Implements unit tests for the remote CLI."""
+
+    def setUp(self):
+        self.fleet = FakeFleet(4, handlers={'get_process': echo})
+        self.fleet.start()
+        self.addCleanup(self.fleet.stop)
+
+    def run_cli(self, *args):
+        """Run the CLI, return (<exit code>, [<printed JSON lines>])."""
+        argv, stdout = sys.argv, sys.stdout
+        sys.argv = ['cli'] + list(args)
+        sys.stdout = StringIO()
+        code = 0
+        try:
+            cli.main()
+        except SystemExit as ex:
+            code = ex.code
+        finally:
+            output = sys.stdout.getvalue()
+            sys.argv, sys.stdout = argv, stdout
+        return code, [loads(line) for line in output.splitlines()]
+
+    def addresses(self, *names):
+        """Return addresses of the fleet nodes."""
+        return [self.fleet.address(name) for name in names]
+
+    def test_several_addresses(self):
+        """Repeated and comma separated addresses are called."""
+        first, second, third = self.addresses('node1', 'node2', 'node3')
+        code, lines = self.run_cli('-a', first, '-a', second + ',' + third,
+                                   '-k', self.fleet.token, 'get', 'process',
+                                   '--names=java', 'pids=1')
+        self.assertEqual(code, 0)
+        self.assertEqual(sorted(line['address'] for line in lines),
+                         sorted([first, second, third]))
+        for line in lines:
+            self.assertEqual(line['node'], line['address'])
+            self.assertEqual(line['result']['arguments'],
+                             {'names': 'java', 'pids': '1'})
+            self.assertTrue(line['latency'] >= 0)
+
+    def test_printed_as_completed(self):
+        """Slow nodes are printed last."""
+        code, lines = self.run_cli(
+            '-a', ','.join(self.addresses('node0', 'node1', 'node2')),
+            '-k', self.fleet.token, 'get', 'process')
+        self.assertEqual(code, 0)
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[-1]['address'], self.fleet.address('node0'))
+
+    def test_inventory_groups(self):
+        """Nodes are selected from the inventory by groups."""
+        handle, path = mkstemp(suffix='.json')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w') as inventory:
+            dump({'nodes': dict((name, {'address': self.fleet.address(name),
+                                        'key': self.fleet.key,
+                                        'groups': ['fleet']})
+                                for name in self.fleet.names)}, inventory)
+        code, lines = self.run_cli('-i', path, '-g', 'fleet[2@1]',
+                                   'get', 'process')
+        self.assertEqual(code, 0)
+        self.assertEqual(len(lines), 2)
+        code, lines = self.run_cli('-i', path, '-n', 'node1,node3',
+                                   'get', 'process')
+        self.assertEqual(sorted(line['node'] for line in lines),
+                         ['node1', 'node3'])
+
+    def test_errors_exit_code(self):
+        """Exit code is not zero if any node failed."""
+        code, lines = self.run_cli('-a', ','.join(self.addresses('node1',
+                                                                 'node2')),
+                                   '-k', 'wrong', '--read-timeout=5',
+                                   'get', 'process')
+        self.assertEqual(code, 1)
+        self.assertEqual(len(lines), 2)
+        for line in lines:
+            self.assertEqual(line['result']['status'],
+                             'authorization_failed')
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Tests for persistent connections of locust driver
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import socket
+import unittest
+from threading import Thread
+from time import sleep
+
+from locustdriver import LocustDriver
+from locustdriver.connection import ConnectionPool, NodeError
+from common import KEY, start_agents, stop_agents
+
+
+class DroppingServer(object):
+    """Answers the first request of a connection and closes the connection
+    after reading the following one, as a node crashed while executing
+    it."""
+
+    def __init__(self):
+        self.requests = 0
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(5)
+        self.address = '127.0.0.1:%d' % self.sock.getsockname()[1]
+        thread = Thread(target=self.serve)
+        thread.daemon = True
+        thread.start()
+
+    def serve(self):
+        """Handle connections one by one."""
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except socket.error:
+                return
+            for answer in (True, False):
+                data = ''
+                while not data.endswith('body'):
+                    data += conn.recv(4096)
+                self.requests += 1
+                if answer:
+                    conn.sendall('HTTP/1.1 200 OK\r\nContent-Length: 2'
+                                 '\r\n\r\nok')
+            conn.close()
+
+    def close(self):
+        """Stop accepting connections."""
+        self.sock.close()
+
+
+class DriverConnections(unittest.TestCase):
+    """Implements unit tests for keep-alive connections of LocustDriver."""
+
+    def setUp(self):
+        """Start local agent."""
+        self.agents = start_agents(1, idle_timeout=0.5)
+        self.server = self.agents[0][1]
+
+    def tearDown(self):
+        """Stop local agent."""
+        self.driver.close()
+        stop_agents(self.agents)
+
+    def create_driver(self, **kwargs):
+        """Create driver for the local agent."""
+        #pylint: disable=W0142
+        self.driver = LocustDriver(**kwargs)
+        self.driver.add_node(node_name='node', node_ip=self.agents[0][0],
+                             node_group='main', key=KEY)
+        return self.driver
+
+    def test_connection_reused(self):
+        """Following commands are sent through one connection."""
+        driver = self.create_driver()
+        for _ in range(5):
+            result = driver.exec_command(nodes='node', cmd='echo hi')
+            self.assertEqual(result['node']['result'], 'hi')
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(driver.connections.reused, 4)
+
+    def test_keep_alive_disabled(self):
+        """Every command opens a new connection without keep-alive."""
+        driver = self.create_driver(keep_alive=False)
+        for _ in range(3):
+            driver.exec_command(nodes='node', cmd='echo hi')
+        self.assertEqual(self.server.connections, 3)
+
+    def test_closed_connection_evicted(self):
+        """Connection closed by the node is not reused."""
+        driver = self.create_driver()
+        driver.exec_command(nodes='node', cmd='echo hi')
+        sleep(1)
+        result = driver.exec_command(nodes='node', cmd='echo hi')
+        self.assertEqual(result['node']['result'], 'hi')
+        self.assertEqual(self.server.connections, 2)
+
+    def test_old_connection_evicted(self):
+        """Connection idle longer than idle timeout is not reused."""
+        driver = self.create_driver()
+        driver.connections = ConnectionPool(idle_timeout=0)
+        driver.exec_command(nodes='node', cmd='echo hi')
+        driver.exec_command(nodes='node', cmd='echo hi')
+        self.assertEqual(driver.connections.reused, 0)
+        self.assertEqual(driver.connections.created, 2)
+
+
+class ResendOnReset(unittest.TestCase):
+    """Implements unit tests for resending requests of ConnectionPool."""
+
+    def setUp(self):
+        self.server = DroppingServer()
+        self.pool = ConnectionPool()
+        self.pool.request(self.server.address, 'body')
+
+    def tearDown(self):
+        self.pool.clear()
+        self.server.close()
+
+    def test_sent_request_not_repeated(self):
+        """Request dropped by the node after it was sent is not
+        repeated."""
+        with self.assertRaises(NodeError) as error:
+            self.pool.request(self.server.address, 'body')
+        self.assertEqual(error.exception.status, 'connection_error')
+        self.assertEqual(self.server.requests, 2)
+
+    def test_idempotent_request_repeated(self):
+        """Idempotent request is repeated on a new connection."""
+        _, data = self.pool.request(self.server.address, 'body',
+                                    idempotent=True)
+        self.assertEqual(data, 'ok')
+        self.assertEqual(self.server.requests, 3)
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
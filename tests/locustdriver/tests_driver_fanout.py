@@ -0,0 +1,217 @@
+"""
+Tests for concurrent command fan-out of locust driver
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import socket
+import unittest
+from time import time
+
+from locustdriver import LocustDriver
+from common import KEY, start_agents, stop_agents
+
+
+class DriverFanout(unittest.TestCase):
+    """Implements unit tests for LocustDriver fan-out."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start local agents."""
+        cls.agents = start_agents(4)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop local agents."""
+        stop_agents(cls.agents)
+
+    def setUp(self):
+        """Create driver for local agents."""
+        self.driver = LocustDriver(read_timeout=5)
+        for index, (address, _) in enumerate(self.agents):
+            self.driver.add_node(node_name='node%d' % index,
+                                 node_ip=address, node_group='main', key=KEY)
+
+    def test_result_for_every_node(self):
+        """Command returns result for every node."""
+        result = self.driver.exec_command(node_groups='main', cmd='echo hi')
+        self.assertEqual(sorted(result), ['node0', 'node1', 'node2', 'node3'])
+        for each in result.values():
+            self.assertEqual(each['result'], 'hi')
+
+    def test_nodes_are_concurrent(self):
+        """Command is sent to all nodes at the same time."""
+        start = time()
+        self.driver.exec_command(node_groups='main', cmd='sleep 1')
+        self.assertTrue(time() - start < 2.5,
+                        'Nodes should be called concurrently')
+
+    def test_read_timeout_per_node(self):
+        """Slow node is reported as timeout."""
+        self.driver.read_timeout = 1
+        start = time()
+        result = self.driver.exec_command(nodes='node0', cmd='exec sleep 3',
+                                          timeout=3)
+        self.assertEqual(result['node0']['status'], 'timeout')
+        self.assertTrue(time() - start < 2.5)
+
+    def test_dead_node(self):
+        """Unreachable node is reported as connection error."""
+        self.driver.add_node(node_name='dead', node_ip='127.0.0.1:1',
+                             node_group='main', key=KEY)
+        result = self.driver.exec_command(node_groups='main', cmd='echo hi')
+        self.assertEqual(result['dead']['status'], 'connection_error')
+        self.assertEqual(result['node0']['result'], 'hi')
+
+    def test_response_keeps_json_literals(self):
+        """Words true, false and null in results are kept as is."""
+        result = self.driver.exec_command(nodes='node0',
+                                          cmd='echo true false null')
+        self.assertEqual(result['node0']['result'], 'true false null')
+        self.assertTrue(result['node0']['timed_out'] is False)
+
+    def test_iter_records(self):
+        """Records of all nodes are iterated."""
+        records = list(self.driver.iter_records('list_process',
+                                                node_groups='main'))
+        self.assertEqual(set(name for name, _ in records),
+                         set(['node0', 'node1', 'node2', 'node3']))
+        for _, record in records:
+            self.assertTrue('pid' in record)
+
+    def test_iter_records_error(self):
+        """Error of a node is iterated as a single record."""
+        records = list(self.driver.iter_records('get_process',
+                                                nodes='node0'))
+        self.assertEqual(len(records), 1)
+        self.assertTrue('status' in records[0][1])
+
+    def test_iter_records_stopped(self):
+        """Connections are released when iteration is stopped."""
+        for _ in self.driver.iter_records('list_process', nodes='node0',
+                                          buffer_size=1):
+            break
+        result = self.driver.exec_command(nodes='node0', cmd='echo hi')
+        self.assertEqual(result['node0']['result'], 'hi')
+
+    def test_send_command(self):
+        """Any agent command could be sent with arguments dict."""
+        result = self.driver.send_command(
+            'exec_command', nodes=['node1'], arguments={'cmd': 'echo hi'})
+        self.assertEqual(result.keys(), ['node1'])
+
+    def test_run_scenario(self):
+        """Scenario timeout is capped by the read timeout when waited."""
+        self.driver.read_timeout = 2
+        start = time()
+        result = self.driver.run_scenario([{'delay': 10}], nodes='node0',
+                                          timeout=10)
+        self.assertTrue(time() - start < 2)
+        self.assertEqual(result['node0']['status'], 'timeout')
+
+    def test_get_scenario(self):
+        """Scenario started without waiting is fetched by its id."""
+        result = self.driver.run_scenario([{'delay': 0.2}], nodes='node0',
+                                          wait=False, scenario_id='pause')
+        self.assertEqual(result['node0']['status'], 'running')
+        result = self.driver.get_scenario('pause', nodes='node0', wait=2)
+        self.assertEqual(result['node0']['status'], 'success')
+        self.assertEqual(result['node0']['scenario_id'], 'pause')
+
+
+class DriverCompleted(unittest.TestCase):
+    """Implements unit tests for results in the order of answers."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start local agents and a node that never answers."""
+        cls.agents = start_agents(3)
+        cls.silent = socket.socket()
+        cls.silent.bind(('127.0.0.1', 0))
+        cls.silent.listen(16)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop local agents."""
+        stop_agents(cls.agents)
+        cls.silent.close()
+
+    def setUp(self):
+        """Create driver for local agents and the silent node."""
+        self.driver = LocustDriver(read_timeout=3)
+        for index, (address, _) in enumerate(self.agents):
+            self.driver.add_node(node_name='node%d' % index,
+                                 node_ip=address, node_group='main', key=KEY)
+        self.driver.add_node(node_name='silent', node_group='main', key=KEY,
+                             node_ip='127.0.0.1:%d' %
+                             self.silent.getsockname()[1])
+        self.driver.add_node(node_name='dead', node_ip='127.0.0.1:1',
+                             node_group='broken', key=KEY)
+
+    def tearDown(self):
+        """Close driver connections."""
+        self.driver.close()
+
+    def test_as_completed(self):
+        """Results are yielded before the slowest node answers."""
+        start = time()
+        names = []
+        for name, result, latency in self.driver.as_completed(
+                'list_network_adapters', node_groups='main'):
+            if name == 'silent':
+                self.assertEqual(result['status'], 'timeout')
+                continue
+            names.append(name)
+            self.assertTrue(latency < 2)
+            self.assertTrue(time() - start < 2)
+        self.assertEqual(sorted(names), ['node0', 'node1', 'node2'])
+
+    def test_callback(self):
+        """Callback is called for every node."""
+        answers = {}
+        result = self.driver.send_command(
+            'list_network_adapters', nodes=['node0', 'node1'],
+            callback=lambda name, result, _: answers.update({name: result}))
+        self.assertEqual(answers, result)
+
+    def test_first_successes(self):
+        """Waiting stops after the first successes."""
+        start = time()
+        result = self.driver.first_successes(
+            2, 'list_network_adapters', node_groups=['main', 'broken'])
+        self.assertTrue(time() - start < 2)
+        self.assertEqual(len(result), 2)
+        for name in result:
+            self.assertTrue(name.startswith('node'))
+
+    def test_first_successes_failed(self):
+        """Failed results are not counted."""
+        result = self.driver.first_successes(
+            3, 'list_network_adapters', nodes=['node0', 'dead'])
+        self.assertEqual(result.keys(), ['node0'])
+
+    def test_quorum_reached(self):
+        """Quorum is reached without the silent node."""
+        start = time()
+        reached, result = self.driver.quorum(
+            3, 'list_network_adapters', node_groups='main')
+        self.assertTrue(reached)
+        self.assertTrue(time() - start < 2)
+        self.assertFalse('silent' in result)
+
+    def test_quorum_impossible(self):
+        """Quorum fails as soon as too many nodes failed."""
+        start = time()
+        reached, result = self.driver.quorum(
+            3, 'list_network_adapters', nodes=['dead', 'silent', 'node0'])
+        self.assertFalse(reached)
+        self.assertTrue(time() - start < 2)
+        self.assertEqual(result['dead']['status'], 'connection_error')
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Tests for response encoding of locust agent and locust driver
+
+These tests requires locust installed
+"""
+#pylint: disable=C0103,too-many-public-methods
+import unittest
+from json import loads
+
+from locust.common.encoding import (encode_response, compact_records,
+                                    COMPACT_MIMETYPE)
+from locustdriver.encoding import (decompress_body, expand_compact,
+                                   is_compact)
+
+
+RECORDS = [{'pid': pid, 'name': 'proc%d' % pid, 'node': '1234',
+            'endpoint': '127.0.0.1'} for pid in range(1000)]
+
+
+class ResponseEncoding(unittest.TestCase):
+    """Implements unit tests for agent response encoding."""
+
+    def test_plain_response(self):
+        """Response without negotiation headers is plain JSON."""
+        body, headers = encode_response({'list': RECORDS})
+        self.assertEqual(loads(body), {'list': RECORDS})
+        self.assertFalse('Content-Encoding' in headers)
+
+    def test_compact_hoists_constant_fields(self):
+        """Fields with the same value are sent once."""
+        result = compact_records(RECORDS)
+        self.assertEqual(result['const'],
+                         {'node': '1234', 'endpoint': '127.0.0.1'})
+        self.assertEqual(sorted(result['columns']), ['name', 'pid'])
+
+    def test_compact_skips_different_records(self):
+        """Records with different fields are not compacted."""
+        records = [{'a': 1}, {'b': 2}]
+        self.assertEqual(compact_records(records), records)
+
+    def test_small_body_not_gzipped(self):
+        """Small bodies are sent without compression."""
+        _, headers = encode_response({'list': []}, accept_encoding='gzip')
+        self.assertFalse('Content-Encoding' in headers)
+
+    def test_gzip_compact_roundtrip(self):
+        """Driver decodes gzipped compact response to the original value."""
+        plain, _ = encode_response({'list': RECORDS})
+        body, headers = encode_response({'list': RECORDS},
+                                        accept=COMPACT_MIMETYPE,
+                                        accept_encoding='gzip, deflate')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertTrue(len(body) * 10 < len(plain))
+        self.assertTrue(is_compact(headers))
+        value = expand_compact(loads(decompress_body(body, headers)))
+        self.assertEqual(value, {'list': RECORDS})
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
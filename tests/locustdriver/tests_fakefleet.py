@@ -0,0 +1,79 @@
+"""
+Tests for the fake agent fleet of locust driver
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import unittest
+from time import time
+
+from locustdriver import LocustDriver
+from locustdriver.fakefleet import FakeFleet
+
+
+class FakeFleetTest(unittest.TestCase):
+    """Implements unit tests for FakeFleet."""
+
+    def start(self, count, **kwargs):
+        """Start the fleet and return driver of its nodes."""
+        fleet = FakeFleet(count, seed=1, **kwargs).start()
+        self.addCleanup(fleet.stop)
+        driver = LocustDriver(fleet.inventory(), read_timeout=5)
+        self.addCleanup(driver.close)
+        return fleet, driver
+
+    def test_routed_by_path(self):
+        """Nodes sharing ports answer for themselves."""
+        fleet, driver = self.start(20, ports=3, payload_size=100)
+        self.assertTrue(fleet.address('node4').endswith('/node4'))
+        result = driver.send_command('list_process', node_groups='fleet')
+        self.assertEqual(len(result), 20)
+        for name, each in result.items():
+            self.assertEqual(each['node'], name)
+            self.assertEqual(len(each['payload']), 100)
+        self.assertEqual(fleet.requests, 20)
+
+    def test_port_per_node(self):
+        """Every node gets its own port by default."""
+        fleet, driver = self.start(3)
+        self.assertEqual(len(set(fleet.address(name)
+                                 for name in fleet.names)), 3)
+        result = driver.send_command('get_process', nodes='node2')
+        self.assertEqual(result['node2']['command'], 'get_process')
+
+    def test_address_of(self):
+        """Addresses of a fleet started on a base port are known."""
+        self.assertEqual(FakeFleet.address_of(5, 10, 10, base_port=17000),
+                         '127.0.0.1:17005')
+        self.assertEqual(FakeFleet.address_of(5, 10, 4, base_port=17000),
+                         '127.0.0.1:17001/node5')
+
+    def test_errors(self):
+        """Errors are injected with the given rate."""
+        fleet, driver = self.start(10, ports=1, error_rate=1)
+        result = driver.send_command('list_process', node_groups='fleet')
+        for each in result.values():
+            self.assertEqual(each['status'], 'unexpected_error')
+        self.assertEqual(fleet.errors, 10)
+
+    def test_latency(self):
+        """Answers are delayed."""
+        _, driver = self.start(5, ports=1, latency=0.3)
+        start = time()
+        driver.send_command('list_process', node_groups='fleet')
+        spent = time() - start
+        self.assertTrue(0.3 <= spent < 1.5, spent)
+
+    def test_wrong_key(self):
+        """Wrong key is refused as by a real agent."""
+        fleet, driver = self.start(2, ports=1)
+        driver.add_node(node_name='node0', node_ip=fleet.address('node0'),
+                        node_group='wrong', key='wrong')
+        result = driver.send_command('list_process', nodes='node0')
+        self.assertEqual(result['node0']['status'], 'authorization_failed')
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+Tests for node inventory of locust driver
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import os
+import unittest
+from hashlib import sha256
+from json import dump
+from tempfile import mkstemp
+
+from locustdriver import LocustDriver
+from locustdriver.inventory import Inventory, Any, Percent
+
+
+class InventoryTests(unittest.TestCase):
+    """Implements unit tests for Inventory."""
+
+    def setUp(self):
+        """Create inventory."""
+        self.inventory = Inventory()
+        for index in range(100):
+            self.inventory.add('node%d' % index, '10.0.0.%d' % index,
+                               key='key%d' % index,
+                               groups=['even' if index % 2 else 'odd'],
+                               labels={'dc': 'east' if index < 50 else
+                                             'west'})
+
+    @staticmethod
+    def names(nodes):
+        """Return sorted names of nodes."""
+        return sorted(node.name for node in nodes)
+
+    def test_token_precomputed(self):
+        """Node token is sha256 of the key."""
+        self.assertEqual(self.inventory.nodes['node1'].token,
+                         sha256('key1').hexdigest())
+
+    def test_resolve_groups_and_nodes(self):
+        """Nodes of groups and named nodes are selected once."""
+        nodes = self.inventory.resolve(['node1', 'node2', 'unknown'], 'odd')
+        self.assertEqual(len(nodes), 51)
+        self.assertEqual(len(set(nodes)), 51)
+
+    def test_resolve_labels(self):
+        """Labels filter nodes."""
+        self.assertEqual(len(self.inventory.resolve(labels={'dc': 'west'})),
+                         50)
+        nodes = self.inventory.resolve(groups='odd', labels={'dc': 'west'})
+        self.assertEqual(len(nodes), 25)
+        self.assertTrue(all(node.labels['dc'] == 'west' for node in nodes))
+
+    def test_resolve_all(self):
+        """All nodes are selected without selectors."""
+        self.assertEqual(len(self.inventory.resolve()), 100)
+
+    def test_resolve_cached(self):
+        """Resolved targets are cached until inventory changes."""
+        nodes = self.inventory.resolve(groups='odd')
+        self.assertTrue(self.inventory.resolve(groups='odd') is nodes)
+        self.inventory.add('node100', '10.0.1.0', key='x', groups='odd')
+        self.assertEqual(len(self.inventory.resolve(groups='odd')), 51)
+        self.inventory.remove('node100')
+        self.assertEqual(len(self.inventory.resolve(groups='odd')), 50)
+
+    def test_legacy_format(self):
+        """Format of LocustDriver nodes argument is accepted."""
+        inventory = Inventory.from_dict(
+            {'nodes': {'a': '1.1.1.1', 'b': '2.2.2.2'},
+             'node_groups': {'g': ['a', 'b'], 'h': ['b']},
+             'keys': {'a': 'ka', 'b': 'kb'}})
+        self.assertEqual(self.names(inventory.resolve(groups='h')), ['b'])
+        self.assertEqual(inventory.nodes['a'].token, sha256('ka').hexdigest())
+
+    def test_from_json_file(self):
+        """Inventory is loaded from JSON file."""
+        handle, path = mkstemp(suffix='.json')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w') as inventory:
+            dump({'nodes': [{'name': 'a', 'address': '1.1.1.1', 'key': 'k',
+                             'groups': ['db'], 'labels': {'dc': 'east'}},
+                            {'name': 'b', 'address': '2.2.2.2',
+                             'token': 'token'}]}, inventory)
+        driver = LocustDriver.from_inventory(path)
+        self.assertEqual(driver.inventory.nodes['b'].token, 'token')
+        self.assertEqual(self.names(driver.inventory.resolve(groups='db')),
+                         ['a'])
+
+    def test_driver_add_node(self):
+        """Driver adds groups of existing node."""
+        driver = LocustDriver()
+        driver.add_node('a', '1.1.1.1', 'g1', 'key')
+        driver.add_node('a', '1.1.1.1', 'g2', 'key')
+        self.assertEqual(driver.nodes['node_groups'], {'g1': ['a'],
+                                                       'g2': ['a']})
+
+    def test_driver_nodes_assigned(self):
+        """Assigned nodes description replaces the inventory."""
+        driver = LocustDriver()
+        driver.add_node('a', '1.1.1.1', 'g1', 'key')
+        driver.nodes = {'nodes': {'b': '2.2.2.2'},
+                        'node_groups': {'g2': ['b']}, 'keys': {'b': 'kb'}}
+        self.assertEqual(self.names(driver.inventory.resolve(groups='g2')),
+                         ['b'])
+        self.assertFalse('a' in driver.inventory)
+        driver.nodes = self.inventory
+        self.assertTrue(driver.inventory is self.inventory)
+
+    def test_driver_nodes_read_only(self):
+        """Changes of the nodes description are refused."""
+        driver = LocustDriver()
+        driver.add_node('a', '1.1.1.1', 'g1', 'key')
+        nodes = driver.nodes
+        self.assertEqual(nodes['nodes'], {'a': '1.1.1.1'})
+        self.assertRaises(TypeError, nodes['node_groups']['g1'].append, 'b')
+        self.assertRaises(TypeError, nodes['nodes'].__setitem__, 'b', '2')
+        self.assertRaises(TypeError, nodes['keys'].update, {'a': 'other'})
+        self.assertRaises(TypeError, nodes.pop, 'nodes')
+        self.assertEqual(driver.nodes, nodes)
+
+
+class SelectorTests(unittest.TestCase):
+    """Implements unit tests for selectors of a part of a group."""
+
+    def setUp(self):
+        """Create inventory with a db group of 50 nodes."""
+        self.inventory = Inventory()
+        for index in range(50):
+            self.inventory.add('db%d' % index, '10.0.1.%d' % index,
+                               groups=['db'],
+                               labels={'dc': 'east' if index % 2 else
+                                             'west'})
+
+    @staticmethod
+    def names(nodes):
+        """Return set of names of nodes."""
+        return set(node.name for node in nodes)
+
+    def test_percent(self):
+        """Percent of the group is rounded up."""
+        self.assertEqual(len(self.inventory.resolve(
+            groups=Percent('db', 30))), 15)
+        self.assertEqual(len(self.inventory.resolve(
+            groups=Percent('db', 1))), 1)
+        self.assertEqual(len(self.inventory.resolve(
+            groups=Percent('db', 100))), 50)
+
+    def test_any(self):
+        """Any picks the amount of nodes of the group."""
+        nodes = self.inventory.resolve(groups=Any('db', 2))
+        self.assertEqual(len(nodes), 2)
+        self.assertTrue(all(node.groups == ('db', ) for node in nodes))
+        self.assertEqual(len(self.inventory.resolve(groups=Any('db', 99))),
+                         50)
+
+    def test_strings(self):
+        """Selectors are parsed from strings."""
+        self.assertEqual(len(self.inventory.resolve(groups='db[30%]')), 15)
+        self.assertEqual(self.inventory.resolve(groups='db[2@x]'),
+                         self.inventory.resolve(groups=Any('db', 2, 'x')))
+        self.assertEqual(self.inventory.resolve(groups='missing[2]'), ())
+
+    def test_seed_stable(self):
+        """Same seed picks the same nodes, other seeds pick others."""
+        first = self.names(self.inventory.resolve(groups=Any('db', 5, 1)))
+        self.inventory._cache.clear()
+        self.assertEqual(self.names(self.inventory.resolve(
+            groups=Any('db', 5, 1))), first)
+        self.assertNotEqual(self.names(self.inventory.resolve(
+            groups=Any('db', 5, 2))), first)
+
+    def test_stable_while_growing(self):
+        """Picks of a seed mostly stay after the group grows."""
+        before = [self.names(self.inventory.resolve(
+            groups=Percent('db', 20, seed))) for seed in range(20)]
+        for index in range(50, 55):
+            self.inventory.add('db%d' % index, '10.0.2.%d' % index,
+                               groups=['db'])
+        kept = 0
+        for seed in range(20):
+            after = self.names(self.inventory.resolve(
+                groups=Percent('db', 20, seed)))
+            self.assertEqual(len(after), 11)
+            kept += len(before[seed] & after)
+        # 10 of 11 nodes are kept in average, random picks keep 2
+        self.assertTrue(kept >= 20 * 8, kept)
+
+    def test_labels(self):
+        """Selected nodes have the labels."""
+        nodes = self.inventory.resolve(groups=Any('db', 10, 3),
+                                       labels={'dc': 'east'})
+        self.assertEqual(len(nodes), 10)
+        for node in nodes:
+            self.assertEqual(node.labels['dc'], 'east')
+
+    def test_random_not_cached(self):
+        """Random picks change between calls."""
+        picks = set(tuple(self.names(self.inventory.resolve(
+            groups=Any('db', 3)))) for _ in range(10))
+        self.assertTrue(len(picks) > 1)
+
+    def test_driver_commands(self):
+        """Driver commands accept selectors."""
+        driver = LocustDriver(self.inventory)
+        self.assertEqual(len(driver._prepare_nodes(
+            node_groups=['db[10%@a]'])), 5)
+
+    def test_negative(self):
+        """Amount should not be negative."""
+        self.assertRaises(ValueError, Any, 'db', -1)
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Tests for incremental JSON decoding of locust driver
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import unittest
+from json import dumps
+
+from locustdriver.jsonstream import ListStream, ListFeeder
+
+
+def split(text, size):
+    """Split text to chunks of given size."""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class JSONStream(unittest.TestCase):
+    """Implements unit tests for ListStream."""
+
+    doc = {'list': [{'pid': pid, 'cmd': 'run true null false [1] {}',
+                     'cpu': -1.5e3, 'parent': None, 'running': True}
+                    for pid in range(50)],
+           'count': 50, 'names': ['a', 'b']}
+
+    def test_records_for_any_chunk_size(self):
+        """Records are decoded whatever chunks the body is split to."""
+        text = dumps(self.doc)
+        for size in (1, 2, 3, 7, 64, len(text)):
+            stream = ListStream(split(text, size))
+            self.assertEqual(list(stream), self.doc['list'])
+            self.assertEqual(stream.rest, {'count': 50, 'names': ['a', 'b']})
+            self.assertTrue(stream.found)
+
+    def test_numbers_split_between_chunks(self):
+        """Numbers are not decoded partially."""
+        values = [123456, -7e15, 0.25, 1, "x"]
+        for size in (1, 2, 3):
+            self.assertEqual(list(ListStream(split(dumps(values), size))),
+                             values)
+
+    def test_document_without_list(self):
+        """Document without the list is collected to rest."""
+        stream = ListStream(split(dumps({'status': 'x', 'value': 'y'}), 3))
+        self.assertEqual(list(stream), [])
+        self.assertFalse(stream.found)
+        self.assertEqual(stream.rest, {'status': 'x', 'value': 'y'})
+
+    def test_broken_document(self):
+        """Broken document raises ValueError."""
+        stream = ListStream(['{"list": [1, 2'])
+        self.assertRaises(ValueError, list, stream)
+
+    def test_records_are_lazy(self):
+        """Chunks are read only when records are requested."""
+        read = []
+
+        def chunks():
+            """Register read chunks."""
+            for chunk in split(dumps(range(1000)), 10):
+                read.append(chunk)
+                yield chunk
+        stream = iter(ListStream(chunks()))
+        self.assertEqual(next(stream), 0)
+        self.assertEqual(len(read), 1)
+
+    def test_feeder(self):
+        """Items are returned as soon as the fed chunks complete them."""
+        feeder = ListFeeder()
+        self.assertEqual(feeder.feed('{"list": [1, 2'), [1])
+        self.assertEqual(feeder.feed(', 3], "x": tr'), [2, 3])
+        self.assertFalse(feeder.done)
+        self.assertEqual(feeder.feed('ue}'), [])
+        self.assertEqual(feeder.close(), [])
+        self.assertEqual(feeder.rest, {'x': True})
+        feeder = ListFeeder()
+        feeder.feed('[1, 2')
+        self.assertRaises(ValueError, feeder.close)
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
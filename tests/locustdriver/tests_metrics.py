@@ -0,0 +1,104 @@
+"""
+Tests for metric driven node selection of locust driver
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import unittest
+
+from locustdriver import LocustDriver
+from locustdriver.fakefleet import FakeFleet
+from locustdriver.metrics import MetricSelector, metric_getter
+
+
+def fake_stats(name, arguments):
+    """Return stats growing with the node number, node3 is overloaded."""
+    index = int(name[len('node'):])
+    if index == 3:
+        return {'status': 'unexpected_error', 'value': 'overloaded'}
+    processes = dict((pattern, {'count': 1, 'cpu': index * 10.0,
+                                'rss': 1000 - index, 'connections': index})
+                     for pattern in arguments.get('names') or [])
+    return {'cpu': 50.0, 'memory': 10.0 + index, 'load': [index, 0, 0],
+            'cpu_count': 4, 'processes': processes}
+
+
+class MetricSelection(unittest.TestCase):
+    """Implements unit tests for MetricSelector."""
+
+    def setUp(self):
+        """Start a fake fleet answering stats."""
+        self.fleet = FakeFleet(5, ports=1, handlers={'get_stats': fake_stats})
+        self.fleet.start()
+        self.driver = LocustDriver(self.fleet.inventory())
+        self.selector = MetricSelector(self.driver, ttl=60)
+
+    def tearDown(self):
+        """Stop the fleet."""
+        self.driver.close()
+        self.fleet.stop()
+
+    def test_top(self):
+        """Nodes with the highest metric are selected."""
+        self.assertEqual(self.selector.top('process.cpu', names=['db'],
+                                           node_groups='fleet'), ['node4'])
+        self.assertEqual(self.selector.top('process.rss', 2, names=['db'],
+                                           node_groups='fleet'),
+                         ['node0', 'node1'])
+
+    def test_lowest(self):
+        """Nodes with the lowest metric are selected."""
+        self.assertEqual(self.selector.top('load', node_groups='fleet',
+                                           lowest=True), ['node0'])
+
+    def test_failed_skipped(self):
+        """Nodes without stats are not ranked."""
+        ranked = self.selector.rank('memory', node_groups='fleet')
+        self.assertEqual([name for name, _ in ranked],
+                         ['node4', 'node2', 'node1', 'node0'])
+
+    def test_cached(self):
+        """Stats are queried once within the TTL."""
+        self.selector.top('memory', node_groups='fleet')
+        self.selector.top('cpu', nodes=['node0', 'node1'])
+        # node3 failed and is not cached
+        self.assertEqual(self.fleet.requests, 5)
+        self.selector.top('memory', node_groups='fleet')
+        self.assertEqual(self.fleet.requests, 6)
+        self.selector.top('process.count', names=['db'], nodes='node0')
+        self.assertEqual(self.fleet.requests, 7)
+
+    def test_expired(self):
+        """Expired stats are queried again."""
+        self.selector.ttl = 0
+        self.selector.top('memory', nodes='node0')
+        self.selector.top('memory', nodes='node0')
+        self.assertEqual(self.fleet.requests, 2)
+
+    def test_dispatch(self):
+        """Command is sent to the top nodes only."""
+        result = self.selector.dispatch('kill_process', 'process.cpu',
+                                        count=2, names=['db'],
+                                        node_groups='fleet',
+                                        arguments={'names': ['db']})
+        self.assertEqual(sorted(result), ['node2', 'node4'])
+        self.assertEqual(result['node4']['command'], 'kill_process')
+        # stats of changed nodes are queried again
+        self.selector.top('cpu', names=['db'], nodes=['node4', 'node0'])
+        self.assertEqual(self.fleet.requests, 5 + 2 + 1)
+
+    def test_callable_metric(self):
+        """Any callable of stats could rank nodes."""
+        self.assertEqual(self.selector.top(
+            lambda stats: -stats['memory'], node_groups='fleet'), ['node0'])
+
+    def test_unknown_metric(self):
+        """Unknown metric names are refused."""
+        self.assertRaises(ValueError, metric_getter, 'process.threads')
+        self.assertRaises(ValueError, metric_getter, 'disk')
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
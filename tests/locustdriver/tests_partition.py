@@ -0,0 +1,111 @@
+"""
+Tests for network partitions of locust driver
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import os
+import unittest
+from tempfile import mkstemp
+from time import time
+
+from locustdriver import LocustDriver
+from locustdriver.fakefleet import FakeFleet
+from locustdriver.inventory import Inventory
+from locustdriver.recorder import SessionRecorder, load_session
+
+
+class PartitionPlan(unittest.TestCase):
+    """Implements unit tests for peers of partition sides."""
+
+    def setUp(self):
+        """Create driver of db and web nodes."""
+        inventory = Inventory()
+        for index in range(3):
+            inventory.add('db%d' % index, '10.0.1.%d:8086' % index,
+                          groups=['db'])
+            inventory.add('web%d' % index, 'http://10.0.2.%d:8086' % index,
+                          groups=['web'])
+        self.driver = LocustDriver(inventory)
+
+    def peers(self, groups):
+        """Return {<node name>: <peers>} of the partition."""
+        #pylint: disable=W0212
+        tasks, _ = self.driver._partition_tasks(groups)
+        return dict((name, data['arguments']['peers'])
+                    for name, _, data in tasks)
+
+    def test_groups(self):
+        """Nodes of a side block all nodes of other sides."""
+        peers = self.peers([['db'], ['web']])
+        self.assertEqual(len(peers), 6)
+        self.assertEqual(peers['db0'], ['10.0.2.0', '10.0.2.1', '10.0.2.2'])
+        self.assertEqual(peers['web2'], ['10.0.1.0', '10.0.1.1', '10.0.1.2'])
+
+    def test_nodes_and_groups(self):
+        """Sides mix node and group names."""
+        peers = self.peers([['db0'], ['db1', 'web']])
+        self.assertEqual(sorted(peers), ['db0', 'db1', 'web0', 'web1',
+                                         'web2'])
+        self.assertEqual(peers['db1'], ['10.0.1.0'])
+        self.assertEqual(len(peers['db0']), 4)
+
+    def test_three_sides(self):
+        """Every side is split from all other sides."""
+        peers = self.peers(['db0', 'db1', 'db2'])
+        self.assertEqual(peers['db1'], ['10.0.1.0', '10.0.1.2'])
+
+    def test_overlap(self):
+        """Node could not be on two sides."""
+        self.assertRaises(ValueError, self.peers, [['db'], ['db0']])
+
+
+class PartitionRun(unittest.TestCase):
+    """Implements unit tests for the partition flow."""
+
+    def setUp(self):
+        """Start a fake fleet and a recording driver."""
+        self.fleet = FakeFleet(4, ports=1, seed=1).start()
+        handle, self.path = mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.recorder = SessionRecorder(self.path)
+        self.driver = LocustDriver(self.fleet.inventory(),
+                                   recorder=self.recorder)
+
+    def tearDown(self):
+        """Stop the fleet."""
+        self.driver.close()
+        self.recorder.close()
+        self.fleet.stop()
+        os.remove(self.path)
+
+    def test_block_and_heal(self):
+        """Nodes are blocked, healed after the duration and reported."""
+        start = time()
+        report = self.driver.partition([['node0', 'node1'],
+                                        ['node2', 'node3']], duration=0.3)
+        self.assertTrue(time() - start >= 0.3)
+        self.assertEqual(sorted(report), ['node0', 'node1', 'node2',
+                                          'node3'])
+        self.assertEqual(report['node2']['side'], 1)
+        self.assertEqual(report['node2']['healed']['command'],
+                         'heal_partition')
+        self.recorder.flush()
+        records = load_session(self.path)
+        self.assertEqual([record['command'] for record in records],
+                         ['block_peers'] * 4 + ['heal_partition'] * 4)
+        for record in records[:4]:
+            # safety heal of agents is after the planned end
+            self.assertEqual(record['arguments']['timeout'], 30.3)
+
+    def test_without_duration(self):
+        """Partition is not healed without duration."""
+        report = self.driver.partition([['node0'], ['node1']])
+        self.assertTrue(report['node0']['healed'] is None)
+        self.assertEqual(self.fleet.requests, 2)
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Tests for the pytest plugin of locust driver
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import os
+import shutil
+import sys
+import unittest
+from json import dump
+from subprocess import Popen, PIPE
+from tempfile import mkdtemp
+from time import time
+from xml.etree import ElementTree
+
+from locustdriver import LocustDriver
+from locustdriver.fakefleet import FakeFleet
+from locustdriver.pytest_plugin import FaultManager, RevertError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+TESTS = '''
+import pytest
+
+
+@pytest.mark.locust_fault('suspend_process', node_groups='fleet',
+                          names=['app'])
+@pytest.mark.locust_fault('disable_network_adapters', nodes=['node0'],
+                          adapters=['eth1'], timeout=60)
+def test_marked(locust_fault):
+    assert len(locust_fault.faults) == 2
+
+
+def test_manager(locust_faults):
+    locust_faults.suspend_process(nodes=['node1'], pids=[42])
+
+
+def test_failed(locust_faults):
+    locust_faults.block_peers(nodes=['node2'], peers=['10.0.0.1'])
+    assert False
+
+
+def test_custom_revert(locust_faults):
+    locust_faults.apply('burn_cpu', nodes=['node0'],
+                        arguments={'timeout': 1}, revert='kill_process',
+                        revert_arguments={'names': ['burn']})
+'''
+
+
+class PytestPlugin(unittest.TestCase):
+    """Implements unit tests for locustdriver.pytest_plugin."""
+
+    def setUp(self):
+        """Start a fake fleet recording commands."""
+        self.calls = []
+        handlers = dict((command, self.handler(command)) for command in (
+            'suspend_process', 'resume_process', 'disable_network_adapters',
+            'enable_network_adapters', 'block_peers', 'heal_partition',
+            'burn_cpu', 'kill_process'))
+        self.fleet = FakeFleet(3, ports=1, handlers=handlers).start()
+        self.folder = mkdtemp()
+        self.inventory = os.path.join(self.folder, 'nodes.json')
+        with open(self.inventory, 'w') as output:
+            dump({'nodes': [{'name': name, 'address': self.fleet.address(
+                name), 'token': self.fleet.token, 'groups': ['fleet']}
+                            for name in self.fleet.names]}, output)
+        with open(os.path.join(self.folder, 'test_faults.py'), 'w') as output:
+            output.write(TESTS)
+
+    def tearDown(self):
+        """Stop the fleet."""
+        self.fleet.stop()
+        shutil.rmtree(self.folder)
+
+    def handler(self, command):
+        """Return fake handler recording the command."""
+        def record(name, arguments):
+            """Record the call."""
+            self.calls.append((command, name, arguments))
+            return {'list': [{'status': 'success', 'message': command}]}
+        return record
+
+    def run_pytest(self, *args):
+        """Run pytest on the test file, return (<code>, <output>)."""
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        proc = Popen([sys.executable, '-m', 'pytest', '-p', 'no:cacheprovider',
+                      '-p', 'locustdriver.pytest_plugin', '-rA',
+                      '--locust-inventory', self.inventory] + list(args) +
+                     [os.path.join(self.folder, 'test_faults.py')],
+                     stdout=PIPE, stderr=PIPE, env=env, cwd=self.folder)
+        out, err = proc.communicate()
+        return proc.returncode, out + err
+
+    def commands(self, command):
+        """Return [(<node name>, <arguments>)] of the command."""
+        return sorted((name, arguments) for each, name, arguments
+                      in self.calls if each == command)
+
+    def test_apply_and_revert(self):
+        """Faults are reverted after every test, failed ones too."""
+        xml = os.path.join(self.folder, 'report.xml')
+        code, output = self.run_pytest('--junitxml', xml)
+        self.assertEqual(code, 1, output)
+        self.assertTrue('1 failed, 3 passed' in output, output)
+        self.assertEqual(self.commands('resume_process'), [
+            ('node0', {'names': ['app']}), ('node1', {'names': ['app']}),
+            ('node1', {'pids': [42]}), ('node2', {'names': ['app']})])
+        self.assertEqual(self.commands('enable_network_adapters'),
+                         [('node0', {'adapters': ['eth1']})])
+        self.assertEqual(self.commands('heal_partition'), [('node2', {})])
+        self.assertEqual(self.commands('kill_process'),
+                         [('node0', {'names': ['burn']})])
+        # every revert follows its fault
+        order = [command for command, _, _ in self.calls]
+        self.assertTrue(order.index('heal_partition') >
+                        order.index('block_peers'))
+        properties = [each.get('name') for each in
+                      ElementTree.parse(xml).iter('property')]
+        for phase in ('locust_apply', 'locust_call', 'locust_revert'):
+            self.assertEqual(properties.count(phase), 4, properties)
+        self.assertTrue('test_faults.py::test_failed apply=' in output,
+                        output)
+
+    def test_revert_failed(self):
+        """Faults that could not be reverted fail the teardown."""
+        self.fleet.handlers['resume_process'] = lambda name, arguments: {
+            'status': 'unexpected_error', 'value': 'no such process'}
+        code, output = self.run_pytest('-k', 'test_manager')
+        self.assertEqual(code, 1, output)
+        self.assertTrue('RevertError' in output, output)
+        self.assertTrue('1 passed, 3 deselected, 1 error' in output, output)
+
+    def test_fault_timeout(self):
+        """Faults last the revert timeout by default, unreachable nodes are
+        retried till their faults time out."""
+        driver = LocustDriver(self.fleet.inventory(), read_timeout=5)
+        self.addCleanup(driver.close)
+        manager = FaultManager(driver, revert_timeout=0.5)
+        manager.block_peers(nodes=['node0'], peers=['10.0.0.1'])
+        manager.disable_network_adapters(nodes=['node1'], adapters=['eth1'],
+                                         timeout=30)
+        self.assertEqual(self.commands('block_peers'), [
+            ('node0', {'peers': ['10.0.0.1'], 'timeout': 0.5})])
+        self.assertEqual(self.commands('disable_network_adapters')[0][1]
+                         ['timeout'], 30)
+        manager.revert()
+        driver.add_node('dead', '127.0.0.1:1', 'fleet', 'key')
+        manager.block_peers(nodes=['dead'], peers=['10.0.0.1'], timeout=1.5)
+        start = time()
+        self.assertRaises(RevertError, manager.revert)
+        self.assertTrue(time() - start >= 1.5)
+
+    def test_no_inventory(self):
+        """Tests with fault fixtures are skipped without inventory."""
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        proc = Popen([sys.executable, '-m', 'pytest', '-p', 'no:cacheprovider',
+                      '-p', 'locustdriver.pytest_plugin',
+                      os.path.join(self.folder, 'test_faults.py')],
+                     stdout=PIPE, stderr=PIPE, env=env, cwd=self.folder)
+        out, _ = proc.communicate()
+        self.assertTrue('4 skipped' in out, out)
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Tests for session recording and replay of locust driver
+"""
+#pylint: disable=W0403,C0103,W0212,too-many-public-methods
+import os
+import unittest
+from json import loads
+from tempfile import mkstemp
+from time import sleep, time
+
+from locustdriver import LocustDriver
+from locustdriver.clock import monotonic
+from locustdriver.fakefleet import FakeFleet
+from locustdriver.recorder import (SessionRecorder, SessionReplayer,
+                                   load_session, REDACTED)
+
+
+class SessionRecording(unittest.TestCase):
+    """Implements unit tests for SessionRecorder and SessionReplayer."""
+
+    def setUp(self):
+        """Start a fake fleet and a recording driver."""
+        self.fleet = FakeFleet(4, ports=1, seed=1).start()
+        handle, self.path = mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.recorder = SessionRecorder(self.path, buffer_size=4)
+        self.driver = LocustDriver(self.fleet.inventory(), read_timeout=5,
+                                   recorder=self.recorder)
+
+    def tearDown(self):
+        """Stop the fleet."""
+        self.driver.close()
+        self.recorder.close()
+        self.fleet.stop()
+        os.remove(self.path)
+
+    def record_session(self):
+        """Send a few commands and close the recorder."""
+        self.driver.send_command('list_process', node_groups='fleet')
+        sleep(0.3)
+        self.driver.send_command('get_process', nodes='node1',
+                                 arguments={'names': ['app']})
+        self.recorder.close()
+
+    def lines(self):
+        """Return records of the session file."""
+        with open(self.path) as source:
+            return [loads(line) for line in source]
+
+    def test_buffered(self):
+        """Records are written by buffers."""
+        self.driver.send_command('list_process', nodes='node0')
+        self.assertEqual(self.lines(), [])
+        self.recorder.flush()
+        self.assertEqual(len(self.lines()), 2)
+
+    def test_records(self):
+        """Every command to a node is recorded."""
+        self.record_session()
+        records = load_session(self.path)
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[-1]['command'], 'get_process')
+        self.assertEqual(records[-1]['arguments'], {'names': ['app']})
+        self.assertTrue(records[-1]['at'] - records[0]['at'] >= 0.3)
+        for record in records:
+            self.assertEqual(record['status'], 'ok')
+            self.assertEqual(len(record['digest']), 40)
+
+    def test_secrets_redacted(self):
+        """Tokens of relay targets are not recorded and refilled on
+        replay."""
+        token = self.fleet.token
+        self.recorder.record('node0', {
+            'command': 'relay', 'key': token,
+            'arguments': {'command': 'list_process', 'targets': [
+                {'name': 'node1', 'token': token, 'targets': [
+                    {'name': 'node2', 'token': token, 'targets': []}]}]}},
+            monotonic(), 0.1, {'list': []})
+        self.recorder.close()
+        with open(self.path) as source:
+            self.assertFalse(token in source.read())
+        record = load_session(self.path)[0]
+        child = record['arguments']['targets'][0]
+        self.assertEqual(child['token'], REDACTED)
+        replayer = SessionReplayer(self.driver, self.path)
+        arguments = replayer._arguments(record)
+        child = arguments['targets'][0]
+        self.assertEqual(child['token'], token)
+        self.assertEqual(child['targets'][0]['token'], token)
+        self.assertEqual(arguments['command'], 'list_process')
+
+    def test_appended(self):
+        """Sessions are appended to the file."""
+        self.record_session()
+        recorder = SessionRecorder(self.path)
+        LocustDriver(self.fleet.inventory(), recorder=recorder) \
+            .send_command('list_process', nodes='node2')
+        recorder.close()
+        self.assertEqual(sum(1 for line in self.lines()
+                             if line['type'] == 'session'), 2)
+        self.assertEqual(len(load_session(self.path)), 6)
+
+    def test_replay_original(self):
+        """Replay keeps the recorded timing and matches the results."""
+        self.record_session()
+        driver = LocustDriver(self.fleet.inventory())
+        start = time()
+        report = SessionReplayer(driver, self.path,
+                                 compare='digest').run()
+        self.assertTrue(time() - start >= 0.3)
+        self.assertEqual(len(report.timeline.records), 5)
+        self.assertFalse(report.diverged, report.divergences)
+
+    def test_replay_fast(self):
+        """Fast replay does not wait."""
+        self.record_session()
+        start = time()
+        SessionReplayer(LocustDriver(self.fleet.inventory()), self.path,
+                        mode='fast').run()
+        self.assertTrue(time() - start < 0.3)
+
+    def test_replay_scaled(self):
+        """Offsets are scaled."""
+        self.record_session()
+        report = SessionReplayer(LocustDriver(self.fleet.inventory()),
+                                 self.path, mode='scaled', scale=2).run()
+        planned = max(record['planned'] for record in report.timeline.records)
+        self.assertTrue(planned >= 0.6)
+
+    def test_divergence(self):
+        """Changed statuses are reported."""
+        self.record_session()
+        self.fleet.error_rate = 1
+        report = SessionReplayer(LocustDriver(self.fleet.inventory()),
+                                 self.path, mode='fast').run()
+        self.assertEqual(len(report.divergences), 5)
+        self.assertEqual(report.divergences[0]['kind'], 'status')
+        self.assertEqual(report.divergences[0]['replayed']['status'],
+                         'unexpected_error')
+
+    def test_wrong_mode(self):
+        """Mode is checked."""
+        self.recorder.close()
+        self.assertRaises(ValueError, SessionReplayer, self.driver,
+                          self.path, mode='slow')
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Tests for retries and circuit breakers of locust driver
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import unittest
+from time import sleep
+
+from locustdriver import LocustDriver
+from locustdriver.connection import NodeError
+from locustdriver.resilience import RetryPolicy, CircuitBreaker
+
+DEAD = '127.0.0.1:1'
+
+
+class CountingDriver(LocustDriver):
+    """Driver that counts requests sent to nodes."""
+
+    def __init__(self, *args, **kwargs):
+        super(CountingDriver, self).__init__(*args, **kwargs)
+        self.requests = 0
+        self.add_node(node_name='dead', node_ip=DEAD, node_group='main',
+                      key='key')
+
+    def _send_command(self, ip_address, data):
+        self.requests += 1
+        raise NodeError('connection_error', 'refused')
+
+
+class Retries(unittest.TestCase):
+    """Implements unit tests for RetryPolicy."""
+
+    def test_backoff_bounds(self):
+        """Backoff grows exponentially up to the cap."""
+        policy = RetryPolicy(base=0.5, cap=3, rand=lambda: 1.0)
+        self.assertEqual([policy.delay(each) for each in range(4)],
+                         [0.5, 1.0, 2.0, 3])
+        policy = RetryPolicy(base=0.5, cap=3, rand=lambda: 0.5)
+        self.assertEqual(policy.delay(1), 0.5)
+
+    def test_idempotent_commands(self):
+        """Only get_ and list_ commands are retried by default."""
+        policy = RetryPolicy()
+        self.assertTrue(policy.is_idempotent('get_process'))
+        self.assertTrue(policy.is_idempotent('list_network_adapters'))
+        self.assertFalse(policy.is_idempotent('kill_process'))
+        self.assertFalse(RetryPolicy(commands=['x']).is_idempotent('get_x'))
+
+    def test_only_network_errors(self):
+        """Agent errors are not retried."""
+        policy = RetryPolicy()
+        self.assertTrue(policy.should_retry(
+            'get_process', {'status': 'timeout', 'value': ''}, 0))
+        self.assertFalse(policy.should_retry(
+            'get_process', {'status': 'wrong_key', 'value': ''}, 0))
+        self.assertFalse(policy.should_retry(
+            'get_process', {'status': 'timeout', 'value': ''}, 3))
+
+    def test_driver_retries(self):
+        """Driver retries idempotent commands only."""
+        driver = CountingDriver(retry=RetryPolicy(attempts=2, base=0.01))
+        result = driver.list_process(nodes='dead')
+        self.assertEqual(result['dead']['status'], 'connection_error')
+        self.assertEqual(driver.requests, 3)
+        driver.kill_process(nodes='dead', names=['x'])
+        self.assertEqual(driver.requests, 4)
+
+
+class Breakers(unittest.TestCase):
+    """Implements unit tests for CircuitBreaker."""
+
+    def test_circuit_opens(self):
+        """Commands to a failing node fail fast."""
+        driver = CountingDriver(breaker=CircuitBreaker(
+            failure_threshold=2, probe_interval=60))
+        for _ in range(4):
+            result = driver.list_process(nodes='dead')
+        self.assertEqual(driver.requests, 2)
+        self.assertEqual(result['dead']['status'], 'circuit_open')
+        self.assertEqual(driver.breaker.open_nodes(), ['dead'])
+
+    def test_retries_stop_on_open_circuit(self):
+        """Retries stop as soon as the circuit is open."""
+        driver = CountingDriver(
+            retry=RetryPolicy(attempts=5, base=0.01),
+            breaker=CircuitBreaker(failure_threshold=2, probe_interval=60))
+        driver.list_process(nodes='dead')
+        self.assertEqual(driver.requests, 2)
+
+    def test_probe_closes_circuit(self):
+        """Circuit is closed when the background probe succeeds."""
+        probes = []
+
+        def probe(address, timeout):
+            """Node is reachable on the second probe."""
+            probes.append(address)
+            return len(probes) > 1
+        breaker = CircuitBreaker(failure_threshold=1, probe_interval=0.05,
+                                 probe=probe)
+        breaker.record('dead', DEAD, {'status': 'timeout', 'value': ''})
+        self.assertTrue(breaker.is_open('dead'))
+        for _ in range(100):
+            if not breaker.is_open('dead'):
+                break
+            sleep(0.05)
+        self.assertFalse(breaker.is_open('dead'))
+        self.assertEqual(probes[0], DEAD)
+
+    def test_success_resets_failures(self):
+        """Failures must be in a row to open a circuit."""
+        breaker = CircuitBreaker(failure_threshold=2, probe_interval=60)
+        breaker.record('node', DEAD, {'status': 'timeout', 'value': ''})
+        breaker.record('node', DEAD, {'list': []})
+        breaker.record('node', DEAD, {'status': 'timeout', 'value': ''})
+        self.assertFalse(breaker.is_open('node'))
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Tests for timeline scheduler of locust driver
+
+These tests requires locust installed
+"""
+#pylint: disable=W0403,C0103,too-many-public-methods
+import unittest
+
+from locustdriver import LocustDriver
+from locustdriver.clock import monotonic, sleep_until
+from locustdriver.timeline import Timeline, distribution
+from common import KEY, start_agents, stop_agents
+
+
+class Clock(unittest.TestCase):
+    """Implements unit tests for the monotonic clock."""
+
+    def test_monotonic(self):
+        """Clock does not go backwards."""
+        values = [monotonic() for _ in range(1000)]
+        self.assertEqual(values, sorted(values))
+
+    def test_sleep_until(self):
+        """Sleep ends right after the deadline."""
+        deadline = monotonic() + 0.05
+        sleep_until(deadline)
+        self.assertTrue(0 <= monotonic() - deadline < 0.01)
+
+
+class Distribution(unittest.TestCase):
+    """Implements unit tests for distribution."""
+
+    def test_distribution(self):
+        """Distribution of values."""
+        stats = distribution(range(1, 101))
+        self.assertEqual((stats['min'], stats['median'], stats['p95'],
+                          stats['max']), (1, 50.5, 95, 100))
+
+    def test_empty(self):
+        """Distribution of nothing."""
+        self.assertEqual(distribution([])['count'], 0)
+
+
+class TimelineRun(unittest.TestCase):
+    """Implements unit tests for Timeline."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start local agents."""
+        cls.agents = start_agents(3)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop local agents."""
+        stop_agents(cls.agents)
+
+    def setUp(self):
+        """Create driver for local agents."""
+        self.driver = LocustDriver()
+        for index, (address, _) in enumerate(self.agents):
+            self.driver.add_node(node_name='node%d' % index,
+                                 node_ip=address,
+                                 node_group='A' if index else 'B', key=KEY)
+
+    def test_steps_dispatched_on_time(self):
+        """Steps are dispatched at planned offsets."""
+        report = Timeline(self.driver, [
+            {'at': 0.4, 'command': 'exec_command', 'node_groups': 'B',
+             'arguments': {'cmd': 'echo late'}},
+            {'at': 0, 'command': 'exec_command', 'node_groups': 'A',
+             'arguments': {'cmd': 'echo early'}}]).run()
+        self.assertEqual(len(report.records), 3)
+        self.assertTrue(report.stats()['max'] < 0.1, report.stats())
+        self.assertEqual(report.results(0)['node0']['result'], 'late')
+        self.assertEqual(report.results(1)['node1']['result'], 'early')
+        self.assertEqual([each['planned'] for each in report.sorted()],
+                         [0, 0, 0.4])
+
+    def test_steps_do_not_wait(self):
+        """Slow step does not delay the next one."""
+        report = Timeline(self.driver).add(
+            0, 'exec_command', nodes='node0', arguments={'cmd': 'sleep 1'}) \
+            .add(0.2, 'exec_command', nodes='node0',
+                 arguments={'cmd': 'echo'}).run()
+        self.assertTrue(report.stats()['max'] < 0.1, report.stats())
+
+    def test_steps_do_not_share_workers(self):
+        """Busy workers of a step do not delay the next one."""
+        report = Timeline(self.driver, max_workers=2).add(
+            0, 'exec_command', node_groups=['A', 'B'],
+            arguments={'cmd': 'sleep 1'}) \
+            .add(0.2, 'exec_command', node_groups='A',
+                 arguments={'cmd': 'echo'}).run()
+        errors = [record['error'] for record in report.records
+                  if record['step'] == 1]
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(max(errors) < 0.1, errors)
+
+    def test_coordinated_start(self):
+        """Agents start steps with lead at the planned time."""
+        report = Timeline(self.driver, lead=0.3).add(
+            0.1, 'exec_command', node_groups='A', arguments={'cmd': 'echo'}) \
+            .add(0.5, 'list_network_adapters', node_groups='B').run()
+        stats = report.start_stats()
+        self.assertEqual(stats['count'], 3)
+        self.assertTrue(stats['max'] < 0.02, stats)
+        self.assertTrue(isinstance(report.results(1)['node0']['result'], list))
+
+    def test_negative_offset(self):
+        """Steps could not be planned before the start."""
+        self.assertRaises(ValueError, Timeline(self.driver).add, -1,
+                          'list_process')
+
+
+def main():
+    """method for invoking unit tests."""
+    unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+    main()